@@ -0,0 +1,204 @@
+"""
+Headless bulk compliance analysis.
+
+Runs the same extract -> retrieve -> synthesize -> report pipeline as the
+Streamlit app over a directory or manifest of PDF/TXT contracts, spread across
+a process pool. Every finished contract is appended to a JSONL summary, and
+contracts already recorded as successful there are skipped, so an interrupted
+run can be resumed by starting it again with the same arguments.
+
+Usage (from the repository root):
+    python app/batch_analyze.py --input-dir contracts/ --output-dir reports/
+    python app/batch_analyze.py --manifest contracts.txt --output-dir reports/ --workers 8
+"""
+import argparse
+import hashlib
+import json
+import logging
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from pathlib import Path
+from typing import Dict, List, Set
+
+from config.settings import get_settings
+from database.vector_store import create_vector_store
+from services.contract_analysis import (
+    create_pdf_report,
+    embed_contract,
+    extract_compliance_score,
+    generate_analysis,
+    process_large_text,
+    read_and_process_pdf,
+    read_txt,
+)
+from services.llm_factory import set_rate_limiter
+from services.rate_limiter import AdaptiveRateLimiter, TokenBucket
+
+SUPPORTED_EXTENSIONS = {".pdf", ".txt"}
+SUMMARY_FILENAME = "summary.jsonl"
+
+# Per-process state, created once by _init_worker
+_vec = None
+_rate_limiter = None
+
+
+def find_contracts(input_dir: str) -> List[str]:
+    """Recursively list the PDF/TXT files under input_dir."""
+    return sorted(
+        str(path)
+        for path in Path(input_dir).rglob("*")
+        if path.is_file() and path.suffix.lower() in SUPPORTED_EXTENSIONS
+    )
+
+
+def read_manifest(manifest: str) -> List[str]:
+    """Read contract paths from a manifest: one path per line, or JSONL with a "path" key."""
+    paths = []
+    with open(manifest, encoding="utf-8") as f:
+        for line in f:
+            line = line.strip()
+            if not line or line.startswith("#"):
+                continue
+            paths.append(json.loads(line)["path"] if line.startswith("{") else line)
+    return paths
+
+
+def load_completed(summary_path: str) -> Set[str]:
+    """Return the paths already analysed successfully according to the summary."""
+    completed = set()
+    if os.path.exists(summary_path):
+        with open(summary_path, encoding="utf-8") as f:
+            for line in f:
+                try:
+                    entry = json.loads(line)
+                except json.JSONDecodeError:
+                    # A line cut short by an interruption
+                    continue
+                if entry.get("status") == "ok":
+                    completed.add(entry["path"])
+    return completed
+
+
+def report_filename(path: str, output_dir: str) -> str:
+    """Unique report path for a contract, stable across runs."""
+    digest = hashlib.sha1(os.path.abspath(path).encode("utf-8")).hexdigest()[:8]
+    return os.path.join(output_dir, f"{Path(path).stem}_{digest}_analysis_report.pdf")
+
+
+def _init_worker(requests_per_minute: float, burst: int) -> None:
+    """Create one VectorStore and rate limiters per worker process."""
+    global _vec, _rate_limiter
+    _vec = create_vector_store()
+    _rate_limiter = TokenBucket.per_minute(requests_per_minute, burst)
+    # Analysis requests adapt to 429s within this process's share of the quota
+    gemini_settings = get_settings().gemini
+    set_rate_limiter(
+        AdaptiveRateLimiter(
+            rate=requests_per_minute / 60.0,
+            capacity=burst,
+            min_rate=min(requests_per_minute, gemini_settings.min_requests_per_minute) / 60.0,
+            base_delay=gemini_settings.rate_limit_base_delay,
+            max_delay=gemini_settings.rate_limit_max_delay,
+        )
+    )
+
+
+def analyze_contract(path: str, output_dir: str) -> Dict:
+    """Run the full analysis pipeline for one contract inside a worker process."""
+    start_time = time.time()
+
+    if path.lower().endswith(".pdf"):
+        # Parallelism comes from the process pool, so parse pages in-process
+        pages, results = read_and_process_pdf(_vec, path, workers=1, rate_limiter=_rate_limiter)
+        text = "".join(pages)
+    else:
+        text = pages = read_txt(path)
+        results = process_large_text(_vec, text, rate_limiter=_rate_limiter)
+
+    response = generate_analysis(
+        text,
+        results,
+        contract_embedding=embed_contract(_vec, pages),
+    )
+
+    report = report_filename(path, output_dir)
+    create_pdf_report(response, report)
+
+    score, verdict = extract_compliance_score(response.answer)
+    return {
+        "path": path,
+        "status": "ok",
+        "report": report,
+        "score": score,
+        "verdict": verdict,
+        "enough_context": response.enough_context,
+        "elapsed": round(time.time() - start_time, 3),
+    }
+
+
+def run(paths: List[str], output_dir: str, workers: int) -> Dict[str, int]:
+    """
+    Analyse every contract not yet in the summary and append the outcomes.
+
+    Returns:
+        Counts of succeeded, failed and skipped contracts.
+    """
+    os.makedirs(output_dir, exist_ok=True)
+    summary_path = os.path.join(output_dir, SUMMARY_FILENAME)
+    completed = load_completed(summary_path)
+    pending = [path for path in dict.fromkeys(paths) if path not in completed]
+    stats = {"ok": 0, "error": 0, "skipped": len(paths) - len(pending)}
+    logging.info(
+        f"{len(pending)} contracts to analyse, {stats['skipped']} already done"
+    )
+    if not pending:
+        return stats
+
+    # Split the quota across processes so the pool as a whole stays within it
+    gemini_settings = get_settings().gemini
+    per_worker_rpm = gemini_settings.requests_per_minute / workers
+
+    with open(summary_path, "a", encoding="utf-8") as summary, ProcessPoolExecutor(
+        max_workers=workers,
+        initializer=_init_worker,
+        initargs=(per_worker_rpm, 1),
+    ) as executor:
+        futures = {
+            executor.submit(analyze_contract, path, output_dir): path
+            for path in pending
+        }
+        for future in as_completed(futures):
+            path = futures[future]
+            try:
+                entry = future.result()
+            except Exception as e:
+                logging.error(f"Error processing file '{path}': {e}")
+                entry = {"path": path, "status": "error", "error": str(e)}
+
+            stats[entry["status"]] += 1
+            summary.write(json.dumps(entry) + "\n")
+            summary.flush()
+            logging.info(
+                f"[{stats['ok'] + stats['error']}/{len(pending)}] {path}: "
+                f"{entry.get('score', entry.get('error'))}"
+            )
+    return stats
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Analyse contracts for compliance in bulk.")
+    source = parser.add_mutually_exclusive_group(required=True)
+    source.add_argument("--input-dir", help="Directory searched recursively for PDF/TXT contracts")
+    source.add_argument("--manifest", help="File listing contract paths (plain lines or JSONL with 'path')")
+    parser.add_argument("--output-dir", default="reports", help="Where reports and summary.jsonl are written")
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1, help="Number of worker processes")
+    args = parser.parse_args()
+
+    get_settings()  # configures logging
+    paths = find_contracts(args.input_dir) if args.input_dir else read_manifest(args.manifest)
+    stats = run(paths, args.output_dir, max(1, args.workers))
+    logging.info(
+        f"Batch complete: {stats['ok']} succeeded, {stats['error']} failed, "
+        f"{stats['skipped']} skipped"
+    )
@@ -0,0 +1,138 @@
+"""
+Local IVF-PQ recall/latency benchmark.
+
+Fills a temporary LocalVectorStore with clustered random embeddings, builds
+its IVF-PQ index and compares index searches against exact scans: for each
+nprobe and rerank setting, recall@limit against the exact top limit and the
+median and p95 latency per query. Then runs the same queries from several
+processes that share the memory-mapped store and index, and reports the
+combined throughput.
+
+Run from the app directory:
+    python -m benchmarks.ann_recall --rows 100000 --processes 4
+"""
+import argparse
+import multiprocessing
+import statistics
+import tempfile
+import time
+from typing import List, Optional, Tuple
+
+import numpy as np
+from benchmarks.local_search import fill
+from config.settings import get_settings
+from database.local_vector_store import LocalVectorStore
+
+_worker_store: Optional[LocalVectorStore] = None
+
+
+def clustered(rng: np.random.Generator, centers: np.ndarray, rows: int) -> np.ndarray:
+    """
+    Points around random centers with most of their spread in a few directions.
+
+    Real embeddings cluster by topic and vary along far fewer directions than
+    they have dimensions; isotropic noise would leave no structure to index.
+    """
+    dimensions = centers.shape[1]
+    directions = np.random.default_rng(len(centers)).normal(size=(32, dimensions))
+    structured = rng.normal(size=(rows, 32)) @ directions * 0.3
+    noise = rng.normal(size=(rows, dimensions)) * 0.3
+    return (centers[rng.integers(0, len(centers), rows)] + structured + noise).astype(np.float32)
+
+
+def measure(store: LocalVectorStore, queries: np.ndarray, limit: int) -> Tuple[List[float], List[List[int]]]:
+    latencies, found = [], []
+    for query in queries:
+        start = time.perf_counter()
+        hits = store._nearest([query], limit)[0][0]
+        latencies.append(time.perf_counter() - start)
+        found.append([position for position, _ in hits])
+    return latencies, found
+
+
+def report(name: str, latencies: List[float], recall: float) -> None:
+    print(
+        f"{name:<26} recall {recall:6.3f}  median {statistics.median(latencies) * 1000:8.3f} ms  "
+        f"p95 {np.percentile(latencies, 95) * 1000:8.3f} ms"
+    )
+
+
+def open_worker_store(path: str, min_rows: int, nprobe: int, rerank: int) -> None:
+    global _worker_store
+    settings = get_settings().vector_store.local_index
+    settings.min_rows, settings.nprobe, settings.rerank = min_rows, nprobe, rerank
+    _worker_store = LocalVectorStore(path)
+
+
+def worker_search(queries: np.ndarray) -> int:
+    for query in queries:
+        _worker_store._nearest([query], 10)
+    return len(queries)
+
+
+def throughput(path: str, queries: np.ndarray, processes: int) -> float:
+    settings = get_settings().vector_store.local_index
+    with multiprocessing.get_context("spawn").Pool(
+        processes,
+        initializer=open_worker_store,
+        initargs=(path, settings.min_rows, settings.nprobe, settings.rerank),
+    ) as pool:
+        # Warm up the mappings in every worker before timing
+        pool.map(worker_search, np.array_split(queries[:processes], processes))
+        start = time.perf_counter()
+        done = sum(pool.map(worker_search, np.array_split(queries, processes * 4)))
+        return done / (time.perf_counter() - start)
+
+
+def run(rows: int, limit: int, queries: int, processes: int, seed: int) -> None:
+    settings = get_settings().vector_store.local_index
+    settings.min_rows = min(settings.min_rows, rows)
+    with tempfile.TemporaryDirectory() as path:
+        store = LocalVectorStore(path)
+        rng = np.random.default_rng(seed)
+        centers = rng.normal(size=(max(rows // 500, 16), store.dimensions))
+        embeddings = clustered(rng, centers, rows)
+        fill(store, rows, seed, lambda start, count: embeddings[start : start + count])
+        query_embeddings = clustered(rng, centers, queries)
+
+        exact_latencies, truth = measure(store, query_embeddings, limit)
+        start = time.time()
+        store.create_index()
+        manifest = store._index.manifest
+        print(
+            f"rows={rows} dimensions={store.dimensions} limit={limit} nlist={manifest['nlist']} "
+            f"sub-vectors={manifest['subvectors']} build={time.time() - start:.1f}s"
+        )
+        report("exact", exact_latencies, 1.0)
+
+        for rerank in (limit, 100, 400):
+            settings.rerank = rerank
+            for nprobe in (1, 4, 16, 64):
+                settings.nprobe = nprobe
+                latencies, found = measure(store, query_embeddings, limit)
+                recall = statistics.mean(
+                    len(set(hits) & set(expected)) / max(len(expected), 1)
+                    for hits, expected in zip(found, truth)
+                )
+                report(f"nprobe={nprobe} rerank={rerank}", latencies, recall)
+
+        if processes > 1:
+            settings.nprobe, settings.rerank = 16, 200
+            many = np.tile(query_embeddings, (max(1, 200 // queries), 1))
+            single = throughput(path, many, 1)
+            shared = throughput(path, many, processes)
+            print(
+                f"nprobe=16 rerank=200: {single:.0f} queries/sec in 1 process, "
+                f"{shared:.0f} in {processes} processes sharing the index"
+            )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--rows", type=int, default=100_000)
+    parser.add_argument("--limit", type=int, default=10)
+    parser.add_argument("--queries", type=int, default=50)
+    parser.add_argument("--processes", type=int, default=1)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+    run(args.rows, args.limit, args.queries, args.processes, args.seed)
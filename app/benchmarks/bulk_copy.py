@@ -0,0 +1,93 @@
+"""
+Bulk load encoding benchmark.
+
+Builds synthetic clause chunk records and compares the client-side work of the
+previous upsert path (DataFrame, to_records, one parameterized INSERT per row
+with the embedding rendered as SQL text) with the binary COPY stream used by
+VectorStore.bulk_upsert. Reports rows/sec and bytes sent per row. Database
+time is not included; bulk_upsert logs its end-to-end rows/sec during ingest.
+
+Run from the app directory:
+    python -m benchmarks.bulk_copy --rows 20000
+"""
+import argparse
+import json
+import time
+from typing import Callable, Dict, List
+
+import numpy as np
+import pandas as pd
+from database.bulk_copy import CopyStream
+from insert_vectors import content_uuid
+from psycopg2.extensions import adapt
+
+
+def synthetic_records(rows: int, dimensions: int, seed: int) -> List[Dict]:
+    """Records shaped like insert_vectors.prepare_records output after embedding."""
+    rng = np.random.default_rng(seed)
+    embeddings = rng.normal(size=(rows, dimensions)).astype(np.float32)
+    records = []
+    for i in range(rows):
+        contents = f"Clause {i}: the Supplier shall indemnify the Customer against all losses."
+        records.append({
+            "id": content_uuid(contents),
+            "metadata": {
+                "agreement_date": f"20{i % 24:02d}-01-15T00:00:00",
+                "effective_date": f"20{i % 24:02d}-02-01T00:00:00",
+                "expiration_date": None,
+                "chunk_index": i % 4,
+            },
+            "contents": contents,
+            "embedding": embeddings[i].tolist(),
+        })
+    return records
+
+
+def previous_path(records: List[Dict]) -> int:
+    """Encode the parameters the previous upsert sent, returning their size in bytes."""
+    rows = list(pd.DataFrame(records).to_records(index=False))
+    size = 0
+    for id_, metadata, contents, embedding in rows:
+        size += len(str(id_)) + len(json.dumps(metadata)) + len(contents)
+        size += len(adapt(list(embedding)).getquoted())
+    return size
+
+
+def copy_path(records: List[Dict], vector_type: str) -> int:
+    """Read the whole binary COPY stream, returning its size in bytes."""
+    stream = CopyStream(records, vector_type)
+    size = 0
+    while True:
+        block = stream.read(65536)
+        if not block:
+            return size
+        size += len(block)
+
+
+def measure(name: str, func: Callable[[], int], rows: int, repeat: int) -> float:
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        size = func()
+        best = min(best, time.perf_counter() - start)
+    print(f"{name:<14} {rows / best:12.0f} rows/sec  {size / rows:10.0f} bytes/row")
+    return best
+
+
+def run(rows: int, dimensions: int, repeat: int, seed: int) -> None:
+    records = synthetic_records(rows, dimensions, seed)
+    print(f"rows={rows} dimensions={dimensions}")
+    previous = measure("previous", lambda: previous_path(records), rows, repeat)
+    current = measure("copy vector", lambda: copy_path(records, "vector"), rows, repeat)
+    measure("copy halfvec", lambda: copy_path(records, "halfvec"), rows, repeat)
+    print(f"speedup        {previous / current:10.1f}x (vector)")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--rows", type=int, default=20_000)
+    parser.add_argument("--dimensions", type=int, default=768)
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+    run(args.rows, args.dimensions, args.repeat, args.seed)
@@ -0,0 +1,127 @@
+"""
+Chunking throughput benchmark.
+
+Compares the old fixed 8,000-character slicing with the clause-aware chunker
+on synthetic contracts (or the contract column of a CSV), reporting chunks/sec,
+MB/sec and the average number of chunks per contract.
+
+Then edits one clause at a time (growing or shrinking it) and counts how many
+map-step chunks, and so cached assessments, each edit invalidates with greedy
+chunking and with content-defined chunking. Exits with an error if any edit
+invalidates more than two content-defined chunks.
+
+Run from the app directory:
+    python -m benchmarks.chunking --contracts 200
+    python -m benchmarks.chunking --csv ../data/updated_file_with_contracts_final.csv
+"""
+import argparse
+import random
+import re
+import statistics
+import sys
+import time
+from typing import Callable, List
+
+import pandas as pd
+from services.chunker import chunk_text, content_defined_chunks
+
+CLAUSES = [
+    "The Supplier shall indemnify and hold harmless the Customer against all losses arising from any breach of this Agreement.",
+    "Either party may terminate this Agreement upon thirty (30) days written notice to the other party.",
+    "All Confidential Information shall remain the property of the disclosing party and shall not be disclosed to any third party.",
+    "This Agreement shall be governed by and construed in accordance with the laws of the State of New York.",
+    "Neither party shall be liable for any indirect, incidental or consequential damages.",
+]
+HEADINGS = ["DEFINITIONS", "TERM AND TERMINATION", "CONFIDENTIALITY", "INDEMNIFICATION", "GOVERNING LAW"]
+
+
+def synthetic_contract(rng: random.Random) -> str:
+    """Build a contract with articles, numbered clauses and paragraphs."""
+    parts = ["MASTER SERVICES AGREEMENT\n"]
+    for article in range(1, rng.randint(8, 30)):
+        parts.append(f"\nARTICLE {article} {rng.choice(HEADINGS)}\n")
+        for clause in range(1, rng.randint(3, 12)):
+            sentences = " ".join(rng.choice(CLAUSES) for _ in range(rng.randint(1, 6)))
+            parts.append(f"{article}.{clause} {sentences}\n")
+    return "".join(parts)
+
+
+def fixed_slices(text: str, chunk_size: int = 8000) -> List[str]:
+    """The previous query-side chunking."""
+    return [text[i:i + chunk_size] for i in range(0, len(text), chunk_size)]
+
+
+def measure(name: str, chunker: Callable[[str], List[str]], contracts: List[str]) -> None:
+    start = time.perf_counter()
+    chunk_counts = [len(chunker(contract)) for contract in contracts]
+    elapsed = time.perf_counter() - start
+    total_chunks = sum(chunk_counts)
+    megabytes = sum(len(contract.encode("utf-8")) for contract in contracts) / 1e6
+    print(
+        f"{name:<14} {total_chunks / elapsed:12.0f} chunks/sec {megabytes / elapsed:8.1f} MB/sec "
+        f"{total_chunks / len(contracts):6.2f} chunks/contract"
+    )
+
+
+def edit_clause(rng: random.Random, text: str) -> str:
+    """Grow or shrink one numbered clause by a sentence."""
+    clauses = list(re.finditer(r"^\d+\.\d+ .*$", text, re.MULTILINE))
+    if not clauses:
+        return text + "\n" + rng.choice(CLAUSES)
+    clause = rng.choice(clauses)
+    line = clause.group()
+    if rng.random() < 0.5 or ". " not in line:
+        edited = line + " " + rng.choice(CLAUSES)
+    else:
+        edited = line[: line.rindex(". ") + 1]
+    return text[: clause.start()] + edited + text[clause.end() :]
+
+
+def invalidated(chunker: Callable[[str], List[str]], before: str, after: str) -> int:
+    """Chunks of the edited text whose assessment is not cached from before the edit."""
+    return len(set(chunker(after)) - set(chunker(before)))
+
+
+def measure_edits(contracts: List[str], edits: int, seed: int) -> int:
+    """Report chunks invalidated per one-clause edit; returns the worst content-defined count."""
+    rng = random.Random(seed)
+    greedy, anchored, totals = [], [], []
+    for _ in range(edits):
+        before = rng.choice(contracts)
+        after = edit_clause(rng, before)
+        greedy.append(invalidated(lambda text: chunk_text(text, overlap_bytes=0), before, after))
+        anchored.append(invalidated(content_defined_chunks, before, after))
+        totals.append(len(content_defined_chunks(after)))
+    print(f"{edits} one-clause edits, {statistics.mean(totals):.1f} content-defined chunks per contract")
+    for name, counts in (("greedy", greedy), ("content-defined", anchored)):
+        print(
+            f"{name:<16} invalidated chunks per edit: mean {statistics.mean(counts):5.2f} "
+            f"max {max(counts):3d}, over two in {sum(c > 2 for c in counts) / len(counts):.1%}"
+        )
+    return max(anchored)
+
+
+def run(contracts: List[str]) -> None:
+    avg_kb = sum(len(c.encode("utf-8")) for c in contracts) / len(contracts) / 1000
+    print(f"contracts={len(contracts)} avg_size={avg_kb:.1f}KB")
+    measure("fixed 8000", fixed_slices, contracts)
+    measure("clause-aware", chunk_text, contracts)
+    measure("content-defined", content_defined_chunks, contracts)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--contracts", type=int, default=200)
+    parser.add_argument("--csv", help="Use the 'contract' column of this CSV instead of synthetic text")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--edits", type=int, default=200, help="One-clause edits to measure")
+    args = parser.parse_args()
+
+    if args.csv:
+        contracts = pd.read_csv(args.csv)["contract"].dropna().astype(str).tolist()
+    else:
+        rng = random.Random(args.seed)
+        contracts = [synthetic_contract(rng) for _ in range(args.contracts)]
+    run(contracts)
+    if measure_edits(contracts, args.edits, args.seed) > 2:
+        sys.exit("A one-clause edit invalidated more than two content-defined chunks")
@@ -0,0 +1,123 @@
+"""
+Offline embedding throughput benchmark.
+
+Replaces the Gemini request with a fake embedder that sleeps for a simulated
+round-trip and occasionally answers with a 429, then compares the old
+one-request-per-document loop against VectorStore.get_embeddings. With
+--local, also measures the in-process sentence-transformers backend.
+
+Run from the app directory:
+    python -m benchmarks.embedding_throughput --docs 1000 --latency 0.2
+    python -m benchmarks.embedding_throughput --docs 10000 --local --threads 4
+"""
+import argparse
+import random
+import time
+from typing import List, Optional
+
+from config.settings import get_settings
+from database.embedders import GeminiEmbedder, LocalEmbedder
+from database.vector_store import VectorStore
+
+
+class FakeRateLimitError(Exception):
+    code = 429
+
+
+class FakeGeminiEmbedder(GeminiEmbedder):
+    """GeminiEmbedder whose requests never leave the process."""
+
+    def __init__(self, latency: float, per_item_latency: float, error_rate: float):
+        super().__init__(get_settings())
+        self.latency = latency
+        self.per_item_latency = per_item_latency
+        self.error_rate = error_rate
+        self.requests = 0
+        self._dimensions = 8
+
+    def _request_embeddings(self, texts: List[str]) -> List[List[float]]:
+        self.requests += 1
+        time.sleep(self.latency + self.per_item_latency * len(texts))
+        if random.random() < self.error_rate:
+            raise FakeRateLimitError("429 Resource has been exhausted")
+        return [[float(len(text))] * self.dimensions for text in texts]
+
+
+class FakeEmbeddingStore(VectorStore):
+    """VectorStore without a database connection or embedding cache."""
+
+    def __init__(self, embedder):
+        self.settings = get_settings()
+        self.vector_settings = self.settings.vector_store
+        self.embedding_cache = None
+        self.embedder = embedder
+        self.dimensions = embedder.dimensions
+
+    def get_embedding(self, text: str) -> List[float]:
+        return self.embedder._embed_batch([text])[0]
+
+
+def run(
+    docs: int,
+    latency: float,
+    per_item_latency: float,
+    error_rate: float,
+    local: bool = False,
+    threads: Optional[int] = None,
+) -> None:
+    texts = [f"Contract {i}: the parties agree to indemnify each other." for i in range(docs)]
+
+    store = FakeEmbeddingStore(FakeGeminiEmbedder(latency, per_item_latency, error_rate))
+    start = time.perf_counter()
+    for text in texts:
+        store.get_embedding(text)
+    sequential = time.perf_counter() - start
+    sequential_requests = store.embedder.requests
+
+    store = FakeEmbeddingStore(FakeGeminiEmbedder(latency, per_item_latency, error_rate))
+    start = time.perf_counter()
+    embeddings = store.get_embeddings(texts)
+    batched = time.perf_counter() - start
+    assert len(embeddings) == docs
+
+    settings = store.vector_settings
+    print(
+        f"docs={docs} latency={latency}s batch_size={settings.embedding_batch_size} "
+        f"concurrency={settings.embedding_concurrency}"
+    )
+    print(f"sequential: {docs / sequential:10.1f} docs/sec ({sequential_requests} requests)")
+    print(f"batched:    {docs / batched:10.1f} docs/sec ({store.embedder.requests} requests)")
+
+    if local:
+        embedder = LocalEmbedder(
+            settings.local_embedding_model,
+            batch_size=settings.local_embedding_batch_size,
+            num_threads=threads or settings.local_embedding_threads,
+        )
+        embedder.embed(texts[:8])  # warm up
+        start = time.perf_counter()
+        embeddings = FakeEmbeddingStore(embedder).get_embeddings(texts)
+        elapsed = time.perf_counter() - start
+        print(
+            f"local:      {docs / elapsed:10.1f} docs/sec "
+            f"({settings.local_embedding_model}, dim={len(embeddings[0])})"
+        )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--docs", type=int, default=500)
+    parser.add_argument("--latency", type=float, default=0.05)
+    parser.add_argument("--per-item-latency", type=float, default=0.0005)
+    parser.add_argument("--error-rate", type=float, default=0.02)
+    parser.add_argument("--local", action="store_true", help="Also benchmark the local backend")
+    parser.add_argument("--threads", type=int, help="Torch threads for the local backend")
+    args = parser.parse_args()
+    run(
+        args.docs,
+        args.latency,
+        args.per_item_latency,
+        args.error_rate,
+        local=args.local,
+        threads=args.threads,
+    )
@@ -0,0 +1,116 @@
+"""
+Filtered search strategy benchmark.
+
+Runs vector searches filtered by agreement_date windows of increasing width
+(from a few weeks of contracts to all of them) against the ingested table and
+compares the strategies the planner chooses between: ANN with the filter
+inline, ANN over-fetch with retries, and an exact scan of the filtered rows.
+Reports the planner's estimate and choice per window, and for every strategy
+the median latency, the hits returned and recall@limit against the exact scan.
+
+Needs the database populated by insert_vectors.py. Run from the app directory:
+    python -m benchmarks.filtered_search --limit 5
+"""
+import argparse
+import statistics
+import time
+from datetime import date, timedelta
+from typing import List, Set, Tuple
+
+from database.vector_store import SearchPlan, VectorStore
+
+QUERIES = [
+    "termination for convenience with thirty days notice",
+    "limitation of liability excluding indirect damages",
+    "governing law and exclusive jurisdiction",
+    "confidentiality obligations survive termination",
+]
+
+
+def agreement_date_bounds(vec: VectorStore) -> Tuple[date, date]:
+    with vec.vec_client.connect() as conn:
+        with conn.cursor() as cur:
+            cur.execute(
+                f"SELECT min(agreement_date), max(agreement_date) FROM {vec._table_name()}"
+            )
+            return cur.fetchone()
+
+
+def run_strategy(
+    vec: VectorStore,
+    embedding: List[float],
+    where: str,
+    params: List,
+    limit: int,
+    plan: SearchPlan,
+    retry: bool,
+) -> Tuple[float, Set[str]]:
+    """Run one search with a fixed starting plan; return latency and hit ids."""
+    params = [vec._vector_literal(embedding)] + params[1:]
+    start = time.perf_counter()
+    while True:
+        rows = vec._fetch(
+            vec._search_query(where, limit, plan=plan), params, vec._plan_query_params(plan)
+        )
+        next_plan = vec._next_plan(plan, len(rows), limit) if retry else None
+        if next_plan is None:
+            break
+        plan = next_plan
+    return time.perf_counter() - start, {str(row[0]) for row in rows}
+
+
+def run(limit: int, repeat: int) -> None:
+    vec = VectorStore()
+    embeddings = vec.get_embeddings(QUERIES)
+    first, last = agreement_date_bounds(vec)
+    span = (last - first).days
+
+    print(f"agreement dates {first} .. {last}, limit={limit}")
+    print(f"{'window':>10} {'planned':<42} {'strategy':<10} {'ms':>8} {'hits':>5} {'recall':>7}")
+    for fraction in (0.005, 0.02, 0.1, 0.3, 1.0):
+        end = first + timedelta(days=max(1, int(span * fraction)))
+        where, params = vec._build_where_clause(
+            [None], date_range={"agreement_date": (first, end)}
+        )
+        planned = vec.plan_search(where, params, limit)
+        overfetch = planned
+        if planned.strategy != "overfetch":
+            # Size an over-fetch for this selectivity even where the planner would scan
+            planner = vec.vector_settings.planner
+            selectivity = max(planned.estimated_rows / max(planned.total_rows, 1.0), 1e-6)
+            candidates = int(limit / selectivity * planner.overfetch_margin)
+            overfetch = planned._replace(
+                strategy="overfetch",
+                candidates=min(max(candidates, limit), planner.max_candidates),
+            )
+        strategies: List[Tuple[str, SearchPlan, bool]] = [
+            ("inline", SearchPlan("ann"), False),
+            ("overfetch", overfetch, True),
+            ("exact", overfetch._replace(strategy="exact", candidates=0), False),
+        ]
+
+        exact_hits = [
+            run_strategy(vec, embedding, where, params, limit, strategies[2][1], False)[1]
+            for embedding in embeddings
+        ]
+        for name, plan, retry in strategies:
+            latencies, hits, recalls = [], [], []
+            for embedding, truth in zip(embeddings, exact_hits):
+                for _ in range(repeat):
+                    latency, found = run_strategy(vec, embedding, where, params, limit, plan, retry)
+                    latencies.append(latency)
+                hits.append(len(found))
+                recalls.append(len(found & truth) / len(truth) if truth else 1.0)
+            print(
+                f"{fraction:>9.1%} {str(planned):<42} {name:<10} "
+                f"{statistics.median(latencies) * 1000:8.1f} {statistics.mean(hits):5.1f} "
+                f"{statistics.mean(recalls):7.2f}"
+            )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--limit", type=int, default=5)
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+    run(args.limit, args.repeat)
@@ -0,0 +1,94 @@
+"""
+Local exact search benchmark.
+
+Fills a temporary LocalVectorStore with random embeddings and synthetic
+contract metadata, then reports the latency of exact top-k searches without a
+filter, with a metadata filter (first call, which evaluates the filter, and
+repeated calls, which reuse its cached mask) and for batches of queries.
+Query embedding is excluded, so this is the cost the store itself adds.
+
+Run from the app directory:
+    python -m benchmarks.local_search --rows 20000
+"""
+import argparse
+import statistics
+import tempfile
+import time
+import uuid
+from typing import Callable, List, Optional
+
+import numpy as np
+from database.local_vector_store import LocalVectorStore
+from database.metadata_filter import MetadataFilter
+
+
+def fill(
+    store: LocalVectorStore,
+    rows: int,
+    seed: int,
+    make_embeddings: Optional[Callable[[int, int], np.ndarray]] = None,
+) -> None:
+    """Store rows synthetic records; make_embeddings(start, count) overrides the random embeddings."""
+    rng = np.random.default_rng(seed)
+    dimensions = store.dimensions
+    for start in range(0, rows, 10_000):
+        count = min(10_000, rows - start)
+        if make_embeddings is not None:
+            embeddings = make_embeddings(start, count)
+        else:
+            embeddings = rng.normal(size=(count, dimensions)).astype(np.float32)
+        store.bulk_upsert(
+            (
+                {
+                    "id": uuid.uuid1(),
+                    "metadata": {
+                        "agreement_date": f"20{i % 24:02d}-01-15T00:00:00",
+                        "chunk_index": i % 8,
+                    },
+                    "contents": f"Clause {i}",
+                    "embedding": embeddings[i - start],
+                }
+                for i in range(start, start + count)
+            ),
+            batch_size=count,
+        )
+
+
+def measure(name: str, func: Callable[[], object], repeat: int) -> None:
+    latencies: List[float] = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        latencies.append(time.perf_counter() - start)
+    print(
+        f"{name:<22} median {statistics.median(latencies) * 1000:8.3f} ms  "
+        f"p95 {np.percentile(latencies, 95) * 1000:8.3f} ms"
+    )
+
+
+def run(rows: int, limit: int, batch: int, repeat: int, seed: int) -> None:
+    with tempfile.TemporaryDirectory() as path:
+        store = LocalVectorStore(path)
+        fill(store, rows, seed)
+        rng = np.random.default_rng(seed + 1)
+        query = rng.normal(size=store.dimensions).tolist()
+        queries = rng.normal(size=(batch, store.dimensions)).tolist()
+        print(f"rows={rows} dimensions={store.dimensions} limit={limit}")
+
+        measure("unfiltered", lambda: store._nearest([query], limit), repeat)
+        filter_ = MetadataFilter({"chunk_index": 3})
+        store._mask_cache.clear()
+        measure("filter, first call", lambda: store._nearest([query], limit, filter_, "bench"), 1)
+        measure("filter, cached mask", lambda: store._nearest([query], limit, filter_, "bench"), repeat)
+        measure(f"batch of {batch}", lambda: store._nearest(queries, limit), repeat)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--rows", type=int, default=20_000)
+    parser.add_argument("--limit", type=int, default=5)
+    parser.add_argument("--batch", type=int, default=16)
+    parser.add_argument("--repeat", type=int, default=50)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+    run(args.rows, args.limit, args.batch, args.repeat, args.seed)
@@ -0,0 +1,99 @@
+"""
+Search result formatting benchmark.
+
+Builds synthetic search result rows shaped like the vector store's and compares
+the previous formatting (embedding column fetched, metadata expanded with a
+per-row apply, metadata dicts rebuilt with a row-wise apply) against the lean
+path (no embeddings, one vectorized metadata expansion). Also reports how much
+data the embedding column adds to each result set.
+
+Run from the app directory:
+    python -m benchmarks.search_results --rows 10000
+"""
+import argparse
+import time
+import uuid
+from typing import Any, Callable, List, Tuple
+
+import numpy as np
+import pandas as pd
+from database.vector_store import VectorStore
+from services.contract_analysis import add_context_metadata
+
+
+def synthetic_results(rows: int, dimensions: int, seed: int) -> List[Tuple[Any, ...]]:
+    """(id, metadata, contents, embedding, distance) rows like a search returns."""
+    rng = np.random.default_rng(seed)
+    embeddings = rng.normal(size=(rows, dimensions)).astype(np.float32)
+    distances = np.sort(rng.random(rows))
+    return [
+        (
+            uuid.uuid1(),
+            {
+                "agreement_date": f"20{i % 24:02d}-01-15",
+                "effective_date": f"20{i % 24:02d}-02-01",
+                "expiration_date": f"20{i % 24 + 3:02d}-02-01",
+                "chunk_index": i % 4,
+            },
+            f"Clause {i}: the Supplier shall indemnify the Customer against all losses.",
+            embeddings[i],
+            float(distances[i]),
+        )
+        for i in range(rows)
+    ]
+
+
+def previous_format(results: List[Tuple[Any, ...]]) -> pd.DataFrame:
+    """The formatting used before lean results."""
+    df = pd.DataFrame(results, columns=["id", "metadata", "content", "embedding", "distance"])
+    df = pd.concat([df.drop(["metadata"], axis=1), df["metadata"].apply(pd.Series)], axis=1)
+    df["id"] = df["id"].astype(str)
+    df["metadata"] = df.apply(
+        lambda x: {
+            "agreement_date": x["agreement_date"],
+            "effective_date": x["effective_date"],
+            "expiration_date": x["expiration_date"],
+        },
+        axis=1,
+    )
+    return df
+
+
+def lean_format(results: List[Tuple[Any, ...]]) -> pd.DataFrame:
+    """The current formatting (see VectorStore._create_dataframe_from_results)."""
+    return add_context_metadata(VectorStore._create_dataframe_from_results(results))
+
+
+def measure(name: str, func: Callable[[], pd.DataFrame], repeat: int) -> float:
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        df = func()
+        best = min(best, time.perf_counter() - start)
+    print(f"{name:<10} {best * 1000:10.1f} ms  {len(df) / best:12.0f} rows/sec")
+    return best
+
+
+def run(rows: int, dimensions: int, repeat: int, seed: int) -> None:
+    full = synthetic_results(rows, dimensions, seed)
+    # The lean query returns the same rows without the embedding column
+    lean = [(id_, metadata, contents, distance) for id_, metadata, contents, _, distance in full]
+
+    print(f"rows={rows} dimensions={dimensions}")
+    previous = measure("previous", lambda: previous_format(full), repeat)
+    current = measure("lean", lambda: lean_format(lean), repeat)
+    print(f"speedup    {previous / current:10.1f}x")
+
+    # pgvector sends embeddings as text ("[0.123,...]"); estimate what skipping them saves
+    text_bytes = sum(len(str(row[3].tolist())) for row in full[:100]) / min(rows, 100) * rows
+    print(f"embedding column: ~{text_bytes / 1e6:.1f} MB per result set not transferred")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--rows", type=int, default=10_000)
+    parser.add_argument("--dimensions", type=int, default=768)
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+    run(args.rows, args.dimensions, args.repeat, args.seed)
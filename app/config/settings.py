@@ -2,7 +2,7 @@ import logging
 import os
 from datetime import timedelta
 from functools import lru_cache
-from typing import Optional
+from typing import List, Optional
 
 from dotenv import load_dotenv
 from pydantic import BaseModel, Field
@@ -30,6 +30,12 @@ class GeminiSettings(LLMSettings):
     api_key: str = Field(default_factory=lambda: os.getenv("GEMINI_API_KEY"))
     default_model: str = Field(default="gemini-1.5-flash")
     embedding_model: str = Field(default="models/text-embedding-004")
+    requests_per_minute: float = 60.0
+    rate_limit_burst: int = 5
+    min_requests_per_minute: float = 6.0
+    rate_limit_base_delay: float = 2.0
+    rate_limit_max_delay: float = 60.0
+    max_concurrent_requests: int = 4
 
 
 class DatabaseSettings(BaseModel):
@@ -38,12 +44,149 @@ class DatabaseSettings(BaseModel):
     service_url: str = Field(default_factory=lambda: os.getenv("TIMESCALE_SERVICE_URL"))
 
 
+class IndexSettings(BaseModel):
+    """Settings for the embedding index and per-query search tuning."""
+
+    # "diskann", "hnsw" or "ivfflat"; halfvec storage always uses hnsw
+    index_type: str = "diskann"
+    # DiskANN build parameters (None keeps the pgvectorscale defaults)
+    num_neighbors: Optional[int] = None
+    search_list_size: Optional[int] = None
+    max_alpha: Optional[float] = None
+    storage_layout: Optional[str] = None
+    # HNSW build parameters
+    m: Optional[int] = None
+    ef_construction: Optional[int] = None
+    # IVFFlat build parameter (None derives it from the row count)
+    lists: Optional[int] = None
+    # Per-query recall/latency knobs, applied with SET LOCAL before each search
+    query_search_list_size: Optional[int] = None
+    query_rescore: Optional[int] = None
+    ef_search: Optional[int] = None
+    probes: Optional[int] = None
+
+
+class SearchPlanSettings(BaseModel):
+    """Settings for choosing how filtered searches find their nearest neighbours."""
+
+    enabled: bool = True
+    # Filters the planner estimates to match at most this many rows are scanned exactly
+    exact_max_rows: int = 20_000
+    # Broader filters over-fetch limit / selectivity * overfetch_margin ANN candidates,
+    # growing by overfetch_growth until limit rows pass the filter
+    overfetch_margin: float = 2.0
+    overfetch_growth: int = 4
+    max_candidates: int = 20_000
+
+
+class LocalIndexSettings(BaseModel):
+    """Settings for the IVF-PQ index of the local backend."""
+
+    # Local stores with fewer records are searched exactly
+    min_rows: int = 50_000
+    # Coarse lists (None uses the square root of the row count at build time)
+    nlist: Optional[int] = None
+    # Product-quantization sub-vectors; must divide the embedding dimension
+    pq_subvectors: int = 48
+    train_sample: int = 100_000
+    kmeans_iterations: int = 15
+    # Lists scanned per query, doubled while fewer than limit rows pass a filter
+    nprobe: int = 16
+    # Approximate candidates re-ranked with exact distances from the matrix
+    rerank: int = 200
+    # Inserts are merged into the sorted lists once they exceed this share of the index
+    tail_fraction: float = 0.1
+    # Filters passing at most this many records are searched exactly
+    exact_max_rows: int = 20_000
+
+
 class VectorStoreSettings(BaseModel):
     """Settings for the VectorStore."""
 
+    # "timescale" searches TimescaleDB; "local" keeps embeddings in a memory-mapped
+    # NumPy matrix under local_store_path and searches in-process (no database)
+    backend: str = "timescale"
+    local_store_path: str = "data/local_vector_store"
+    # Local deletes leave tombstones; the matrix and index are rewritten without
+    # them once they exceed this fraction of the rows
+    local_compact_fraction: float = 0.2
     table_name: str = "embeddings_1"
-    embedding_dimensions: int = 1536
-    time_partition_interval: timedelta = timedelta(days=7)
+    # None uses the embedding model's size; a set value must match the model
+    embedding_dimensions: Optional[int] = None
+    # "vector" stores float32, "halfvec" stores float16 (half the size, HNSW only)
+    embedding_storage: str = "vector"
+    # Ids carry each contract's agreement date, so partitions span contract time
+    time_partition_interval: timedelta = timedelta(days=365)
+    embedding_batch_size: int = 100
+    embedding_concurrency: int = 4
+    ingest_batch_size: int = 500
+    # Rows per staging-table COPY and merge transaction in VectorStore.bulk_upsert
+    copy_batch_size: int = 100_000
+    embedding_cache_path: Optional[str] = "data/embedding_cache.sqlite"
+    embedding_cache_max_entries: int = 100_000
+    # "gemini" calls GeminiSettings.embedding_model; "local" runs a
+    # sentence-transformers model in-process
+    embedding_backend: str = "gemini"
+    local_embedding_model: str = "sentence-transformers/all-MiniLM-L6-v2"
+    local_embedding_batch_size: int = 64
+    local_embedding_threads: Optional[int] = None
+    # Hybrid search fuses full-text and vector rankings with reciprocal rank fusion
+    hybrid_search: bool = True
+    hybrid_candidates: int = 50
+    rrf_k: int = 60
+    text_search_config: str = "english"
+    # Metadata keys (ISO dates) stored as indexed, typed date columns for date_range filters
+    date_columns: List[str] = Field(
+        default_factory=lambda: ["agreement_date", "effective_date", "expiration_date"]
+    )
+    index: IndexSettings = Field(default_factory=IndexSettings)
+    planner: SearchPlanSettings = Field(default_factory=SearchPlanSettings)
+    local_index: LocalIndexSettings = Field(default_factory=LocalIndexSettings)
+
+
+class ResponseCacheSettings(BaseModel):
+    """Settings for caching synthesized responses."""
+
+    path: Optional[str] = "data/response_cache.sqlite"
+    max_entries: int = 10_000
+    ttl: Optional[timedelta] = timedelta(days=30)
+    similarity_threshold: Optional[float] = None
+
+
+class ChunkingSettings(BaseModel):
+    """Settings for splitting contracts into clause-aware chunks."""
+
+    max_bytes: int = 8000
+    overlap_bytes: int = 400
+    ingest_max_bytes: int = 9900
+    # Content-defined chunks the map step assesses and caches: average size and
+    # the cap for the rare runs without a cut point
+    map_target_bytes: int = 4000
+    map_max_bytes: int = 16_000
+
+
+class ContextSettings(BaseModel):
+    """Settings for packing the contract and retrieved context into a prompt."""
+
+    max_tokens: int = 24_000
+    question_share: float = 0.6
+    duplicate_threshold: float = 0.95
+    # Contracts that do not fit their share of the budget are analysed chunk by chunk
+    map_reduce: bool = True
+
+
+class PipelineSettings(BaseModel):
+    """Settings for the concurrent contract analysis pipeline."""
+
+    queue_size: int = 4
+    # Each retrieval worker extracts a contract and searches its chunks in
+    # batches of retrieve_batch_chunks as the pages come in
+    retrieve_workers: int = 2
+    retrieve_batch_chunks: int = 16
+    synthesize_workers: int = 4
+    render_workers: int = 1
+    pdf_workers: Optional[int] = None
+    pdf_parallel_page_threshold: int = 50
 
 
 class Settings(BaseModel):
@@ -51,6 +194,10 @@ class Settings(BaseModel):
     gemini: GeminiSettings = Field(default_factory=GeminiSettings)
     database: DatabaseSettings = Field(default_factory=DatabaseSettings)
     vector_store: VectorStoreSettings = Field(default_factory=VectorStoreSettings)
+    chunking: ChunkingSettings = Field(default_factory=ChunkingSettings)
+    context: ContextSettings = Field(default_factory=ContextSettings)
+    response_cache: ResponseCacheSettings = Field(default_factory=ResponseCacheSettings)
+    pipeline: PipelineSettings = Field(default_factory=PipelineSettings)
 
 
 @lru_cache()
@@ -0,0 +1,134 @@
+import io
+import itertools
+import json
+import struct
+import uuid
+from typing import Any, Dict, Iterable, Iterator, Optional, Sequence, Union
+
+import numpy as np
+
+# PostgreSQL binary COPY framing: signature, flags and header extension length
+COPY_HEADER = b"PGCOPY\n\xff\r\n\x00" + struct.pack(">ii", 0, 0)
+COPY_TRAILER = struct.pack(">h", -1)
+
+# Staging table columns, in the order rows are encoded
+COPY_COLUMNS = ("id", "metadata", "contents", "embedding")
+
+# Wire format of each pgvector column type's elements
+_ELEMENT_TYPES = {"vector": ">f4", "halfvec": ">f2"}
+
+_NULL = struct.pack(">i", -1)
+_ROW_START = struct.pack(">h", len(COPY_COLUMNS))
+_JSONB_VERSION = b"\x01"
+
+Record = Union[Dict[str, Any], Sequence[Any]]
+
+
+def _field(data: bytes) -> bytes:
+    return struct.pack(">i", len(data)) + data
+
+
+def encode_row(
+    record: Record, vector_type: str = "vector", dimensions: Optional[int] = None
+) -> bytes:
+    """
+    Encode one record as a binary COPY tuple.
+
+    Args:
+        record: A dict with id, metadata, contents and embedding keys, or an
+            (id, metadata, contents, embedding) tuple.
+        vector_type: The embedding column type, "vector" or "halfvec".
+        dimensions: If set, the embedding length every record must have.
+
+    Returns:
+        The encoded tuple.
+    """
+    if isinstance(record, dict):
+        id_, metadata, contents, embedding = (record.get(column) for column in COPY_COLUMNS)
+    else:
+        id_, metadata, contents, embedding = record
+
+    parts = [_ROW_START]
+    parts.append(_NULL if id_ is None else _field(uuid.UUID(str(id_)).bytes))
+    if metadata is None:
+        parts.append(_NULL)
+    else:
+        if not isinstance(metadata, str):
+            metadata = json.dumps(metadata)
+        parts.append(_field(_JSONB_VERSION + metadata.encode("utf-8")))
+    parts.append(_NULL if contents is None else _field(contents.encode("utf-8")))
+    if embedding is None:
+        parts.append(_NULL)
+    else:
+        values = np.asarray(embedding, dtype=_ELEMENT_TYPES[vector_type])
+        if dimensions is not None and len(values) != dimensions:
+            raise ValueError(
+                f"Record {id_} has a {len(values)}-dimensional embedding, expected {dimensions}"
+            )
+        # pgvector's binary format: int16 dimensions, int16 unused, then the elements
+        parts.append(_field(struct.pack(">hh", len(values), 0) + values.tobytes()))
+    return b"".join(parts)
+
+
+class CopyStream(io.RawIOBase):
+    """
+    A read-only file object that encodes records into binary COPY data on demand.
+
+    cursor.copy_expert reads from it in blocks, so records are encoded while
+    the COPY runs and only one block is held in memory at a time.
+    """
+
+    def __init__(
+        self,
+        records: Iterable[Record],
+        vector_type: str = "vector",
+        dimensions: Optional[int] = None,
+    ):
+        self.rows = 0
+        self._chunks = self._encode(iter(records), vector_type, dimensions)
+        self._buffer = b""
+
+    def _encode(
+        self, records: Iterator[Record], vector_type: str, dimensions: Optional[int]
+    ) -> Iterator[bytes]:
+        yield COPY_HEADER
+        for record in records:
+            self.rows += 1
+            yield encode_row(record, vector_type, dimensions)
+        yield COPY_TRAILER
+
+    def readable(self) -> bool:
+        return True
+
+    def read(self, size: int = -1) -> bytes:
+        if size is None or size < 0:
+            data = self._buffer + b"".join(self._chunks)
+            self._buffer = b""
+            return data
+
+        parts, length = [self._buffer], len(self._buffer)
+        while length < size:
+            chunk = next(self._chunks, None)
+            if chunk is None:
+                break
+            parts.append(chunk)
+            length += len(chunk)
+        data = b"".join(parts)
+        self._buffer = data[size:]
+        return data[:size]
+
+    def readinto(self, buffer) -> int:
+        data = self.read(len(buffer))
+        buffer[: len(data)] = data
+        return len(data)
+
+
+def batches(records: Iterable[Record], batch_size: int) -> Iterator[Iterator[Record]]:
+    """
+    Split records into lazy batches of at most batch_size without materializing them.
+
+    Each batch must be consumed before the next one is requested.
+    """
+    iterator = iter(records)
+    for first in iterator:
+        yield itertools.chain([first], itertools.islice(iterator, batch_size - 1))
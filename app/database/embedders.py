@@ -0,0 +1,154 @@
+import logging
+import os
+import time
+from abc import ABC, abstractmethod
+from concurrent.futures import ThreadPoolExecutor
+from typing import List, Optional
+
+import google.generativeai as genai
+from config.settings import Settings
+from services.rate_limiter import retry_with_backoff
+
+
+class Embedder(ABC):
+    """
+    Base class for embedding backends.
+
+    model_name identifies the model in the embedding cache, so embeddings
+    from different backends never mix.
+    """
+
+    model_name: str
+
+    @abstractmethod
+    def embed(self, texts: List[str]) -> List[List[float]]:
+        """Embed texts, returning one embedding per text in input order."""
+
+    @property
+    def dimensions(self) -> int:
+        """Length of the embeddings this backend returns, probed once if unknown."""
+        if getattr(self, "_dimensions", None) is None:
+            self._dimensions = len(self.embed(["dimension probe"])[0])
+        return self._dimensions
+
+
+class GeminiEmbedder(Embedder):
+    """Embeds texts with the Gemini API using batched, concurrent requests."""
+
+    # Output sizes of known models, so no request is needed to look them up
+    KNOWN_DIMENSIONS = {
+        "models/text-embedding-004": 768,
+        "models/embedding-001": 768,
+    }
+
+    def __init__(self, settings: Settings):
+        genai.configure(api_key=os.getenv("GEMINI_API_KEY"))
+        self.model_name = settings.gemini.embedding_model
+        self._dimensions = self.KNOWN_DIMENSIONS.get(self.model_name)
+        self.max_retries = settings.gemini.max_retries
+        self.batch_size = settings.vector_store.embedding_batch_size
+        self.concurrency = settings.vector_store.embedding_concurrency
+
+    def embed(self, texts: List[str]) -> List[List[float]]:
+        """
+        Split texts into batches of `embedding_batch_size` and run up to
+        `embedding_concurrency` batch requests at once.
+        """
+        if not texts:
+            return []
+
+        batches = [
+            texts[i : i + self.batch_size] for i in range(0, len(texts), self.batch_size)
+        ]
+        start_time = time.time()
+        with ThreadPoolExecutor(max_workers=min(self.concurrency, len(batches))) as executor:
+            results = list(executor.map(self._embed_batch, batches))
+        elapsed_time = time.time() - start_time
+
+        embeddings = [embedding for batch in results for embedding in batch]
+        logging.info(
+            f"Generated {len(embeddings)} embeddings in {len(batches)} batches "
+            f"in {elapsed_time:.3f} seconds"
+        )
+        return embeddings
+
+    def _embed_batch(self, texts: List[str]) -> List[List[float]]:
+        """Embed a single batch, retrying when the provider rate-limits us."""
+        texts = [text.replace("\n", " ") for text in texts]
+        return retry_with_backoff(
+            lambda: self._request_embeddings(texts),
+            max_retries=self.max_retries,
+        )
+
+    def _request_embeddings(self, texts: List[str]) -> List[List[float]]:
+        """Send one batch embedding request to Gemini."""
+        return genai.embed_content(model=self.model_name, content=texts)["embedding"]
+
+
+class LocalEmbedder(Embedder):
+    """
+    Embeds texts in-process with a sentence-transformers model.
+
+    Inference runs in batches of `batch_size` on the CPU (or `device`), so
+    ingest and search need no network access once the model is downloaded.
+    num_threads caps the torch intra-op threads for this process.
+    """
+
+    def __init__(
+        self,
+        model_name: str,
+        batch_size: int = 64,
+        num_threads: Optional[int] = None,
+        device: str = "cpu",
+    ):
+        try:
+            import torch
+            from sentence_transformers import SentenceTransformer
+        except ImportError as e:
+            raise ImportError(
+                "The local embedding backend requires torch and sentence-transformers: "
+                "pip install torch sentence-transformers"
+            ) from e
+
+        if num_threads:
+            torch.set_num_threads(num_threads)
+        self.model_name = f"local/{model_name}"
+        self.batch_size = batch_size
+        self.model = SentenceTransformer(model_name, device=device)
+        self._dimensions = self.model.get_sentence_embedding_dimension()
+
+    def embed(self, texts: List[str]) -> List[List[float]]:
+        if not texts:
+            return []
+
+        start_time = time.time()
+        embeddings = self.model.encode(
+            texts,
+            batch_size=self.batch_size,
+            convert_to_numpy=True,
+            normalize_embeddings=True,
+            show_progress_bar=False,
+        )
+        elapsed_time = time.time() - start_time
+        logging.info(
+            f"Generated {len(texts)} local embeddings in {elapsed_time:.3f} seconds "
+            f"({len(texts) / max(elapsed_time, 1e-9):.1f} texts/sec)"
+        )
+        return embeddings.tolist()
+
+
+def create_embedder(settings: Settings) -> Embedder:
+    """Create the embedding backend selected by VectorStoreSettings.embedding_backend."""
+    vector_settings = settings.vector_store
+    if vector_settings.embedding_backend == "gemini":
+        return GeminiEmbedder(settings)
+    if vector_settings.embedding_backend == "local":
+        return LocalEmbedder(
+            vector_settings.local_embedding_model,
+            batch_size=vector_settings.local_embedding_batch_size,
+            num_threads=vector_settings.local_embedding_threads,
+        )
+    raise ValueError(
+        f"Unknown embedding backend: {vector_settings.embedding_backend!r} "
+        "(expected 'gemini' or 'local')"
+    )
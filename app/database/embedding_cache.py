@@ -0,0 +1,152 @@
+import hashlib
+import logging
+import os
+import sqlite3
+import threading
+import time
+from typing import Dict, List, Optional
+
+import numpy as np
+
+
+class EmbeddingCache:
+    """A persistent, size-bounded LRU cache of embeddings backed by SQLite."""
+
+    # SQLite limits the number of bound parameters per statement
+    _MAX_PARAMS = 500
+
+    def __init__(self, path: str, max_entries: int = 100_000):
+        """
+        Open (or create) the cache database.
+
+        Args:
+            path: Path of the SQLite file.
+            max_entries: Entries to keep before the least recently used are evicted.
+        """
+        self.path = path
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._conn = sqlite3.connect(path, timeout=30, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS embeddings (
+                key TEXT PRIMARY KEY,
+                embedding BLOB NOT NULL,
+                last_used REAL NOT NULL
+            )
+            """
+        )
+        self._conn.execute(
+            "CREATE INDEX IF NOT EXISTS embeddings_last_used_idx ON embeddings (last_used)"
+        )
+        self._conn.commit()
+
+    @staticmethod
+    def normalize(text: str) -> str:
+        """Collapse whitespace so trivially different copies share an entry."""
+        return " ".join(text.split())
+
+    @classmethod
+    def make_key(cls, model: str, text: str) -> str:
+        """Cache key for a (model name, normalized text) pair."""
+        digest = hashlib.sha256(cls.normalize(text).encode("utf-8")).hexdigest()
+        return f"{model}:{digest}"
+
+    def get_many(self, model: str, texts: List[str]) -> List[Optional[List[float]]]:
+        """
+        Look up embeddings for many texts.
+
+        Args:
+            model: The embedding model name.
+            texts: The texts to look up.
+
+        Returns:
+            A list aligned with texts holding the cached embedding or None.
+        """
+        keys = [self.make_key(model, text) for text in texts]
+        found: Dict[str, List[float]] = {}
+        unique_keys = list(dict.fromkeys(keys))
+
+        with self._lock:
+            for i in range(0, len(unique_keys), self._MAX_PARAMS):
+                batch = unique_keys[i : i + self._MAX_PARAMS]
+                placeholders = ",".join("?" * len(batch))
+                rows = self._conn.execute(
+                    f"SELECT key, embedding FROM embeddings WHERE key IN ({placeholders})",
+                    batch,
+                ).fetchall()
+                for key, blob in rows:
+                    found[key] = np.frombuffer(blob, dtype=np.float32).tolist()
+
+            if found:
+                now = time.time()
+                self._conn.executemany(
+                    "UPDATE embeddings SET last_used = ? WHERE key = ?",
+                    [(now, key) for key in found],
+                )
+                self._conn.commit()
+
+            results = [found.get(key) for key in keys]
+            hits = sum(result is not None for result in results)
+            self.hits += hits
+            self.misses += len(results) - hits
+        return results
+
+    def get(self, model: str, text: str) -> Optional[List[float]]:
+        """Look up the embedding for a single text."""
+        return self.get_many(model, [text])[0]
+
+    def put_many(self, model: str, texts: List[str], embeddings: List[List[float]]) -> None:
+        """Store embeddings and evict least recently used entries over the limit."""
+        now = time.time()
+        rows = [
+            (self.make_key(model, text), np.asarray(embedding, dtype=np.float32).tobytes(), now)
+            for text, embedding in zip(texts, embeddings)
+        ]
+        with self._lock:
+            self._conn.executemany(
+                "INSERT OR REPLACE INTO embeddings (key, embedding, last_used) VALUES (?, ?, ?)",
+                rows,
+            )
+            self._evict()
+            self._conn.commit()
+
+    def put(self, model: str, text: str, embedding: List[float]) -> None:
+        """Store the embedding for a single text."""
+        self.put_many(model, [text], [embedding])
+
+    def _evict(self) -> None:
+        """Delete the least recently used entries beyond max_entries."""
+        (count,) = self._conn.execute("SELECT COUNT(*) FROM embeddings").fetchone()
+        excess = count - self.max_entries
+        if excess > 0:
+            self._conn.execute(
+                "DELETE FROM embeddings WHERE key IN "
+                "(SELECT key FROM embeddings ORDER BY last_used ASC LIMIT ?)",
+                (excess,),
+            )
+            logging.info(f"Evicted {excess} entries from embedding cache")
+
+    def stats(self) -> Dict[str, float]:
+        """Return hit/miss counters and the current number of entries."""
+        with self._lock:
+            (entries,) = self._conn.execute("SELECT COUNT(*) FROM embeddings").fetchone()
+            lookups = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+                "entries": entries,
+            }
+
+    def close(self) -> None:
+        """Close the underlying database connection."""
+        with self._lock:
+            self._conn.close()
@@ -0,0 +1,454 @@
+import json
+import logging
+import os
+import time
+from typing import Any, Dict, List, NamedTuple, Optional
+
+import numpy as np
+
+MANIFEST_FILE = "index.json"
+
+
+def normalize(vectors: np.ndarray) -> np.ndarray:
+    """Scale vectors to unit length, so squared L2 distance is 2 * cosine distance."""
+    vectors = np.asarray(vectors, dtype=np.float32)
+    norms = np.linalg.norm(vectors, axis=-1, keepdims=True)
+    return vectors / np.maximum(norms, 1e-12)
+
+
+def nearest_centroids(vectors: np.ndarray, centroids: np.ndarray, chunk: int = 8192) -> np.ndarray:
+    """Index of the nearest centroid (squared L2) for every vector, chunk rows at a time."""
+    centroid_norms = (centroids ** 2).sum(axis=1)
+    assignments = np.empty(len(vectors), dtype=np.int32)
+    for start in range(0, len(vectors), chunk):
+        block = np.asarray(vectors[start : start + chunk], dtype=np.float32)
+        assignments[start : start + chunk] = np.argmin(
+            centroid_norms - 2.0 * block @ centroids.T, axis=1
+        )
+    return assignments
+
+
+def kmeans(data: np.ndarray, k: int, iterations: int, rng: np.random.Generator) -> np.ndarray:
+    """
+    Lloyd's k-means with random initial centroids.
+
+    Empty clusters are reseeded with random points, so all k centroids are
+    used. Returns min(k, len(data)) centroids.
+    """
+    data = np.asarray(data, dtype=np.float32)
+    k = min(k, len(data))
+    centroids = data[rng.choice(len(data), k, replace=False)].copy()
+    for _ in range(iterations):
+        assignments = nearest_centroids(data, centroids)
+        order = np.argsort(assignments, kind="stable")
+        counts = np.bincount(assignments, minlength=k)
+        used = np.flatnonzero(counts)
+        starts = np.concatenate([[0], np.cumsum(counts)[:-1]])[used]
+        centroids[used] = np.add.reduceat(data[order], starts, axis=0) / counts[used, None]
+        empty = np.flatnonzero(counts == 0)
+        if len(empty):
+            centroids[empty] = data[rng.choice(len(data), len(empty), replace=False)]
+    return centroids
+
+
+class MappedIndex(NamedTuple):
+    """One generation of the index: its manifest and mapped arrays."""
+
+    manifest: Dict[str, Any]
+    arrays: Dict[str, np.ndarray]
+
+
+class IVFPQIndex:
+    """
+    Approximate nearest-neighbour index (IVF with product quantization) in NumPy.
+
+    Vectors are normalized and assigned to the nearest of `nlist` coarse
+    centroids; the residual is split into `subvectors` parts, each stored as
+    the one-byte id of its nearest codeword. A query scans the codes of the
+    `nprobe` closest lists with per-list distance lookup tables.
+
+    Everything is stored under `path` as raw arrays that are memory-mapped
+    read-only, so any number of processes can search one index while
+    sharing the page cache. index.json names the current generation of the
+    files and how many rows each holds; writers create new files and swap
+    index.json atomically, and refresh() picks the change up. Searches run
+    against one MappedIndex, so a concurrent refresh never mixes
+    generations. There should be a single writer process.
+
+    Rows are identified by their position in the owning store, and the
+    manifest records which vectors (the owner's `source`, e.g. a file name)
+    those positions refer to. Inserts are
+    encoded with the trained quantizers and appended to an unsorted tail
+    that is merged into the sorted lists once it grows; deletes remap the
+    remaining positions. Both leave the trained quantizers unchanged.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self.mapped: Optional[MappedIndex] = None
+        self._manifest_key = None
+        self.refresh()
+
+    @property
+    def exists(self) -> bool:
+        return self.mapped is not None
+
+    @property
+    def manifest(self) -> Optional[Dict[str, Any]]:
+        return self.mapped.manifest if self.mapped else None
+
+    @property
+    def arrays(self) -> Dict[str, np.ndarray]:
+        return self.mapped.arrays if self.mapped else {}
+
+    @property
+    def covered(self) -> int:
+        """Number of leading store positions the index holds."""
+        return self.manifest["covered"] if self.mapped else 0
+
+    @property
+    def nlist(self) -> int:
+        return self.manifest["nlist"] if self.mapped else 0
+
+    def _file(self, name: str, generation: int) -> str:
+        return os.path.join(self.path, f"{name}.{generation}.bin")
+
+    def _map(self, name: str, dtype: Any, shape: tuple, generation: int) -> np.ndarray:
+        if 0 in shape:
+            return np.empty(shape, dtype=dtype)
+        return np.memmap(self._file(name, generation), dtype=dtype, mode="r", shape=shape)
+
+    def refresh(self) -> None:
+        """Map the current generation of the index files if they changed."""
+        manifest_path = os.path.join(self.path, MANIFEST_FILE)
+        for _ in range(3):
+            try:
+                stat = os.stat(manifest_path)
+            except FileNotFoundError:
+                self.mapped, self._manifest_key = None, None
+                return
+            key = (stat.st_ino, stat.st_mtime_ns, stat.st_size)
+            if key == self._manifest_key:
+                return
+            try:
+                with open(manifest_path) as f:
+                    manifest = json.load(f)
+                arrays = self._map_manifest(manifest)
+            except FileNotFoundError:
+                # A writer replaced the generation between the two reads; try again
+                continue
+            self.mapped, self._manifest_key = MappedIndex(manifest, arrays), key
+            return
+        raise RuntimeError(f"Index files under {self.path} keep changing; could not map them")
+
+    def _map_manifest(self, manifest: Dict[str, Any]) -> Dict[str, np.ndarray]:
+        generation, nlist = manifest["generation"], manifest["nlist"]
+        dimensions, subvectors = manifest["dimensions"], manifest["subvectors"]
+        main_count, tail_count = manifest["main_count"], manifest["tail_count"]
+        shapes = {
+            "centroids": (np.float32, (nlist, dimensions)),
+            "codebooks": (np.float32, (subvectors, manifest["ksub"], dimensions // subvectors)),
+            "offsets": (np.int64, (nlist + 1,)),
+            "main_codes": (np.uint8, (main_count, subvectors)),
+            "main_rows": (np.int64, (main_count,)),
+            "tail_codes": (np.uint8, (tail_count, subvectors)),
+            "tail_rows": (np.int64, (tail_count,)),
+            "tail_lists": (np.int32, (tail_count,)),
+        }
+        arrays = {
+            name: self._map(name, dtype, shape, generation)
+            for name, (dtype, shape) in shapes.items()
+        }
+        # The quantizers are small and read by every query; keep them in memory
+        arrays["centroids"] = np.array(arrays["centroids"])
+        arrays["codebooks"] = np.array(arrays["codebooks"])
+        arrays["centroid_norms"] = (arrays["centroids"] ** 2).sum(axis=1)
+        arrays["codebook_norms"] = (arrays["codebooks"] ** 2).sum(axis=2)
+        return arrays
+
+    def _write_manifest(self, manifest: Dict[str, Any]) -> None:
+        manifest_path = os.path.join(self.path, MANIFEST_FILE)
+        with open(manifest_path + ".tmp", "w") as f:
+            json.dump(manifest, f)
+        os.replace(manifest_path + ".tmp", manifest_path)
+        self.refresh()
+
+    def _remove_other_generations(self, generation: int) -> None:
+        suffix = f".{generation}.bin"
+        for name in os.listdir(self.path):
+            if name.endswith(".bin") and not name.endswith(suffix):
+                os.remove(os.path.join(self.path, name))
+
+    @staticmethod
+    def _encode(
+        vectors: np.ndarray, centroids: np.ndarray, codebooks: np.ndarray, chunk: int = 65536
+    ) -> tuple:
+        """Coarse list and PQ codes for each vector, chunk rows at a time."""
+        subvectors, _, dsub = codebooks.shape
+        lists = np.empty(len(vectors), dtype=np.int32)
+        codes = np.empty((len(vectors), subvectors), dtype=np.uint8)
+        for start in range(0, len(vectors), chunk):
+            block = normalize(vectors[start : start + chunk])
+            block_lists = nearest_centroids(block, centroids)
+            residuals = block - centroids[block_lists]
+            for s in range(subvectors):
+                codes[start : start + len(block), s] = nearest_centroids(
+                    residuals[:, s * dsub : (s + 1) * dsub], codebooks[s]
+                )
+            lists[start : start + len(block)] = block_lists
+        return lists, codes
+
+    def _write_generation(
+        self,
+        centroids: np.ndarray,
+        codebooks: np.ndarray,
+        lists: np.ndarray,
+        codes: np.ndarray,
+        rows: np.ndarray,
+        covered: int,
+        source: str,
+    ) -> None:
+        """Write a complete new generation with every row in the sorted lists and switch to it."""
+        generation = self.manifest["generation"] + 1 if self.manifest else 1
+        order = np.argsort(lists, kind="stable")
+        offsets = np.concatenate([[0], np.cumsum(np.bincount(lists, minlength=len(centroids)))])
+        os.makedirs(self.path, exist_ok=True)
+        arrays = {
+            "centroids": np.asarray(centroids, dtype=np.float32),
+            "codebooks": np.asarray(codebooks, dtype=np.float32),
+            "offsets": offsets.astype(np.int64),
+            "main_codes": np.asarray(codes, dtype=np.uint8)[order],
+            "main_rows": np.asarray(rows, dtype=np.int64)[order],
+            "tail_codes": np.empty((0, codebooks.shape[0]), dtype=np.uint8),
+            "tail_rows": np.empty(0, dtype=np.int64),
+            "tail_lists": np.empty(0, dtype=np.int32),
+        }
+        for name, array in arrays.items():
+            with open(self._file(name, generation), "wb") as f:
+                f.write(np.ascontiguousarray(array).tobytes())
+        self._write_manifest({
+            "generation": generation,
+            "dimensions": int(centroids.shape[1]),
+            "nlist": int(len(centroids)),
+            "subvectors": int(codebooks.shape[0]),
+            "ksub": int(codebooks.shape[1]),
+            "main_count": int(len(rows)),
+            "tail_count": 0,
+            "covered": int(covered),
+            "source": source,
+        })
+        self._remove_other_generations(generation)
+
+    def build(
+        self,
+        vectors: np.ndarray,
+        nlist: int,
+        subvectors: int,
+        train_sample: int = 100_000,
+        iterations: int = 15,
+        seed: int = 0,
+        source: str = "",
+    ) -> None:
+        """
+        Train the quantizers on a sample of vectors and index all of them.
+
+        Args:
+            vectors: The store's embedding matrix; row i is position i.
+            nlist: Number of coarse lists.
+            subvectors: Number of PQ sub-vectors; must divide the dimension.
+            train_sample: Vectors sampled to train the quantizers.
+            iterations: k-means iterations.
+            seed: Seed for sampling and centroid initialization.
+            source: Identifies the vectors indexed.
+        """
+        dimensions = vectors.shape[1]
+        if dimensions % subvectors:
+            raise ValueError(
+                f"pq_subvectors ({subvectors}) must divide the embedding dimension ({dimensions})"
+            )
+        start_time = time.time()
+        rng = np.random.default_rng(seed)
+        sample_rows = np.sort(rng.choice(len(vectors), min(train_sample, len(vectors)), replace=False))
+        sample = normalize(vectors[sample_rows])
+
+        centroids = kmeans(sample, nlist, iterations, rng)
+        residuals = sample - centroids[nearest_centroids(sample, centroids)]
+        dsub = dimensions // subvectors
+        codebooks = np.stack([
+            kmeans(residuals[:, s * dsub : (s + 1) * dsub], 256, iterations, rng)
+            for s in range(subvectors)
+        ])
+        train_time = time.time() - start_time
+
+        lists, codes = self._encode(vectors, centroids, codebooks)
+        self._write_generation(
+            centroids, codebooks, lists, codes, np.arange(len(vectors)), len(vectors), source
+        )
+        logging.info(
+            f"Built IVF-PQ index over {len(vectors)} vectors ({len(centroids)} lists, "
+            f"{subvectors} sub-vectors) in {time.time() - start_time:.1f} seconds "
+            f"({train_time:.1f} training)"
+        )
+
+    def add(self, start: int, vectors: np.ndarray, tail_fraction: float = 0.1) -> bool:
+        """
+        Index vectors for store positions start, start + 1, ...
+
+        Returns False (leaving the index unchanged) if start is not the next
+        uncovered position; the owner searches uncovered positions exactly.
+        """
+        self.refresh()
+        if not self.exists or start != self.covered or not len(vectors):
+            return False
+
+        arrays = self.arrays
+        lists, codes = self._encode(vectors, arrays["centroids"], arrays["codebooks"])
+        manifest = dict(self.manifest)
+        generation, tail_count = manifest["generation"], manifest["tail_count"]
+        rows = np.arange(start, start + len(vectors), dtype=np.int64)
+        for name, array in (("tail_codes", codes), ("tail_rows", rows), ("tail_lists", lists)):
+            # Write after the committed rows, overwriting anything an interrupted add left
+            with open(self._file(name, generation), "r+b") as f:
+                f.seek(tail_count * array[:1].nbytes)
+                f.write(array.tobytes())
+                f.truncate()
+        manifest["tail_count"] = tail_count + len(vectors)
+        manifest["covered"] = start + len(vectors)
+        self._write_manifest(manifest)
+
+        if manifest["tail_count"] > tail_fraction * max(manifest["main_count"], 1):
+            self._merge_tail()
+        return True
+
+    def _all_rows(self) -> tuple:
+        """Lists, codes and positions of every indexed row, sorted lists then tail."""
+        arrays = self.arrays
+        main_lists = np.repeat(
+            np.arange(self.nlist, dtype=np.int32), np.diff(arrays["offsets"])
+        )
+        return (
+            np.concatenate([main_lists, arrays["tail_lists"]]),
+            np.concatenate([arrays["main_codes"], arrays["tail_codes"]]),
+            np.concatenate([arrays["main_rows"], arrays["tail_rows"]]),
+        )
+
+    def _merge_tail(self) -> None:
+        """Rewrite the sorted lists with the tail merged in."""
+        lists, codes, rows = self._all_rows()
+        self._write_generation(
+            self.arrays["centroids"],
+            self.arrays["codebooks"],
+            lists,
+            codes,
+            rows,
+            self.covered,
+            self.manifest["source"],
+        )
+        logging.info(f"Merged the IVF-PQ tail; {self.manifest['main_count']} vectors in lists")
+
+    def remove(self, keep: np.ndarray, source: str) -> None:
+        """
+        Drop deleted positions and renumber the rest after the owner compacted.
+
+        Args:
+            keep: Mask over the owner's positions before the delete.
+            source: Identifies the compacted vectors.
+        """
+        self.refresh()
+        if not self.exists:
+            return
+        keep = np.asarray(keep, dtype=bool)
+        covered = min(self.covered, len(keep))
+        new_positions = np.cumsum(keep) - 1
+        lists, codes, rows = self._all_rows()
+        kept = (rows < covered) & keep[np.minimum(rows, len(keep) - 1)]
+        self._write_generation(
+            self.arrays["centroids"],
+            self.arrays["codebooks"],
+            lists[kept],
+            codes[kept],
+            new_positions[rows[kept]],
+            int(keep[:covered].sum()),
+            source,
+        )
+
+    def drop(self) -> None:
+        """Delete the index files."""
+        manifest_path = os.path.join(self.path, MANIFEST_FILE)
+        if os.path.exists(manifest_path):
+            os.remove(manifest_path)
+        if os.path.isdir(self.path):
+            self._remove_other_generations(-1)
+        self.mapped, self._manifest_key = None, None
+
+    def search(
+        self,
+        query: np.ndarray,
+        k: int,
+        nprobe: int,
+        allowed: Optional[np.ndarray] = None,
+        mapped: Optional[MappedIndex] = None,
+    ) -> np.ndarray:
+        """
+        Approximate k nearest positions to query, nearest first.
+
+        Args:
+            query: The query embedding.
+            k: Number of positions to return.
+            nprobe: Number of lists to scan.
+            allowed: Optional mask over positions; others are skipped.
+            mapped: The generation to search (default: the mapped one).
+        """
+        arrays = (mapped or self.mapped).arrays
+        centroids, codebooks, offsets = arrays["centroids"], arrays["codebooks"], arrays["offsets"]
+        subvectors, ksub, dsub = codebooks.shape
+        nlist = len(centroids)
+        query = normalize(query)
+        nprobe = min(nprobe, nlist)
+        coarse = arrays["centroid_norms"] - 2.0 * (centroids @ query)
+        probe = (
+            np.argpartition(coarse, nprobe - 1)[:nprobe] if nprobe < nlist else np.arange(nlist)
+        )
+
+        # Squared distances from each probed list's residual to every codeword
+        residuals = (query - centroids[probe]).reshape(nprobe, subvectors, dsub)
+        tables = (
+            (residuals ** 2).sum(axis=2)[:, :, None]
+            - 2.0 * np.einsum("psd,skd->psk", residuals, codebooks)
+            + arrays["codebook_norms"][None]
+        )
+
+        codes: List[np.ndarray] = []
+        rows: List[np.ndarray] = []
+        slots: List[np.ndarray] = []
+        for slot, list_id in enumerate(probe):
+            start, end = offsets[list_id], offsets[list_id + 1]
+            if end > start:
+                codes.append(arrays["main_codes"][start:end])
+                rows.append(arrays["main_rows"][start:end])
+                slots.append(np.full(end - start, slot, dtype=np.int32))
+        if len(arrays["tail_lists"]):
+            slot_of_list = np.full(nlist, -1, dtype=np.int32)
+            slot_of_list[probe] = np.arange(nprobe, dtype=np.int32)
+            tail_slots = slot_of_list[arrays["tail_lists"]]
+            in_probe = tail_slots >= 0
+            codes.append(arrays["tail_codes"][in_probe])
+            rows.append(arrays["tail_rows"][in_probe])
+            slots.append(tail_slots[in_probe])
+        if not rows:
+            return np.empty(0, dtype=np.int64)
+
+        codes, rows, slots = np.concatenate(codes), np.concatenate(rows), np.concatenate(slots)
+        if allowed is not None:
+            if not len(allowed):
+                return np.empty(0, dtype=np.int64)
+            passing = allowed[np.minimum(rows, len(allowed) - 1)] & (rows < len(allowed))
+            codes, rows, slots = codes[passing], rows[passing], slots[passing]
+        if not len(rows):
+            return rows
+
+        lookup = (slots[:, None] * subvectors + np.arange(subvectors, dtype=np.int32)) * ksub + codes
+        distances = tables.reshape(-1)[lookup].sum(axis=1)
+        k = min(k, len(rows))
+        top = np.argpartition(distances, k - 1)[:k]
+        return rows[top[np.argsort(distances[top], kind="stable")]]
@@ -0,0 +1,684 @@
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+import uuid
+from datetime import date, datetime
+from typing import Any, Dict, Iterable, List, Optional, Set, Tuple, Union
+
+import numpy as np
+import pandas as pd
+from database.bulk_copy import COPY_COLUMNS, Record, batches
+from database.ivfpq_index import IVFPQIndex
+from database.metadata_filter import MetadataFilter
+from database.vector_store import VectorStore
+from timescale_vector import client
+
+
+class LocalVectorStore(VectorStore):
+    """
+    In-process VectorStore backend that needs no database.
+
+    Embeddings are kept in a memory-mapped float32 matrix and ids, metadata
+    and contents in a SQLite file next to it, under
+    VectorStoreSettings.local_store_path. Searches apply the same filters as
+    VectorStore.search (see MetadataFilter). Small stores are searched
+    exactly: one matrix product per batch of queries and argpartition for
+    the top k. Once create_index has built the IVF-PQ index (see
+    IVFPQIndex and LocalIndexSettings), its candidates are re-ranked with
+    exact distances instead.
+
+    Row i of the matrix belongs to the record at position i. Deletes remove
+    the records from SQLite and leave their rows as tombstones that searches
+    skip; once tombstones pass VectorStoreSettings.local_compact_fraction of
+    the rows, the matrix and the index are rewritten without them. Any number
+    of processes can search one store; every write bumps a generation counter
+    that the others check before searching. Only one process should write.
+    """
+
+    RECORDS_FILE = "records.sqlite"
+    INDEX_DIRECTORY = "ivfpq"
+    # Filter masks kept per distinct filter until the next write
+    _MASK_CACHE_SIZE = 64
+
+    def __init__(self, path: Optional[str] = None):
+        """
+        Open (or create) the local store.
+
+        Args:
+            path: Directory for the store (default: VectorStoreSettings.local_store_path).
+        """
+        self._init_embeddings()
+        self.vec_client = None
+        self.path = path or self.vector_settings.local_store_path
+        self._lock = threading.Lock()
+        # Serializes index writes, which run without holding _lock; take it before _lock
+        self._index_lock = threading.Lock()
+        self._mask_cache: Dict[str, np.ndarray] = {}
+
+        os.makedirs(self.path, exist_ok=True)
+        self._conn = sqlite3.connect(
+            os.path.join(self.path, self.RECORDS_FILE), timeout=30, check_same_thread=False
+        )
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS records (
+                position INTEGER PRIMARY KEY,
+                id TEXT NOT NULL UNIQUE,
+                metadata TEXT,
+                contents TEXT
+            )
+            """
+        )
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS store_info (key TEXT PRIMARY KEY, value TEXT)"
+        )
+        self._conn.commit()
+        self._index = IVFPQIndex(os.path.join(self.path, self.INDEX_DIRECTORY))
+        self._load()
+
+    def _info(self, key: str, default: Optional[str] = None) -> Optional[str]:
+        row = self._conn.execute("SELECT value FROM store_info WHERE key = ?", (key,)).fetchone()
+        return row[0] if row else default
+
+    def _set_info(self, key: str, value: Any) -> None:
+        self._conn.execute(
+            "INSERT OR REPLACE INTO store_info (key, value) VALUES (?, ?)", (key, str(value))
+        )
+
+    def _matrix_path(self, name: Optional[str] = None) -> str:
+        return os.path.join(self.path, name or self._info("matrix_file", "embeddings.f32"))
+
+    def _load(self) -> None:
+        """Read the records and map the embedding matrix (call with the lock held or in __init__)."""
+        # One read transaction, so the records match store_info
+        self._conn.execute("BEGIN")
+        try:
+            self._generation = self._info("generation", "0")
+            records = self._conn.execute(
+                "SELECT position, id, metadata FROM records ORDER BY position"
+            ).fetchall()
+            # Matrix rows, including tombstones; stores without the key have none
+            row_count = int(self._info("rows", records[-1][0] + 1 if records else 0))
+            self._matrix_dimensions = int(self._info("dimensions", self.dimensions))
+            matrix_path = self._matrix_path()
+        finally:
+            self._conn.commit()
+        # Tombstoned positions have no id and no metadata
+        self._ids: List[Optional[uuid.UUID]] = [None] * row_count
+        self._metadata: List[Optional[dict]] = [None] * row_count
+        self._live = np.zeros(row_count, dtype=bool)
+        self._positions = {}
+        for position, id_, metadata in records:
+            self._ids[position] = uuid.UUID(id_)
+            self._metadata[position] = json.loads(metadata) if metadata is not None else None
+            self._live[position] = True
+            self._positions[id_] = position
+        # Rows past the committed ones (from an interrupted write) are not mapped
+        self._matrix_file = os.path.basename(matrix_path)
+        self._matrix = self._open_matrix(matrix_path, row_count)
+        self._norms = np.linalg.norm(self._matrix, axis=1) if row_count else np.empty(0, np.float32)
+        self._mask_cache.clear()
+        self._index.refresh()
+
+    def _refresh(self) -> None:
+        """Reload if another process wrote to the store since it was loaded (lock held)."""
+        if self._info("generation", "0") != self._generation:
+            self._load()
+        else:
+            self._index.refresh()
+
+    def _bump_generation(self) -> None:
+        """Mark a write for other processes; call inside the write's transaction."""
+        self._generation = str(int(self._info("generation", "0")) + 1)
+        self._set_info("generation", self._generation)
+
+    def _remove_unused_matrices(self) -> None:
+        """Delete matrix files left behind by an interrupted delete or migration (lock held)."""
+        matrix_path = self._matrix_path()
+        for name in os.listdir(self.path):
+            if name.endswith(".f32") and os.path.join(self.path, name) != matrix_path:
+                os.remove(os.path.join(self.path, name))
+
+    def _open_matrix(self, path: str, rows: int) -> np.ndarray:
+        if rows == 0:
+            return np.empty((0, self._matrix_dimensions), dtype=np.float32)
+        return np.memmap(
+            path, dtype=np.float32, mode="r", shape=(rows, self._matrix_dimensions)
+        )
+
+    def create_tables(self) -> None:
+        """Prepare the store, re-embedding every record if the embedding model changed."""
+        with self._lock:
+            self._remove_unused_matrices()
+            if self._matrix_dimensions == self.dimensions:
+                self._set_info("dimensions", self.dimensions)
+                self._conn.commit()
+                return
+
+        logging.warning(
+            f"Re-embedding the local store at {self.path}: stored embeddings have "
+            f"{self._matrix_dimensions} dimensions, {self.embedder.model_name} returns {self.dimensions}"
+        )
+        rows = self._conn.execute("SELECT id, contents FROM records ORDER BY position").fetchall()
+        contents = [row[1] for row in rows]
+        batch_size = self.vector_settings.ingest_batch_size
+        matrix_name = f"embeddings-{uuid.uuid4().hex[:8]}.f32"
+        with open(self._matrix_path(matrix_name), "wb") as f:
+            for i in range(0, len(contents), batch_size):
+                embeddings = self.get_embeddings([text or "" for text in contents[i : i + batch_size]])
+                f.write(np.asarray(embeddings, dtype=np.float32).tobytes())
+        with self._index_lock, self._lock:
+            # The index was trained on the old embeddings
+            self._index.drop()
+            self._set_info("dimensions", self.dimensions)
+            self._switch_matrix(matrix_name, [row[0] for row in rows])
+
+    def _switch_matrix(self, matrix_name: str, ids: List[str]) -> None:
+        """
+        Commit a rewritten matrix whose row i belongs to ids[i] (both locks held).
+
+        Renumbers the records to match in the same transaction, then reloads.
+        """
+        self._conn.executemany(
+            "UPDATE records SET position = ? WHERE id = ?",
+            [(position, id_) for position, id_ in enumerate(ids)],
+        )
+        self._set_info("matrix_file", matrix_name)
+        self._set_info("rows", len(ids))
+        self._bump_generation()
+        self._conn.commit()
+        self._load()
+        self._remove_unused_matrices()
+
+    def create_index(self) -> None:
+        """Build the IVF-PQ index unless it exists or the store is below LocalIndexSettings.min_rows."""
+        with self._index_lock:
+            with self._lock:
+                self._refresh()
+                if self._index_matches(self._matrix_file):
+                    logging.info(f"IVF-PQ index of the local store at {self.path} already exists")
+                    return
+            self._build_index()
+
+    def rebuild_index(self) -> None:
+        """
+        Retrain the IVF-PQ index on the current records.
+
+        Incremental inserts reuse the quantizers trained at build time, so
+        rebuild after the corpus has grown or changed a lot. Searches keep
+        using the previous index until the new one replaces it.
+        """
+        with self._index_lock:
+            self._build_index()
+
+    def drop_index(self) -> None:
+        """Delete the IVF-PQ index; searches become exact."""
+        with self._index_lock, self._lock:
+            self._index.drop()
+
+    def _build_index(self) -> None:
+        """Train and write the index from a snapshot of the matrix (index lock held)."""
+        settings = self.vector_settings.local_index
+        with self._lock:
+            self._refresh()
+            matrix, matrix_file = self._matrix, self._matrix_file
+        if len(matrix) < settings.min_rows:
+            self._index.drop()
+            logging.info(
+                f"Local store at {self.path} has {len(matrix)} records, fewer than "
+                f"{settings.min_rows}; searching exactly without an index"
+            )
+            return
+        self._index.build(
+            matrix,
+            nlist=settings.nlist or int(np.sqrt(len(matrix))),
+            subvectors=settings.pq_subvectors,
+            train_sample=settings.train_sample,
+            iterations=settings.kmeans_iterations,
+            source=matrix_file,
+        )
+        # Index records appended while it was training
+        self._update_index()
+
+    def _update_index(self) -> None:
+        """Add the records the index does not cover yet (index lock held)."""
+        with self._lock:
+            matrix, matrix_file = self._matrix, self._matrix_file
+        covered = self._index.covered
+        if self._index_matches(matrix_file) and covered < len(matrix):
+            self._index.add(
+                covered, matrix[covered:], self.vector_settings.local_index.tail_fraction
+            )
+
+    def _append(self, records: Iterable[Record]) -> int:
+        """Add records whose id is not stored yet; returns how many were added."""
+        with self._lock:
+            new_ids, rows, embeddings = set(), [], []
+            for record in records:
+                if not isinstance(record, dict):
+                    record = dict(zip(COPY_COLUMNS, record))
+                id_ = str(record["id"])
+                if id_ in self._positions or id_ in new_ids:
+                    continue
+                if record.get("embedding") is None:
+                    raise ValueError(f"Record {id_} has no embedding")
+                new_ids.add(id_)
+                metadata = record.get("metadata")
+                rows.append((
+                    id_,
+                    metadata if metadata is None or isinstance(metadata, str) else json.dumps(metadata),
+                    record.get("contents"),
+                ))
+                embeddings.append(record["embedding"])
+            if not rows:
+                return 0
+
+            matrix = np.asarray(embeddings, dtype=np.float32)
+            if matrix.ndim != 2 or matrix.shape[1] != self._matrix_dimensions:
+                raise ValueError(
+                    f"Embeddings have shape {matrix.shape}, expected (n, {self._matrix_dimensions})"
+                )
+            # Matrix rows go first, after the committed ones; rows of a write
+            # whose records never committed are overwritten
+            start = len(self._ids)
+            matrix_path = self._matrix_path()
+            with open(matrix_path, "r+b" if os.path.exists(matrix_path) else "wb") as f:
+                f.seek(start * matrix[:1].nbytes)
+                f.write(matrix.tobytes())
+                f.truncate()
+            self._set_info("dimensions", self._matrix_dimensions)
+            self._set_info("rows", start + len(rows))
+            self._bump_generation()
+            self._conn.executemany(
+                "INSERT INTO records (position, id, metadata, contents) VALUES (?, ?, ?, ?)",
+                [(start + i, *row) for i, row in enumerate(rows)],
+            )
+            self._conn.commit()
+
+            for i, (id_, metadata, _) in enumerate(rows):
+                self._ids.append(uuid.UUID(id_))
+                self._metadata.append(json.loads(metadata) if metadata is not None else None)
+                self._positions[id_] = start + i
+            self._live = np.concatenate([self._live, np.ones(len(rows), dtype=bool)])
+            self._matrix = self._open_matrix(self._matrix_path(), len(self._ids))
+            self._norms = np.concatenate([self._norms, np.linalg.norm(matrix, axis=1)])
+            self._mask_cache.clear()
+            return len(rows)
+
+    def _index_matches(self, matrix_file: str) -> bool:
+        """Whether the index exists and was built over this matrix file."""
+        manifest = self._index.manifest
+        return manifest is not None and manifest["source"] == matrix_file
+
+    def _insert(self, records: Iterable[Record]) -> int:
+        """Add new records and index them; returns how many were added."""
+        inserted = self._append(records)
+        if inserted:
+            with self._index_lock:
+                self._update_index()
+        return inserted
+
+    def upsert(self, df: pd.DataFrame) -> None:
+        """
+        Insert records from a pandas DataFrame, skipping ids that are already stored.
+
+        Args:
+            df: A pandas DataFrame with id, metadata, contents and embedding columns.
+        """
+        inserted = self._insert(df.to_dict("records"))
+        logging.info(f"Inserted {inserted} records into the local store at {self.path}")
+
+    def bulk_upsert(
+        self, records: Iterable[Record], batch_size: Optional[int] = None
+    ) -> Dict[str, float]:
+        """
+        Insert records from any iterable, batch_size at a time.
+
+        Takes the same records as VectorStore.bulk_upsert and returns the same
+        counts of rows, inserted rows, elapsed seconds and rows/sec.
+        """
+        batch_size = batch_size or self.vector_settings.ingest_batch_size
+        stats = {"rows": 0, "inserted": 0}
+        start_time = time.time()
+        for batch in batches(records, batch_size):
+            batch = list(batch)
+            stats["rows"] += len(batch)
+            stats["inserted"] += self._insert(batch)
+            logging.info(
+                f"Stored {stats['rows']} records in the local store ({stats['inserted']} new) at "
+                f"{stats['rows'] / max(time.time() - start_time, 1e-9):.0f} rows/sec"
+            )
+        stats["seconds"] = time.time() - start_time
+        stats["rows_per_sec"] = stats["rows"] / max(stats["seconds"], 1e-9)
+        return stats
+
+    def _filter_mask(self, metadata_filter: MetadataFilter, cache_key: str) -> np.ndarray:
+        """Mask of the records passing the filter, cached until the next write (lock held)."""
+        mask = self._mask_cache.get(cache_key)
+        if mask is None:
+            live = np.flatnonzero(self._live)
+            mask = np.zeros(len(self._ids), dtype=bool)
+            mask[live] = metadata_filter.mask(
+                [self._ids[position] for position in live],
+                [self._metadata[position] or {} for position in live],
+            )
+            if len(self._mask_cache) >= self._MASK_CACHE_SIZE:
+                self._mask_cache.pop(next(iter(self._mask_cache)))
+            self._mask_cache[cache_key] = mask
+        return mask
+
+    def _nearest(
+        self,
+        query_embeddings: List[List[float]],
+        limit: int,
+        metadata_filter: Optional[MetadataFilter] = None,
+        cache_key: str = "",
+    ) -> Tuple[List[List[Tuple[int, float]]], List[uuid.UUID], List[Optional[dict]], np.ndarray]:
+        """
+        k nearest records by cosine distance for each query embedding.
+
+        Uses the IVF-PQ index when there is one and the filter (if any)
+        passes more than LocalIndexSettings.exact_max_rows records, and an
+        exact scan otherwise. Returns one list of (position, distance)
+        pairs per query, nearest first, with the ids, metadata and matrix
+        they refer to.
+        """
+        with self._lock:
+            self._refresh()
+            ids, metadata, matrix, norms = self._ids, self._metadata, self._matrix, self._norms
+            mask = None
+            if metadata_filter is not None and not metadata_filter.is_empty:
+                mask = self._filter_mask(metadata_filter, cache_key)
+            # Tombstones are skipped like records failing a filter
+            live = None if self._live.all() else self._live
+            mapped = self._index.mapped if self._index_matches(self._matrix_file) else None
+
+        queries = np.asarray(query_embeddings, dtype=np.float32)
+        settings = self.vector_settings.local_index
+        if mapped is None or (mask is not None and mask.sum() <= settings.exact_max_rows):
+            if mask is not None:
+                hits = self._exact_hits(queries, limit, matrix, norms, np.flatnonzero(mask))
+            else:
+                excluded = np.flatnonzero(~live) if live is not None else None
+                hits = self._exact_hits(queries, limit, matrix, norms, excluded=excluded)
+            return hits, ids, metadata, matrix
+        if mask is None:
+            mask = live
+
+        # Records added since the index was last updated are scanned exactly
+        uncovered = np.arange(min(mapped.manifest["covered"], len(matrix)), len(matrix))
+        if mask is not None:
+            uncovered = uncovered[mask[uncovered]]
+        hits = []
+        for query in queries:
+            nprobe = settings.nprobe
+            while True:
+                found = self._index.search(
+                    query, max(settings.rerank, limit), nprobe, mask, mapped
+                )
+                # Too few rows in the probed lists pass the filter: probe more lists
+                if len(found) >= limit or nprobe >= mapped.manifest["nlist"]:
+                    break
+                nprobe *= 2
+            candidates = np.concatenate([found[found < len(matrix)], uncovered])
+            hits.extend(self._exact_hits(query[None], limit, matrix, norms, candidates))
+        return hits, ids, metadata, matrix
+
+    @staticmethod
+    def _exact_hits(
+        queries: np.ndarray,
+        limit: int,
+        matrix: np.ndarray,
+        norms: np.ndarray,
+        candidates: Optional[np.ndarray] = None,
+        excluded: Optional[np.ndarray] = None,
+    ) -> List[List[Tuple[int, float]]]:
+        """
+        Exact top-limit (position, distance) pairs per query.
+
+        Searches the candidate positions, or every position except the
+        excluded ones, which saves copying the matrix to skip a few rows.
+        """
+        if candidates is not None:
+            matrix, norms = matrix[candidates], norms[candidates]
+        count = len(matrix)
+        k = min(limit, count - (len(excluded) if excluded is not None else 0))
+        if k <= 0:
+            return [[] for _ in queries]
+
+        similarities = matrix @ queries.T
+        distances = 1.0 - similarities / np.maximum(
+            np.outer(norms, np.linalg.norm(queries, axis=1)), 1e-12
+        )
+        if excluded is not None:
+            distances[excluded] = np.inf
+        if k < count:
+            top = np.argpartition(distances, k - 1, axis=0)[:k]
+        else:
+            top = np.repeat(np.arange(count)[:, None], len(queries), axis=1)
+
+        hits = []
+        for column in range(len(queries)):
+            rows = top[:, column]
+            rows = rows[np.argsort(distances[rows, column], kind="stable")]
+            positions = candidates[rows] if candidates is not None else rows
+            hits.append(
+                [(int(position), float(distances[row, column])) for position, row in zip(positions, rows)]
+            )
+        return hits
+
+    def _result_rows(
+        self,
+        hits: List[Tuple[int, float]],
+        ids: List[uuid.UUID],
+        metadata: List[Optional[dict]],
+        matrix: np.ndarray,
+        include_embeddings: bool,
+    ) -> List[Tuple[Any, ...]]:
+        """Search result tuples shaped like VectorStore's, looking contents up by id."""
+        hit_ids = [str(ids[position]) for position, _ in hits]
+        placeholders = ", ".join("?" for _ in hit_ids)
+        with self._lock:
+            contents = dict(
+                self._conn.execute(
+                    f"SELECT id, contents FROM records WHERE id IN ({placeholders})", hit_ids
+                ).fetchall()
+            ) if hit_ids else {}
+        results = []
+        for (position, distance), id_ in zip(hits, hit_ids):
+            row = [ids[position], metadata[position], contents.get(id_)]
+            if include_embeddings:
+                row.append(np.array(matrix[position]))
+            row.append(distance)
+            results.append(tuple(row))
+        return results
+
+    def _metadata_filter(
+        self,
+        metadata_filter: Union[dict, List[dict]],
+        predicates: Optional[client.Predicates],
+        time_range: Optional[Tuple[datetime, datetime]],
+        date_range: Optional[Dict[str, Tuple[Optional[date], Optional[date]]]],
+    ) -> Tuple[MetadataFilter, str]:
+        """The filter for a search and the key its mask is cached under."""
+        cache_key = json.dumps(
+            [metadata_filter, repr(predicates), repr(time_range), repr(date_range)],
+            sort_keys=True,
+            default=str,
+        )
+        return (
+            MetadataFilter(
+                metadata_filter,
+                predicates,
+                time_range,
+                date_range,
+                self.vector_settings.date_columns,
+            ),
+            cache_key,
+        )
+
+    def search(
+        self,
+        query_text: str,
+        limit: int = 5,
+        metadata_filter: Union[dict, List[dict]] = None,
+        predicates: Optional[client.Predicates] = None,
+        time_range: Optional[Tuple[datetime, datetime]] = None,
+        date_range: Optional[Dict[str, Tuple[Optional[date], Optional[date]]]] = None,
+        return_dataframe: bool = True,
+        include_embeddings: bool = False,
+        hybrid: Optional[bool] = None,
+        query_params: Optional[client.QueryParams] = None,
+    ) -> Union[List[Tuple[Any, ...]], pd.DataFrame]:
+        """
+        Similarity search over the local store.
+
+        Takes the same arguments and returns the same results as
+        VectorStore.search. hybrid and query_params are accepted for
+        compatibility and ignored: results are ranked by vector distance.
+        """
+        query_embedding = self.get_embedding(query_text)
+        filter_, cache_key = self._metadata_filter(
+            metadata_filter, predicates, time_range, date_range
+        )
+
+        start_time = time.time()
+        hits, ids, metadata, matrix = self._nearest([query_embedding], limit, filter_, cache_key)
+        results = self._result_rows(hits[0], ids, metadata, matrix, include_embeddings)
+        elapsed_time = time.time() - start_time
+
+        logging.info(f"Local vector search completed in {elapsed_time:.4f} seconds")
+
+        if return_dataframe:
+            return self._create_dataframe_from_results(results)
+        return results
+
+    def search_batch(
+        self,
+        query_texts: List[str],
+        limit: int = 5,
+        metadata_filter: Union[dict, List[dict]] = None,
+        predicates: Optional[client.Predicates] = None,
+        time_range: Optional[Tuple[datetime, datetime]] = None,
+        date_range: Optional[Dict[str, Tuple[Optional[date], Optional[date]]]] = None,
+        return_dataframe: bool = True,
+        include_embeddings: bool = False,
+        hybrid: Optional[bool] = None,
+        query_params: Optional[client.QueryParams] = None,
+    ) -> Union[List[Tuple[Any, ...]], pd.DataFrame]:
+        """
+        Search for many query texts at once and merge the top results.
+
+        Takes the same arguments as VectorStore.search_batch. Hits found by
+        several queries keep their best distance.
+        """
+        if not query_texts:
+            results = []
+            return self._create_dataframe_from_results(results) if return_dataframe else results
+
+        query_embeddings = self.get_embeddings(query_texts)
+        filter_, cache_key = self._metadata_filter(
+            metadata_filter, predicates, time_range, date_range
+        )
+
+        start_time = time.time()
+        hits, ids, metadata, matrix = self._nearest(query_embeddings, limit, filter_, cache_key)
+        best: Dict[int, float] = {}
+        for query_hits in hits:
+            for position, distance in query_hits:
+                if distance < best.get(position, float("inf")):
+                    best[position] = distance
+        merged = sorted(best.items(), key=lambda hit: hit[1])[:limit]
+        results = self._result_rows(merged, ids, metadata, matrix, include_embeddings)
+        elapsed_time = time.time() - start_time
+
+        logging.info(
+            f"Local batch search for {len(query_texts)} queries completed in {elapsed_time:.4f} seconds"
+        )
+
+        if return_dataframe:
+            return self._create_dataframe_from_results(results)
+        return results
+
+    def get_ids(self) -> Set[str]:
+        """Return the ids of every record in the store."""
+        with self._lock:
+            self._refresh()
+            return set(self._positions)
+
+    def delete(
+        self,
+        ids: List[str] = None,
+        metadata_filter: dict = None,
+        delete_all: bool = False,
+    ) -> None:
+        """Delete records from the local store.
+
+        Takes the same arguments as VectorStore.delete.
+
+        Raises:
+            ValueError: If no deletion criteria are provided or if multiple criteria are provided.
+        """
+        if sum(bool(x) for x in (ids, metadata_filter, delete_all)) != 1:
+            raise ValueError(
+                "Provide exactly one of: ids, metadata_filter, or delete_all"
+            )
+
+        with self._index_lock, self._lock:
+            self._refresh()
+            if delete_all:
+                removed = self._live.copy()
+            elif ids:
+                removed = np.zeros(len(self._ids), dtype=bool)
+                for id_ in ids:
+                    position = self._positions.get(str(id_))
+                    if position is not None:
+                        removed[position] = True
+            else:
+                live = np.flatnonzero(self._live)
+                removed = np.zeros(len(self._ids), dtype=bool)
+                removed[live] = MetadataFilter(metadata_filter).mask(
+                    [self._ids[position] for position in live],
+                    [self._metadata[position] or {} for position in live],
+                )
+            positions = np.flatnonzero(removed)
+            if not len(positions):
+                return
+
+            removed_ids = [str(self._ids[position]) for position in positions]
+            self._conn.executemany(
+                "DELETE FROM records WHERE id = ?", [(id_,) for id_ in removed_ids]
+            )
+            keep = self._live & ~removed
+            tombstones = len(keep) - int(keep.sum())
+            if tombstones > self.vector_settings.local_compact_fraction * len(keep):
+                # Enough holes to pay for rewriting: copy the live rows to a new
+                # matrix file and renumber the records in the same transaction
+                matrix_name = f"embeddings-{uuid.uuid4().hex[:8]}.f32"
+                with open(self._matrix_path(matrix_name), "wb") as f:
+                    f.write(np.ascontiguousarray(self._matrix[keep]).tobytes())
+                indexed = self._index_matches(self._matrix_file)
+                self._switch_matrix(
+                    matrix_name, [str(self._ids[position]) for position in np.flatnonzero(keep)]
+                )
+                if indexed:
+                    self._index.remove(keep, matrix_name)
+            else:
+                # Leave the rows in place as tombstones; the matrix and the index
+                # stay as they are and searches mask the holes out. The lists are
+                # copied so searches holding the old ones never see a hole appear.
+                self._bump_generation()
+                self._conn.commit()
+                self._ids, self._metadata = list(self._ids), list(self._metadata)
+                for position, id_ in zip(positions, removed_ids):
+                    self._ids[position] = None
+                    self._metadata[position] = None
+                    del self._positions[id_]
+                self._live = keep
+                self._mask_cache.clear()
+
+        logging.info(f"Deleted {len(removed_ids)} records from the local store at {self.path}")
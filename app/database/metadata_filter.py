@@ -0,0 +1,205 @@
+import json
+import operator
+import uuid
+from datetime import date, datetime, timezone
+from typing import Any, Callable, Dict, List, Optional, Sequence, Tuple, Union
+
+import numpy as np
+from timescale_vector import client
+
+# Offset of the UUID version 1 epoch (1582-10-15) from the Unix epoch, in 100 ns units
+_UUID_EPOCH_OFFSET = 0x01B21DD213814000
+
+_COMPARISONS: Dict[str, Callable[[Any, Any], bool]] = {
+    "=": operator.eq,
+    ">=": operator.ge,
+    ">": operator.gt,
+    "<=": operator.le,
+    "<": operator.lt,
+    "<>": operator.ne,
+}
+
+
+def uuid_timestamp(id_: uuid.UUID) -> datetime:
+    """The timestamp of a version 1 UUID, like uuid_timestamp(id) in the database."""
+    return datetime.fromtimestamp((id_.time - _UUID_EPOCH_OFFSET) / 1e7, timezone.utc)
+
+
+def json_contains(container: Any, contained: Any) -> bool:
+    """jsonb containment (container @> contained) for decoded JSON values."""
+    if isinstance(contained, dict):
+        return isinstance(container, dict) and all(
+            key in container and json_contains(container[key], value)
+            for key, value in contained.items()
+        )
+    if isinstance(contained, list):
+        return isinstance(container, list) and all(
+            any(json_contains(item, value) for item in container) for value in contained
+        )
+    if isinstance(container, (dict, list)):
+        return False
+    if isinstance(container, bool) or isinstance(contained, bool):
+        return type(container) is type(contained) and container == contained
+    return container == contained
+
+
+def _json_text(value: Any) -> Optional[str]:
+    """A metadata value as the ->> operator returns it."""
+    if value is None or isinstance(value, str):
+        return value
+    if isinstance(value, bool):
+        return "true" if value else "false"
+    return json.dumps(value)
+
+
+def _aware(value: datetime) -> datetime:
+    # Naive datetimes are local time, as UUIDTimeRange treats them
+    return value if value.tzinfo else value.astimezone(timezone.utc)
+
+
+def _and(results: List[Optional[bool]]) -> Optional[bool]:
+    if False in results:
+        return False
+    return None if None in results else True
+
+
+def _or(results: List[Optional[bool]]) -> Optional[bool]:
+    if True in results:
+        return True
+    return None if None in results else False
+
+
+class MetadataFilter:
+    """
+    The search filters of VectorStore.search, evaluated in Python.
+
+    metadata_filter, Predicates, time_range and date_range keep the
+    semantics of the SQL that VectorStore builds for them: jsonb
+    containment, ->> comparisons cast by the value's type with SQL's
+    three-valued logic for missing keys, uuid_timestamp(id) ranges and
+    inclusive date ranges on the ISO dates in the metadata.
+    """
+
+    def __init__(
+        self,
+        metadata_filter: Union[dict, List[dict]] = None,
+        predicates: Optional[client.Predicates] = None,
+        time_range: Optional[Tuple[datetime, datetime]] = None,
+        date_range: Optional[Dict[str, Tuple[Optional[date], Optional[date]]]] = None,
+        date_columns: Sequence[str] = (),
+    ):
+        if metadata_filter is not None and not isinstance(metadata_filter, (dict, list)):
+            raise ValueError(f"Unknown filter type: {type(metadata_filter)}")
+        self.metadata_filter = metadata_filter
+        self.predicates = predicates
+        self.time_range = client.UUIDTimeRange(*time_range) if time_range else None
+        self.date_range = {}
+        for column, (start, end) in (date_range or {}).items():
+            if column not in date_columns:
+                raise ValueError(
+                    f"Unknown date column: {column!r} (expected one of {', '.join(date_columns)})"
+                )
+            self.date_range[column] = tuple(
+                value.date() if isinstance(value, datetime) else value for value in (start, end)
+            )
+
+    @property
+    def is_empty(self) -> bool:
+        return not (self.metadata_filter or self.predicates or self.time_range or self.date_range)
+
+    def matches(self, id_: uuid.UUID, metadata: Dict[str, Any]) -> bool:
+        """Whether a record passes every filter."""
+        if self.metadata_filter:
+            filters = (
+                self.metadata_filter
+                if isinstance(self.metadata_filter, list)
+                else [self.metadata_filter]
+            )
+            if not any(json_contains(metadata, item) for item in filters):
+                return False
+        if self.predicates and self._evaluate(self.predicates, id_, metadata) is not True:
+            return False
+        if self.time_range and not self._in_time_range(id_):
+            return False
+        for column, (start, end) in self.date_range.items():
+            value = metadata.get(column)
+            if not value:
+                return False
+            value = date.fromisoformat(value[:10])
+            if (start is not None and value < start) or (end is not None and value > end):
+                return False
+        return True
+
+    def mask(self, ids: Sequence[uuid.UUID], metadata: Sequence[Dict[str, Any]]) -> np.ndarray:
+        """Boolean mask of the records passing every filter."""
+        if self.is_empty:
+            return np.ones(len(ids), dtype=bool)
+        return np.fromiter(
+            (self.matches(id_, item) for id_, item in zip(ids, metadata)),
+            dtype=bool,
+            count=len(ids),
+        )
+
+    def _in_time_range(self, id_: uuid.UUID) -> bool:
+        timestamp = uuid_timestamp(id_)
+        time_range = self.time_range
+        if time_range.start_date is not None:
+            if timestamp < time_range.start_date or (
+                timestamp == time_range.start_date and not time_range.start_inclusive
+            ):
+                return False
+        if time_range.end_date is not None:
+            if timestamp > time_range.end_date or (
+                timestamp == time_range.end_date and not time_range.end_inclusive
+            ):
+                return False
+        return True
+
+    def _evaluate(
+        self, predicates: client.Predicates, id_: uuid.UUID, metadata: Dict[str, Any]
+    ) -> Optional[bool]:
+        """A Predicates tree under SQL's three-valued logic (None is NULL)."""
+        results = []
+        for clause in predicates.clauses:
+            if isinstance(clause, client.Predicates):
+                results.append(self._evaluate(clause, id_, metadata))
+            elif len(clause) == 2:
+                results.append(self._compare(clause[0], "=", clause[1], id_, metadata))
+            elif len(clause) == 3:
+                if clause[1] not in client.Predicates.operators_mapping:
+                    raise ValueError(f"Invalid operator: {clause[1]}")
+                operator_ = client.Predicates.operators_mapping[clause[1]]
+                results.append(self._compare(clause[0], operator_, clause[2], id_, metadata))
+            else:
+                raise ValueError("Invalid clause format")
+
+        if predicates.operator == "NOT":
+            # TRUE IS DISTINCT FROM (clauses ORed): NULL counts as not matching
+            return _or(results) is not True
+        return _and(results) if predicates.operator == "AND" else _or(results)
+
+    @staticmethod
+    def _compare(
+        field: str, operator_: str, value: Any, id_: uuid.UUID, metadata: Dict[str, Any]
+    ) -> Optional[bool]:
+        if field == "__uuid_timestamp":
+            if isinstance(value, str):
+                value = datetime.fromisoformat(value)
+            return _COMPARISONS[operator_](uuid_timestamp(id_), _aware(value))
+        if operator_ == "@>" and isinstance(value, (list, tuple)):
+            if not value:
+                raise ValueError("Invalid value. Empty lists and empty tuples are not supported.")
+            return json_contains(metadata, {field: list(value)})
+
+        text = _json_text(metadata.get(field))
+        if text is None:
+            return None
+        if isinstance(value, int):
+            left = int(text)
+        elif isinstance(value, float):
+            left = float(text)
+        elif isinstance(value, datetime):
+            left, value = _aware(datetime.fromisoformat(text)), _aware(value)
+        else:
+            left = text
+        return _COMPARISONS[operator_](left, value)
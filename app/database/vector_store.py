@@ -1,13 +1,39 @@
 import logging
+import re
 import time
-from typing import Any, List, Optional, Tuple, Union
-from datetime import datetime
-import os
+from typing import Any, Callable, Dict, Iterable, List, NamedTuple, Optional, Set, Tuple, Union
+from datetime import date, datetime, timedelta, timezone
 
+import numpy as np
 import pandas as pd
 from config.settings import get_settings
+from database.bulk_copy import COPY_COLUMNS, CopyStream, Record, batches
+from database.embedders import create_embedder
+from database.embedding_cache import EmbeddingCache
 from timescale_vector import client
-import google.generativeai as genai
+
+
+class SearchPlan(NamedTuple):
+    """How a search finds its nearest neighbours.
+
+    strategy is "ann" (an index scan with the filter applied inline, used
+    without a filter), "exact" (distances computed for every row passing a
+    selective filter) or "overfetch" (the `candidates` nearest rows by ANN,
+    then filtered). The row counts are the planner's estimates.
+    """
+
+    strategy: str
+    candidates: int = 0
+    estimated_rows: Optional[float] = None
+    total_rows: Optional[float] = None
+
+    def __str__(self) -> str:
+        if self.estimated_rows is None:
+            return self.strategy
+        details = f"~{self.estimated_rows:.0f} of ~{self.total_rows:.0f} rows match"
+        if self.strategy == "overfetch":
+            details += f", {self.candidates} candidates"
+        return f"{self.strategy} ({details})"
 
 
 class VectorStore:
@@ -15,19 +41,68 @@ class VectorStore:
 
     def __init__(self):
         """Initialize the VectorStore with settings and Timescale Vector client."""
-        self.settings = get_settings()
-        genai.configure(api_key=os.getenv("GEMINI_API_KEY"))  # Configure Gemini instead
-        self.vector_settings = self.settings.vector_store
+        self._init_embeddings()
+        if self.vector_settings.embedding_storage not in self.STORAGE_TYPES:
+            raise ValueError(
+                f"Unknown embedding storage: {self.vector_settings.embedding_storage!r} "
+                f"(expected one of {', '.join(self.STORAGE_TYPES)})"
+            )
+        self.vector_type = self.vector_settings.embedding_storage
         self.vec_client = client.Sync(
             self.settings.database.service_url,
             self.vector_settings.table_name,
-            self.vector_settings.embedding_dimensions,
+            self.dimensions,
             time_partition_interval=self.vector_settings.time_partition_interval,
         )
 
+    def _init_embeddings(self) -> None:
+        """Set up the settings, embedding backend and embedding cache."""
+        self.settings = get_settings()
+        self.vector_settings = self.settings.vector_store
+        self.embedder = create_embedder(self.settings)
+        self.dimensions = self._resolve_dimensions()
+        self.embedding_cache = (
+            EmbeddingCache(
+                self.vector_settings.embedding_cache_path,
+                self.vector_settings.embedding_cache_max_entries,
+            )
+            if self.vector_settings.embedding_cache_path
+            else None
+        )
+
+    # pgvector column types for VectorStoreSettings.embedding_storage
+    STORAGE_TYPES = ("vector", "halfvec")
+
+    def _resolve_dimensions(self) -> int:
+        """Use the embedding model's dimension, checking it against the settings."""
+        dimensions = self.embedder.dimensions
+        configured = self.vector_settings.embedding_dimensions
+        if configured is not None and configured != dimensions:
+            raise ValueError(
+                f"VectorStoreSettings.embedding_dimensions is {configured}, but "
+                f"{self.embedder.model_name} returns {dimensions}-dimensional embeddings"
+            )
+        return dimensions
+
+    def _check_dimensions(self, embeddings: List[List[float]]) -> None:
+        """Fail fast if the backend returned embeddings of an unexpected size."""
+        for embedding in embeddings:
+            if len(embedding) != self.dimensions:
+                raise ValueError(
+                    f"{self.embedder.model_name} returned a {len(embedding)}-dimensional "
+                    f"embedding, expected {self.dimensions}"
+                )
+
+    @property
+    def column_type(self) -> str:
+        """The pgvector column type the embedding column should have."""
+        return f"{self.vector_type}({self.dimensions})"
+
     def get_embedding(self, text: str) -> List[float]:
         """
-        Generate embedding for the given text using Gemini.
+        Generate embedding for the given text with the configured backend.
+
+        Embeddings are served from the on-disk cache when available.
 
         Args:
             text: The input text to generate an embedding for.
@@ -35,36 +110,489 @@ class VectorStore:
         Returns:
             A list of floats representing the embedding.
         """
-        text = text.replace("\n", " ")
+        model = self.embedder.model_name
+        if self.embedding_cache:
+            cached = self.embedding_cache.get(model, text)
+            if cached is not None:
+                return cached
+
         start_time = time.time()
-        embedding = genai.embed_content(
-            model="models/text-embedding-004",
-            content=text,
-        )['embedding']
+        embedding = self.embedder.embed([text])[0]
+        self._check_dimensions([embedding])
         elapsed_time = time.time() - start_time
         logging.info(f"Embedding generated in {elapsed_time:.3f} seconds")
+
+        if self.embedding_cache:
+            self.embedding_cache.put(model, text, embedding)
         return embedding
 
+    def get_embeddings(self, texts: List[str]) -> List[List[float]]:
+        """
+        Generate embeddings for many texts with the configured backend.
+
+        Cached texts are served from the on-disk cache; the rest are embedded
+        in batches (see GeminiEmbedder and LocalEmbedder).
+
+        Args:
+            texts: The input texts to generate embeddings for.
+
+        Returns:
+            A list of embeddings in the same order as the input texts.
+        """
+        if not self.embedding_cache:
+            return self._embed_texts(texts)
+
+        model = self.embedder.model_name
+        embeddings = self.embedding_cache.get_many(model, texts)
+        missing = list(dict.fromkeys(
+            text for text, embedding in zip(texts, embeddings) if embedding is None
+        ))
+        if missing:
+            new_embeddings = self._embed_texts(missing)
+            self.embedding_cache.put_many(model, missing, new_embeddings)
+            by_text = dict(zip(missing, new_embeddings))
+            embeddings = [
+                embedding if embedding is not None else by_text[text]
+                for text, embedding in zip(texts, embeddings)
+            ]
+        return embeddings
+
+    def _embed_texts(self, texts: List[str]) -> List[List[float]]:
+        """Embed texts with the backend, bypassing the cache."""
+        embeddings = self.embedder.embed(texts)
+        self._check_dimensions(embeddings)
+        return embeddings
+
     def create_tables(self) -> None:
-        """Create the necessary tablesin the database"""
+        """Create the necessary tablesin the database, migrating an outdated embedding column"""
         self.vec_client.create_tables()
+        self.migrate_table()
+        self.create_text_search_index()
+        self.create_date_columns()
+
+    def _text_search_config(self) -> str:
+        """The full-text search configuration as a regconfig literal."""
+        config = self.vector_settings.text_search_config
+        if not config.isidentifier():
+            raise ValueError(f"Invalid text search configuration: {config!r}")
+        return f"'{config}'::regconfig"
+
+    def create_text_search_index(self) -> None:
+        """
+        Add the full-text search column and its GIN index if they don't exist.
+
+        contents_tsv is a generated column, so every insert or update of
+        contents (including ingest upserts) keeps it current.
+        """
+        table_name = self._table_name()
+        index_name = client.QueryBuilder._quote_ident(
+            self.vector_settings.table_name + "_contents_tsv_idx"
+        )
+        with self.vec_client.connect() as conn:
+            with conn.cursor() as cur:
+                cur.execute(
+                    f"ALTER TABLE {table_name} ADD COLUMN IF NOT EXISTS contents_tsv tsvector "
+                    f"GENERATED ALWAYS AS (to_tsvector({self._text_search_config()}, "
+                    "coalesce(contents, ''))) STORED"
+                )
+                cur.execute(
+                    f"CREATE INDEX IF NOT EXISTS {index_name} ON {table_name} USING GIN (contents_tsv)"
+                )
+        logging.info(f"Full-text search index ready for {self.vector_settings.table_name}")
+
+    def _date_columns(self) -> List[str]:
+        """The configured date columns, validated as plain identifiers."""
+        columns = self.vector_settings.date_columns
+        for column in columns:
+            if not column.isidentifier():
+                raise ValueError(f"Invalid date column name: {column!r}")
+        return columns
+
+    def create_date_columns(self) -> None:
+        """
+        Add a typed, B-tree indexed date column per VectorStoreSettings.date_columns.
+
+        Each column is generated from the ISO date string under the same
+        metadata key, so every write path keeps it current and date_range
+        filters compare dates through an index instead of parsing JSON.
+        """
+        table_name = self._table_name()
+        with self.vec_client.connect() as conn:
+            with conn.cursor() as cur:
+                # Generated columns need an immutable expression; text::date is only
+                # stable because of DateStyle, which does not affect ISO dates
+                cur.execute(
+                    "CREATE OR REPLACE FUNCTION metadata_date(metadata jsonb, key text) "
+                    "RETURNS date LANGUAGE sql IMMUTABLE STRICT PARALLEL SAFE "
+                    "AS $$ SELECT left(metadata ->> key, 10)::date $$"
+                )
+                for column in self._date_columns():
+                    index_name = client.QueryBuilder._quote_ident(
+                        f"{self.vector_settings.table_name}_{column}_idx"
+                    )
+                    cur.execute(
+                        f"ALTER TABLE {table_name} ADD COLUMN IF NOT EXISTS {column} date "
+                        f"GENERATED ALWAYS AS (metadata_date(metadata, '{column}')) STORED"
+                    )
+                    cur.execute(
+                        f"CREATE INDEX IF NOT EXISTS {index_name} ON {table_name} ({column})"
+                    )
+        logging.info(f"Date columns ready for {self.vector_settings.table_name}")
+
+    def _table_name(self) -> str:
+        return client.QueryBuilder._quote_ident(self.vector_settings.table_name)
+
+    def get_column_type(self) -> Optional[str]:
+        """Return the embedding column's type (e.g. "vector(768)"), or None without a table."""
+        with self.vec_client.connect() as conn:
+            with conn.cursor() as cur:
+                cur.execute(
+                    "SELECT format_type(atttypid, atttypmod) FROM pg_attribute "
+                    "WHERE attrelid = to_regclass(%s) AND attname = 'embedding' "
+                    "AND NOT attisdropped",
+                    (self._table_name(),),
+                )
+                row = cur.fetchone()
+        return row[0] if row else None
+
+    def migrate_table(self) -> bool:
+        """
+        Bring the embedding column in line with the model and storage settings.
+
+        A storage change with the same dimension (e.g. vector to halfvec) is
+        a cast in place. A dimension change means the embedding model changed,
+        so the column is cleared and every row is re-embedded from its
+        contents. The embedding index is dropped; recreate it with create_index.
+        Rows still without an embedding (e.g. from an interrupted re-embed)
+        are re-embedded on every call, not only right after the change.
+
+        Returns:
+            True if the column type was changed.
+        """
+        current = self.get_column_type()
+        if current is None:
+            return False
+        if current == self.column_type:
+            self._reembed_missing()
+            return False
+
+        logging.warning(
+            f"Migrating {self.vector_settings.table_name}.embedding from {current} to {self.column_type}"
+        )
+        self.drop_index()
+        same_dimensions = current.endswith(f"({self.dimensions})")
+        using = f"embedding::{self.column_type}" if same_dimensions else "NULL"
+        with self.vec_client.connect() as conn:
+            with conn.cursor() as cur:
+                cur.execute(
+                    f"ALTER TABLE {self._table_name()} "
+                    f"ALTER COLUMN embedding TYPE {self.column_type} USING {using}"
+                )
+        self._reembed_missing()
+        return True
+
+    def _reembed_missing(self) -> int:
+        """Embed every row whose embedding is NULL, in ingest-sized batches."""
+        batch_size = self.vector_settings.ingest_batch_size
+        total = 0
+        while True:
+            with self.vec_client.connect() as conn:
+                with conn.cursor() as cur:
+                    cur.execute(
+                        f"SELECT id, contents FROM {self._table_name()} "
+                        "WHERE embedding IS NULL AND contents IS NOT NULL LIMIT %s",
+                        (batch_size,),
+                    )
+                    rows = cur.fetchall()
+            if not rows:
+                break
+
+            embeddings = self.get_embeddings([row[1] for row in rows])
+            with self.vec_client.connect() as conn:
+                with conn.cursor() as cur:
+                    cur.execute(
+                        f"UPDATE {self._table_name()} AS t SET embedding = u.embedding "
+                        f"FROM unnest(%s::uuid[], %s::{self.vector_type}[]) AS u(id, embedding) "
+                        "WHERE t.id = u.id",
+                        (
+                            [str(row[0]) for row in rows],
+                            [self._vector_literal(embedding) for embedding in embeddings],
+                        ),
+                    )
+            total += len(rows)
+            logging.info(f"Re-embedded {total} records")
+        return total
+
+    # Supported VectorStoreSettings.index.index_type values
+    INDEX_TYPES = ("diskann", "hnsw", "ivfflat")
+
+    def _index_type(self) -> str:
+        """The configured index type, or hnsw for halfvec, which DiskANN cannot index."""
+        index_type = self.vector_settings.index.index_type
+        if index_type not in self.INDEX_TYPES:
+            raise ValueError(
+                f"Unknown index type: {index_type!r} (expected one of {', '.join(self.INDEX_TYPES)})"
+            )
+        if self.vector_type == "halfvec" and index_type == "diskann":
+            return "hnsw"
+        return index_type
+
+    def _index_definition(self) -> client.BaseIndex:
+        """Build the timescale_vector index object from IndexSettings."""
+        index_settings = self.vector_settings.index
+        index_type = self._index_type()
+        if index_type == "diskann":
+            return client.DiskAnnIndex(
+                search_list_size=index_settings.search_list_size,
+                num_neighbors=index_settings.num_neighbors,
+                max_alpha=index_settings.max_alpha,
+                storage_layout=index_settings.storage_layout,
+            )
+        if index_type == "hnsw":
+            return client.HNSWIndex(
+                m=index_settings.m, ef_construction=index_settings.ef_construction
+            )
+        return client.IvfflatIndex(num_lists=index_settings.lists)
+
+    def default_query_params(self) -> Optional[client.QueryParams]:
+        """Per-query tuning for the configured index type, or None if nothing is set."""
+        index_settings = self.vector_settings.index
+        index_type = self._index_type()
+        if index_type == "diskann":
+            params = client.DiskAnnIndexParams(
+                search_list_size=index_settings.query_search_list_size,
+                rescore=index_settings.query_rescore,
+            )
+            return params if params.params else None
+        if index_type == "hnsw" and index_settings.ef_search is not None:
+            return client.HNSWIndexParams(index_settings.ef_search)
+        if index_type == "ivfflat" and index_settings.probes is not None:
+            return client.IvfflatIndexParams(index_settings.probes)
+        return None
+
+    def _index_name(self) -> str:
+        """Name of the embedding index, as timescale_vector names it."""
+        return self.vector_settings.table_name + "_embedding_idx"
+
+    def _count_rows(self) -> int:
+        with self.vec_client.connect() as conn:
+            with conn.cursor() as cur:
+                cur.execute(f"SELECT count(*) FROM {self._table_name()}")
+                return cur.fetchone()[0]
+
+    def _create_index_query(self, index_name: str) -> str:
+        """CREATE INDEX statement for the configured index under index_name."""
+        query = self._index_definition().create_index_query(
+            self._table_name(),
+            "embedding",
+            client.QueryBuilder._quote_ident(index_name),
+            "<=>",
+            self._count_rows,
+        )
+        if self.vector_type == "halfvec":
+            query = query.replace("vector_cosine_ops", "halfvec_cosine_ops")
+        return query
+
+    def index_exists(self, index_name: Optional[str] = None) -> bool:
+        """Return whether the embedding index (or the named index) exists."""
+        with self.vec_client.connect() as conn:
+            with conn.cursor() as cur:
+                cur.execute(
+                    "SELECT to_regclass(%s) IS NOT NULL",
+                    (client.QueryBuilder._quote_ident(index_name or self._index_name()),),
+                )
+                return cur.fetchone()[0]
 
     def create_index(self) -> None:
-        """Create the StreamingDiskANN index to speed up similarity search if it doesn't exist"""
-        try:
-            self.vec_client.create_embedding_index(client.DiskAnnIndex())
-            logging.info(f"Created DiskANN index for {self.vector_settings.table_name}")
-        except Exception as e:
-            if "already exists" in str(e):
-                logging.info(f"Index already exists for {self.vector_settings.table_name}")
-            else:
-                # If it's a different error, re-raise it
-                raise e
+        """Create the embedding index configured in IndexSettings if it doesn't exist"""
+        if self.index_exists():
+            logging.info(f"Index already exists for {self.vector_settings.table_name}")
+            return
+
+        start_time = time.time()
+        with self.vec_client.connect() as conn:
+            with conn.cursor() as cur:
+                cur.execute(self._create_index_query(self._index_name()))
+        logging.info(
+            f"Created {self._index_type()} index for {self.vector_settings.table_name} "
+            f"in {time.time() - start_time:.1f} seconds"
+        )
+
+    def rebuild_index(self) -> None:
+        """
+        Rebuild the embedding index without interrupting searches.
+
+        The new index is built under a shadow name while the current one keeps
+        serving queries (CREATE INDEX blocks writes, not reads), then the two
+        are swapped in one short transaction. Use it after bulk loads or when
+        IndexSettings change.
+        """
+        shadow_name = self._index_name() + "_shadow"
+        quoted_shadow = client.QueryBuilder._quote_ident(shadow_name)
+
+        start_time = time.time()
+        with self.vec_client.connect() as conn:
+            with conn.cursor() as cur:
+                cur.execute(f"DROP INDEX IF EXISTS {quoted_shadow}")
+                cur.execute(self._create_index_query(shadow_name))
+        build_time = time.time() - start_time
+
+        with self.vec_client.connect() as conn:
+            with conn.cursor() as cur:
+                cur.execute(
+                    f"DROP INDEX IF EXISTS {client.QueryBuilder._quote_ident(self._index_name())}"
+                )
+                cur.execute(
+                    f"ALTER INDEX {quoted_shadow} RENAME TO "
+                    f"{client.QueryBuilder._quote_ident(self._index_name())}"
+                )
+        logging.info(
+            f"Rebuilt {self._index_type()} index for {self.vector_settings.table_name} "
+            f"(built in {build_time:.1f} seconds, swapped in {time.time() - start_time - build_time:.2f})"
+        )
 
     def drop_index(self) -> None:
-        """Drop the StreamingDiskANN index in the database"""
+        """Drop the embedding index in the database"""
         self.vec_client.drop_embedding_index()
 
+    @staticmethod
+    def _to_pyformat(query: str, params: List[Any]) -> Tuple[str, Dict[str, Any]]:
+        """
+        Rewrite $n placeholders as psycopg2 %(n)s ones with a params dict.
+
+        One pass over the whole query, unlike the client's helper, whose
+        string replacement turns $10 into the $1 placeholder followed by 0.
+        """
+        return (
+            re.sub(r"\$(\d+)", r"%(\1)s", query),
+            {str(number): param for number, param in enumerate(params, start=1)},
+        )
+
+    def _fetch(
+        self,
+        query: str,
+        params: List[Any],
+        query_params: Optional[client.QueryParams] = None,
+    ) -> List[Tuple[Any, ...]]:
+        """Run a search query, applying per-query index tuning in the same transaction."""
+        query_params = query_params or self.default_query_params()
+        query, params = self._to_pyformat(query, params)
+        with self.vec_client.connect() as conn:
+            with conn.cursor() as cur:
+                if query_params:
+                    for statement in query_params.get_statements():
+                        cur.execute(statement)
+                cur.execute(query, params)
+                return cur.fetchall()
+
+    def _estimate_rows(self, where: str, params: List[Any]) -> Tuple[float, float]:
+        """The planner's estimates of the rows matching where and of all rows."""
+        query, params = self._to_pyformat(
+            f"EXPLAIN (FORMAT JSON) SELECT 1 FROM {self._table_name()} WHERE {where}", params
+        )
+        with self.vec_client.connect() as conn:
+            with conn.cursor() as cur:
+                cur.execute(query, params)
+                estimated_rows = cur.fetchone()[0][0]["Plan"]["Plan Rows"]
+                cur.execute(f"EXPLAIN (FORMAT JSON) SELECT 1 FROM {self._table_name()}")
+                total_rows = cur.fetchone()[0][0]["Plan"]["Plan Rows"]
+        return float(estimated_rows), float(total_rows)
+
+    def plan_search(self, where: str, params: List[Any], limit: int) -> SearchPlan:
+        """
+        Choose how to run a search from the estimated selectivity of its filter.
+
+        A filter the planner expects to match at most
+        SearchPlanSettings.exact_max_rows rows is scanned exactly, which is
+        both faster and complete. A broader one over-fetches ANN candidates
+        in proportion to 1 / selectivity so that `limit` rows should survive
+        the filter; _next_plan widens the search if they don't.
+
+        Args:
+            where: The search's WHERE clause (see _build_where_clause).
+            params: Its parameters.
+            limit: Rows the search should return.
+        """
+        planner = self.vector_settings.planner
+        if where == "TRUE" or not planner.enabled:
+            return SearchPlan("ann")
+
+        estimated_rows, total_rows = self._estimate_rows(where, params)
+        if estimated_rows <= planner.exact_max_rows:
+            plan = SearchPlan("exact", 0, estimated_rows, total_rows)
+        else:
+            selectivity = estimated_rows / max(total_rows, 1.0)
+            candidates = int(limit / selectivity * planner.overfetch_margin)
+            plan = SearchPlan(
+                "overfetch",
+                min(max(candidates, limit), planner.max_candidates),
+                estimated_rows,
+                total_rows,
+            )
+        logging.info(f"Search plan: {plan}")
+        return plan
+
+    def _next_plan(self, plan: SearchPlan, returned: int, limit: int) -> Optional[SearchPlan]:
+        """
+        The plan to retry with when an over-fetch returned fewer than limit rows.
+
+        Candidates grow by overfetch_growth up to max_candidates, after which
+        the search falls back to an exact scan. Returns None if the result is
+        final.
+        """
+        if plan.strategy != "overfetch" or returned >= limit:
+            return None
+        if plan.total_rows is not None and plan.candidates >= plan.total_rows:
+            return None
+
+        planner = self.vector_settings.planner
+        if plan.candidates >= planner.max_candidates:
+            next_plan = plan._replace(strategy="exact", candidates=0)
+        else:
+            next_plan = plan._replace(
+                candidates=min(plan.candidates * planner.overfetch_growth, planner.max_candidates)
+            )
+        logging.info(f"Over-fetch returned {returned} of {limit} rows, retrying: {next_plan}")
+        return next_plan
+
+    def _plan_query_params(
+        self, plan: SearchPlan, query_params: Optional[client.QueryParams] = None
+    ) -> Optional[client.QueryParams]:
+        """
+        Index tuning for a plan; explicit query_params always win.
+
+        HNSW returns at most ef_search rows per scan, so an over-fetch raises
+        it to the candidate count (pgvector caps it at 1000).
+        """
+        if query_params is not None:
+            return query_params
+        if plan.strategy == "overfetch" and self._index_type() == "hnsw":
+            ef_search = self.vector_settings.index.ef_search or 40
+            return client.HNSWIndexParams(max(ef_search, min(plan.candidates, 1000)))
+        return self.default_query_params()
+
+    def _planned_fetch(
+        self,
+        build_query: Callable[[SearchPlan], str],
+        where: str,
+        params: List[Any],
+        limit: int,
+        query_params: Optional[client.QueryParams] = None,
+        hybrid: bool = False,
+    ) -> List[Tuple[Any, ...]]:
+        """Plan a search, run it and widen an over-fetch until limit rows pass."""
+        # A hybrid search's vector ranking needs hybrid_candidates rows, not just limit
+        vector_limit = max(limit, self.vector_settings.hybrid_candidates) if hybrid else limit
+        plan = self.plan_search(where, params, vector_limit)
+        while True:
+            results = self._fetch(
+                build_query(plan), params, self._plan_query_params(plan, query_params)
+            )
+            next_plan = self._next_plan(plan, len(results), limit)
+            if next_plan is None:
+                return results
+            plan = next_plan
+
     def upsert(self, df: pd.DataFrame) -> None:
         """
         Insert or update records in the database from a pandas DataFrame.
@@ -79,6 +607,63 @@ class VectorStore:
             f"Inserted {len(df)} records into {self.vector_settings.table_name}"
         )
 
+    def bulk_upsert(
+        self, records: Iterable[Record], batch_size: Optional[int] = None
+    ) -> Dict[str, float]:
+        """
+        Load records with binary COPY, for ingests too large for upsert.
+
+        Records are consumed lazily and encoded while they stream into a
+        temporary staging table, then merged into the table with
+        INSERT ... ON CONFLICT DO NOTHING (ids are content-derived, so an
+        existing id already holds the same record). Each batch is its own
+        transaction, so completed batches survive a failure.
+
+        Args:
+            records: Dicts with id, metadata, contents and embedding keys, or
+                (id, metadata, contents, embedding) tuples. Any iterable works,
+                including a generator that embeds records as they are read.
+            batch_size: Rows per COPY and merge (default:
+                VectorStoreSettings.copy_batch_size).
+
+        Returns:
+            Counts of rows copied and inserted, the elapsed seconds and rows/sec.
+        """
+        batch_size = batch_size or self.vector_settings.copy_batch_size
+        columns = ", ".join(COPY_COLUMNS)
+        stats = {"rows": 0, "inserted": 0}
+        start_time = time.time()
+
+        for batch in batches(records, batch_size):
+            stream = CopyStream(batch, self.vector_type, self.dimensions)
+            with self.vec_client.connect() as conn:
+                with conn.cursor() as cur:
+                    cur.execute(
+                        "CREATE TEMP TABLE bulk_upsert_staging (id uuid, metadata jsonb, "
+                        f"contents text, embedding {self.column_type}) ON COMMIT DROP"
+                    )
+                    cur.copy_expert(
+                        f"COPY bulk_upsert_staging ({columns}) FROM STDIN WITH (FORMAT binary)",
+                        stream,
+                    )
+                    cur.execute(
+                        f"INSERT INTO {self._table_name()} ({columns}) "
+                        f"SELECT {columns} FROM bulk_upsert_staging "
+                        "ON CONFLICT DO NOTHING"
+                    )
+                    inserted = cur.rowcount
+            stats["rows"] += stream.rows
+            stats["inserted"] += inserted
+            elapsed_time = time.time() - start_time
+            logging.info(
+                f"Copied {stats['rows']} records into {self.vector_settings.table_name} "
+                f"({stats['inserted']} new) at {stats['rows'] / max(elapsed_time, 1e-9):.0f} rows/sec"
+            )
+
+        stats["seconds"] = time.time() - start_time
+        stats["rows_per_sec"] = stats["rows"] / max(stats["seconds"], 1e-9)
+        return stats
+
     def search(
         self,
         query_text: str,
@@ -86,7 +671,11 @@ class VectorStore:
         metadata_filter: Union[dict, List[dict]] = None,
         predicates: Optional[client.Predicates] = None,
         time_range: Optional[Tuple[datetime, datetime]] = None,
+        date_range: Optional[Dict[str, Tuple[Optional[date], Optional[date]]]] = None,
         return_dataframe: bool = True,
+        include_embeddings: bool = False,
+        hybrid: Optional[bool] = None,
+        query_params: Optional[client.QueryParams] = None,
     ) -> Union[List[Tuple[Any, ...]], pd.DataFrame]:
         """
         Query the vector database for similar embeddings based on input text.
@@ -104,10 +693,18 @@ class VectorStore:
                 - & is used to combine multiple predicates with AND operator.
                 - | is used to combine multiple predicates with OR operator.
             time_range: A tuple of (start_date, end_date) to filter results by time.
+            date_range: Inclusive (start, end) dates per date column, e.g.
+                {"expiration_date": (date(2024, 7, 1), date(2024, 9, 30))}; None leaves
+                a side open. Filters on the indexed date columns (see create_date_columns).
             return_dataframe: Whether to return results as a DataFrame (default: True).
+            include_embeddings: Whether to fetch the stored embeddings (default: False).
+            hybrid: Fuse full-text and vector rankings (default: VectorStoreSettings.hybrid_search).
+            query_params: Index tuning for this query, e.g. client.DiskAnnIndexParams(rescore=400)
+                (default: from VectorStoreSettings.index).
 
         Returns:
-            Either a list of tuples or a pandas DataFrame containing the search results.
+            Either a list of (id, metadata, contents[, embedding], distance) tuples
+            or a pandas DataFrame containing the search results.
 
         Basic Examples:
             Basic search:
@@ -126,62 +723,417 @@ class VectorStore:
         Time-based filtering:
             Search with time range:
                 vector_store.search("Recent updates", time_range=(datetime(2024, 1, 1), datetime(2024, 1, 31)))
+            Search contracts expiring in Q3 2024:
+                vector_store.search("Renewal terms", date_range={"expiration_date": (date(2024, 7, 1), date(2024, 9, 30))})
         """
         query_embedding = self.get_embedding(query_text)
+        if hybrid is None:
+            hybrid = self.vector_settings.hybrid_search
 
         start_time = time.time()
+        params = [self._vector_literal(query_embedding)]
+        if hybrid:
+            params.append(query_text)
+        where, params = self._build_where_clause(
+            params, metadata_filter, predicates, time_range, date_range
+        )
+        results = self._planned_fetch(
+            lambda plan: self._search_query(where, limit, include_embeddings, hybrid, plan),
+            where,
+            params,
+            limit,
+            query_params,
+            hybrid,
+        )
+        elapsed_time = time.time() - start_time
 
-        search_args = {
-            "limit": limit,
-        }
+        logging.info(f"Vector search completed in {elapsed_time:.3f} seconds")
 
-        if metadata_filter:
-            search_args["filter"] = metadata_filter
+        if return_dataframe:
+            return self._create_dataframe_from_results(results)
+        else:
+            return results
 
-        if predicates:
-            search_args["predicates"] = predicates
+    def search_batch(
+        self,
+        query_texts: List[str],
+        limit: int = 5,
+        metadata_filter: Union[dict, List[dict]] = None,
+        predicates: Optional[client.Predicates] = None,
+        time_range: Optional[Tuple[datetime, datetime]] = None,
+        date_range: Optional[Dict[str, Tuple[Optional[date], Optional[date]]]] = None,
+        return_dataframe: bool = True,
+        include_embeddings: bool = False,
+        hybrid: Optional[bool] = None,
+        query_params: Optional[client.QueryParams] = None,
+    ) -> Union[List[Tuple[Any, ...]], pd.DataFrame]:
+        """
+        Search for many query texts at once and return the merged top results.
 
-        if time_range:
-            start_date, end_date = time_range
-            search_args["uuid_time_filter"] = client.UUIDTimeRange(start_date, end_date)
+        All query texts are embedded with one batched call, and every
+        nearest-neighbour lookup runs in a single SQL statement via a LATERAL
+        join over the array of query vectors. Hits found by several queries
+        are deduplicated by id, keeping the best distance (or fused score).
+
+        Args:
+            query_texts: The input texts to search for (e.g. chunks of a contract).
+            limit: The maximum number of results per query and in the merged result.
+            metadata_filter: A dictionary or list of dictionaries for equality-based metadata filtering.
+            predicates: A Predicates object for complex metadata filtering.
+            time_range: A tuple of (start_date, end_date) to filter results by time.
+            date_range: Inclusive (start, end) dates per date column (see search).
+            return_dataframe: Whether to return results as a DataFrame (default: True).
+            include_embeddings: Whether to fetch the stored embeddings (default: False).
+            hybrid: Fuse full-text and vector rankings (default: VectorStoreSettings.hybrid_search).
+            query_params: Index tuning for this query, e.g. client.DiskAnnIndexParams(rescore=400)
+                (default: from VectorStoreSettings.index).
+
+        Returns:
+            Either a list of tuples or a pandas DataFrame, best match first.
+        """
+        if not query_texts:
+            results = []
+            return self._create_dataframe_from_results(results) if return_dataframe else results
 
-        results = self.vec_client.search(query_embedding, **search_args)
+        query_embeddings = self.get_embeddings(query_texts)
+        if hybrid is None:
+            hybrid = self.vector_settings.hybrid_search
+
+        start_time = time.time()
+        params = [[self._vector_literal(embedding) for embedding in query_embeddings]]
+        if hybrid:
+            params.append(list(query_texts))
+        where, params = self._build_where_clause(
+            params, metadata_filter, predicates, time_range, date_range
+        )
+        results = self._planned_fetch(
+            lambda plan: self._batch_search_query(where, limit, include_embeddings, hybrid, plan),
+            where,
+            params,
+            limit,
+            query_params,
+            hybrid,
+        )
         elapsed_time = time.time() - start_time
 
-        logging.info(f"Vector search completed in {elapsed_time:.3f} seconds")
+        logging.info(
+            f"Batch vector search for {len(query_texts)} queries completed in {elapsed_time:.3f} seconds"
+        )
 
         if return_dataframe:
             return self._create_dataframe_from_results(results)
         else:
             return results
 
-    def _create_dataframe_from_results(
+    def _batch_search_query(
+        self,
+        where: str,
+        limit: int,
+        include_embeddings: bool = False,
+        hybrid: bool = False,
+        plan: Optional[SearchPlan] = None,
+    ) -> str:
+        """SQL for search_batch: one LATERAL nearest-neighbour search per query vector in $1."""
+        embedding_column = "embedding, " if include_embeddings else ""
+        if hybrid:
+            queries = f"unnest($1::{self.vector_type}[], $2::text[]) AS q(query_embedding, query_text)"
+            hits = self._hybrid_hits(
+                "q.query_embedding", "q.query_text", where, limit, include_embeddings, plan
+            )
+            best_first = "score DESC"
+        else:
+            queries = f"unnest($1::{self.vector_type}[]) AS q(query_embedding)"
+            hits = self._nearest_rows(
+                "q.query_embedding", where, limit, f"id, metadata, contents, {embedding_column}", plan
+            )
+            best_first = "distance"
+        return f"""
+        SELECT id, metadata, contents, {embedding_column}distance
+        FROM (
+            SELECT DISTINCT ON (hit.id) hit.*
+            FROM {queries}
+            CROSS JOIN LATERAL ({hits}) AS hit
+            ORDER BY hit.id, hit.{best_first}
+        ) AS merged
+        ORDER BY {best_first}
+        LIMIT {int(limit)}
+        """
+
+    def _nearest_rows(
         self,
+        query_vector: str,
+        where: str,
+        limit: int,
+        columns: str,
+        plan: Optional[SearchPlan] = None,
+    ) -> str:
+        """
+        SQL selecting `columns` and distance for the `limit` nearest rows passing where.
+
+        The exact strategy fences the filtered rows off with OFFSET 0, so the
+        filter can use the B-tree/GIN indexes and the ANN index is not used.
+        The overfetch strategy takes the nearest plan.candidates rows from the
+        ANN index first and filters those.
+
+        Args:
+            query_vector: SQL expression for the query embedding.
+            where: Filter the rows must pass.
+            limit: Number of rows to return.
+            columns: Select list before the distance, with a trailing ", ".
+            plan: How to search (default: ANN with the filter inline).
+        """
+        table_name = self._table_name()
+        strategy = plan.strategy if plan else "ann"
+        if strategy == "exact":
+            return f"""
+                SELECT * FROM (
+                    SELECT {columns}embedding <=> {query_vector} AS distance
+                    FROM {table_name}
+                    WHERE {where}
+                    OFFSET 0
+                ) AS filtered
+                ORDER BY distance
+                LIMIT {int(limit)}
+            """
+        if strategy == "overfetch":
+            return f"""
+                SELECT {columns}distance FROM (
+                    SELECT *, embedding <=> {query_vector} AS distance
+                    FROM {table_name}
+                    ORDER BY embedding <=> {query_vector}
+                    LIMIT {int(plan.candidates)}
+                ) AS nearest
+                WHERE {where}
+                ORDER BY distance
+                LIMIT {int(limit)}
+            """
+        return f"""
+                SELECT {columns}embedding <=> {query_vector} AS distance
+                FROM {table_name}
+                WHERE {where}
+                ORDER BY embedding <=> {query_vector}
+                LIMIT {int(limit)}
+            """
+
+    def _search_query(
+        self,
+        where: str,
+        limit: int,
+        include_embeddings: bool = False,
+        hybrid: bool = False,
+        plan: Optional[SearchPlan] = None,
+    ) -> str:
+        """
+        SQL for one nearest-neighbour search with $1 as the query vector.
+
+        The query vector is passed as text and cast. The embedding column is only selected
+        when asked for, since it dominates the size of each row. A hybrid
+        search also takes the query text as $2 (see _hybrid_hits).
+        """
+        embedding_column = "embedding, " if include_embeddings else ""
+        query_vector = f"$1::text::{self.vector_type}"
+        if hybrid:
+            hits = self._hybrid_hits(
+                query_vector, "$2::text", where, limit, include_embeddings, plan
+            )
+            return f"""
+        SELECT id, metadata, contents, {embedding_column}distance
+        FROM ({hits}) AS hit
+        ORDER BY score DESC
+        """
+        return self._nearest_rows(
+            query_vector, where, limit, f"id, metadata, contents, {embedding_column}", plan
+        )
+
+    def _hybrid_hits(
+        self,
+        query_vector: str,
+        query_text: str,
+        where: str,
+        limit: int,
+        include_embeddings: bool = False,
+        plan: Optional[SearchPlan] = None,
+    ) -> str:
+        """
+        SQL fusing a vector ranking and a full-text ranking with reciprocal rank fusion.
+
+        The top hybrid_candidates rows of the ANN search and of the full-text
+        search (any query term matching, ranked by ts_rank_cd) are each
+        numbered by rank; every row scores sum(1 / (rrf_k + rank)) over the
+        rankings it appears in and the best `limit` rows are returned with
+        their id, metadata, contents, [embedding,] distance and score.
+
+        Args:
+            query_vector: SQL expression for the query embedding.
+            query_text: SQL expression for the query text.
+            where: Filter applied to both rankings.
+            limit: Number of fused rows to return.
+            include_embeddings: Whether to select the embedding column.
+            plan: How the vector ranking finds its candidates (see _nearest_rows).
+        """
+        table_name = self._table_name()
+        config = self._text_search_config()
+        candidates = int(self.vector_settings.hybrid_candidates)
+        rrf_k = int(self.vector_settings.rrf_k)
+        embedding_column = "t.embedding, " if include_embeddings else ""
+        # OR the query's lexemes: a clause-sized query ANDed would match nothing
+        vector_hits = self._nearest_rows(query_vector, where, candidates, "id, ", plan)
+        text_query = f"replace(plainto_tsquery({config}, {query_text})::text, '&', '|')::tsquery"
+        return f"""
+            SELECT t.id, t.metadata, t.contents, {embedding_column}
+                   t.embedding <=> {query_vector} AS distance, fused.score
+            FROM (
+                SELECT ranked.id, sum(1.0 / ({rrf_k} + ranked.rank)) AS score
+                FROM (
+                    SELECT id, row_number() OVER (ORDER BY distance) AS rank
+                    FROM ({vector_hits}) AS vector_hits
+                    UNION ALL
+                    SELECT id, row_number() OVER (ORDER BY text_rank DESC) AS rank
+                    FROM (
+                        SELECT id, ts_rank_cd(contents_tsv, {text_query}) AS text_rank
+                        FROM {table_name}
+                        WHERE contents_tsv @@ {text_query} AND {where}
+                        ORDER BY text_rank DESC
+                        LIMIT {candidates}
+                    ) AS text_hits
+                ) AS ranked
+                GROUP BY ranked.id
+                ORDER BY score DESC
+                LIMIT {int(limit)}
+            ) AS fused
+            JOIN {table_name} AS t ON t.id = fused.id
+        """
+
+    @staticmethod
+    def _vector_literal(embedding: List[float]) -> str:
+        """Format an embedding as a pgvector text literal."""
+        return "[" + ",".join(str(float(x)) for x in embedding) + "]"
+
+    def _build_where_clause(
+        self,
+        params: List[Any],
+        metadata_filter: Union[dict, List[dict]] = None,
+        predicates: Optional[client.Predicates] = None,
+        time_range: Optional[Tuple[datetime, datetime]] = None,
+        date_range: Optional[Dict[str, Tuple[Optional[date], Optional[date]]]] = None,
+    ) -> Tuple[str, List[Any]]:
+        """
+        Build a WHERE clause with the same filter semantics as search.
+
+        Placeholders use the $n style of timescale_vector, numbered after the
+        given params.
+        """
+        builder = self.vec_client.builder
+        where_clauses = []
+        if metadata_filter:
+            where_filter, params = builder._where_clause_for_filter(params, metadata_filter)
+            where_clauses.append(where_filter)
+        if predicates:
+            where_predicates, params = predicates.build_query(params)
+            where_clauses.append(f"({where_predicates})")
+        if time_range:
+            start_date, end_date = time_range
+            where_time, params = client.UUIDTimeRange(start_date, end_date).build_query(params)
+            where_clauses.append(where_time)
+        if date_range:
+            where_dates, params = self._date_range_clause(params, date_range)
+            where_clauses.extend(where_dates)
+        return (" AND ".join(where_clauses) if where_clauses else "TRUE"), params
+
+    def _date_range_clause(
+        self,
+        params: List[Any],
+        date_range: Dict[str, Tuple[Optional[date], Optional[date]]],
+    ) -> Tuple[List[str], List[Any]]:
+        """
+        Conditions for date_range on the typed date columns.
+
+        Ids carry the agreement date (see insert_vectors.content_uuid), so an
+        agreement_date range also bounds uuid_timestamp(id) and lets
+        TimescaleDB skip partitions outside it.
+        """
+        params = list(params)
+        clauses = []
+        for column, (start, end) in date_range.items():
+            if column not in self._date_columns():
+                raise ValueError(
+                    f"Unknown date column: {column!r} (expected one of "
+                    f"{', '.join(self._date_columns())})"
+                )
+            start, end = (
+                value.date() if isinstance(value, datetime) else value for value in (start, end)
+            )
+            if start is not None:
+                params.append(start)
+                clauses.append(f"{column} >= ${len(params)}")
+            if end is not None:
+                params.append(end)
+                clauses.append(f"{column} <= ${len(params)}")
+            if column == "agreement_date" and (start is not None or end is not None):
+                where_time, params = client.UUIDTimeRange(
+                    self._utc_midnight(start) if start is not None else None,
+                    self._utc_midnight(end + timedelta(days=1)) if end is not None else None,
+                ).build_query(params)
+                clauses.append(where_time)
+        return clauses, params
+
+    @staticmethod
+    def _utc_midnight(day: date) -> datetime:
+        return datetime(day.year, day.month, day.day, tzinfo=timezone.utc)
+
+    def get_ids(self) -> Set[str]:
+        """
+        Return the ids of every record currently stored in the table.
+
+        Used by incremental sync to decide which records to skip or delete
+        without fetching contents or embeddings.
+        """
+        table_name = client.QueryBuilder._quote_ident(self.vector_settings.table_name)
+        with self.vec_client.connect() as conn:
+            with conn.cursor() as cur:
+                cur.execute(f"SELECT id FROM {table_name}")
+                return {str(row[0]) for row in cur.fetchall()}
+
+    @staticmethod
+    def _create_dataframe_from_results(
         results: List[Tuple[Any, ...]],
     ) -> pd.DataFrame:
         """
         Create a pandas DataFrame from the search results.
 
+        Columns are built directly from the result tuples, and the metadata
+        dicts are expanded into columns in one DataFrame.from_records call
+        instead of a per-row apply.
+
         Args:
-            results: A list of tuples containing the search results.
+            results: (id, metadata, contents[, embedding], distance) tuples.
 
         Returns:
-            A pandas DataFrame containing the formatted search results.
+            A pandas DataFrame with id, content, [embedding,] distance and one
+            column per metadata key.
         """
-        # Convert results to DataFrame
-        df = pd.DataFrame(
-            results, columns=["id", "metadata", "content", "embedding", "distance"]
-        )
+        include_embeddings = bool(results) and len(results[0]) == 5
+        columns = list(zip(*results)) if results else [(), (), (), ()]
+        data = {
+            # Convert id to string for better readability
+            "id": [str(id_) for id_ in columns[0]],
+            "content": list(columns[2]),
+        }
+        if include_embeddings:
+            # Keep embeddings as compact float32 arrays instead of Python float lists
+            data["embedding"] = [
+                np.asarray(
+                    embedding.to_numpy() if hasattr(embedding, "to_numpy") else embedding,
+                    dtype=np.float32,
+                )
+                for embedding in columns[3]
+            ]
+        data["distance"] = np.asarray(columns[-1], dtype=np.float64)
+        df = pd.DataFrame(data)
 
         # Expand metadata column
-        df = pd.concat(
-            [df.drop(["metadata"], axis=1), df["metadata"].apply(pd.Series)], axis=1
-        )
-
-        # Convert id to string for better readability
-        df["id"] = df["id"].astype(str)
-
-        return df
+        metadata = pd.DataFrame.from_records(list(columns[1]), index=df.index)
+        return pd.concat([df, metadata], axis=1)
 
     def delete(
         self,
@@ -227,3 +1179,15 @@ class VectorStore:
             logging.info(
                 f"Deleted records matching metadata filter from {self.vector_settings.table_name}"
             )
+
+
+def create_vector_store() -> VectorStore:
+    """Create the vector store backend selected by VectorStoreSettings.backend."""
+    backend = get_settings().vector_store.backend
+    if backend == "timescale":
+        return VectorStore()
+    if backend == "local":
+        from database.local_vector_store import LocalVectorStore
+
+        return LocalVectorStore()
+    raise ValueError(f"Unknown vector store backend: {backend!r} (expected 'timescale' or 'local')")
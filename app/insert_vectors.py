@@ -1,88 +1,217 @@
+import argparse
+import calendar
+import hashlib
+import json
 import logging
-from datetime import datetime
+import uuid
+from typing import Dict, Iterable, Iterator, List
 import pandas as pd
-from database.vector_store import VectorStore
+from config.settings import get_settings
+from database.vector_store import VectorStore, create_vector_store
+from services.chunker import chunk_text
 from timescale_vector.client import uuid_from_time
 
-def truncate_text(text: str, max_bytes: int = 9900) -> str:
-    """Truncate text to ensure it doesn't exceed the byte limit."""
-    encoded = text.encode('utf-8')
-    if len(encoded) <= max_bytes:
-        return text
-    
-    # Binary search to find the right cutoff point
-    left, right = 0, len(text)
-    while left < right:
-        mid = (left + right + 1) // 2
-        if len(text[:mid].encode('utf-8')) <= max_bytes:
-            left = mid
-        else:
-            right = mid - 1
-            
-    return text[:left]
-
-# Initialize VectorStore
-vec = VectorStore()
-
-# Delete all existing embeddings
-vec.delete(delete_all=True)
-logging.info("Deleted all existing embeddings")
-
-# Read the CSV file
-df = pd.read_csv("data/updated_file_with_contracts_final.csv")
-
-# Convert date columns to datetime
-date_columns = ['Agreement Date', 'Effective Date', 'Expiration Date']
-for col in date_columns:
-    df[col] = pd.to_datetime(df[col], errors='coerce')
-
-# Prepare the data with proper metadata
-processed_data = []
-for _, row in df.iterrows():
-    # Create metadata dictionary with only date fields
-    metadata = {
-        "agreement_date": row["Agreement Date"].isoformat() if pd.notna(row["Agreement Date"]) else None,
-        "effective_date": row["Effective Date"].isoformat() if pd.notna(row["Effective Date"]) else None,
-        "expiration_date": row["Expiration Date"].isoformat() if pd.notna(row["Expiration Date"]) else None,
-    }
-    
-    # Combine all other columns into the content string
-    content_parts = []
-    for col in df.columns:
-        if col != 'contract' and col not in date_columns:
-            content_parts.append(f"{col}: {str(row[col]).strip()}")
-    
-    # Add the main contract text at the end
-    if pd.notna(row['contract']):
-        content_parts.append(f"Contract Text: {str(row['contract']).strip()}")
-    
-    # Join all content parts with newlines
-    full_content = "\n".join(content_parts)
-    
-    # Truncate content to fit within API limits
-    truncated_content = truncate_text(full_content)
-    
-    # Generate embedding for the truncated content
-    embedding = vec.get_embedding(truncated_content)
-    
-    # Create record with UUID based on current time
-    record = {
-        "id": uuid_from_time(datetime.now()),
-        "metadata": metadata,
-        "contents": truncated_content,
-        "embedding": embedding
-    }
-    processed_data.append(record)
-    
-    # Log progress every 10 records
-    if len(processed_data) % 10 == 0:
-        logging.info(f"Processed {len(processed_data)} contracts...")
-
-# Convert to DataFrame and insert
-insert_df = pd.DataFrame(processed_data)
-vec.upsert(insert_df)
-
-# Create the index
-vec.create_index()
-
-logging.info(f"Successfully inserted {len(processed_data)} contract entries")
\ No newline at end of file
+DATA_PATH = "data/updated_file_with_contracts_final.csv"
+DATE_COLUMNS = ['Agreement Date', 'Effective Date', 'Expiration Date']
+# Timestamp (2000-01-01 UTC) for the time part of ids of contracts without an agreement date
+CONTENT_ID_EPOCH = 946684800
+
+def content_uuid(contents: str, timestamp: float = CONTENT_ID_EPOCH) -> uuid.UUID:
+    """
+    Derive a deterministic type 1 UUID from the record contents (and metadata).
+
+    The table is partitioned on uuid_timestamp(id), so ids must stay version 1.
+    The timestamp is the contract's agreement date (see id_timestamp) and the
+    node and clock sequence fields carry 62 bits of the SHA-256 of the
+    contents, so the same text always maps to the same id, any edit produces
+    a new one, and rows are partitioned by contract time.
+    """
+    digest = int.from_bytes(hashlib.sha256(contents.encode('utf-8')).digest()[:8], 'big')
+    return uuid_from_time(timestamp, node=digest >> 16, clock_seq=digest & 0x3fff)
+
+def id_timestamp(agreement_date: pd.Timestamp) -> float:
+    """UTC midnight of the agreement date, or CONTENT_ID_EPOCH if it is unknown."""
+    if pd.isna(agreement_date):
+        return CONTENT_ID_EPOCH
+    return calendar.timegm(agreement_date.date().timetuple())
+
+def read_contracts(path: str, batch_size: int) -> Iterator[pd.DataFrame]:
+    """Read the contracts CSV lazily, batch_size rows at a time."""
+    for chunk in pd.read_csv(path, chunksize=batch_size):
+        # Convert date columns to datetime
+        for col in DATE_COLUMNS:
+            chunk[col] = pd.to_datetime(chunk[col], errors='coerce')
+        yield chunk
+
+def prepare_records(df: pd.DataFrame) -> List[Dict]:
+    """Build records (without embeddings), one per clause chunk, for a batch of contracts."""
+    records = []
+    for _, row in df.iterrows():
+        # Create metadata dictionary with only date fields
+        metadata = {
+            "agreement_date": row["Agreement Date"].isoformat() if pd.notna(row["Agreement Date"]) else None,
+            "effective_date": row["Effective Date"].isoformat() if pd.notna(row["Effective Date"]) else None,
+            "expiration_date": row["Expiration Date"].isoformat() if pd.notna(row["Expiration Date"]) else None,
+        }
+
+        # Combine all other columns into the content string
+        content_parts = []
+        for col in df.columns:
+            if col != 'contract' and col not in DATE_COLUMNS:
+                content_parts.append(f"{col}: {str(row[col]).strip()}")
+
+        # Add the main contract text at the end
+        if pd.notna(row['contract']):
+            content_parts.append(f"Contract Text: {str(row['contract']).strip()}")
+
+        # Join all content parts with newlines
+        full_content = "\n".join(content_parts)
+
+        # Split into clause-aware chunks that fit within API limits
+        chunks = chunk_text(full_content, max_bytes=get_settings().chunking.ingest_max_bytes)
+        for chunk_index, chunk in enumerate(chunks):
+            chunk_metadata = {**metadata, "chunk_index": chunk_index}
+
+            # Create record with an id derived from its contents
+            records.append({
+                "id": content_uuid(
+                    json.dumps(chunk_metadata, sort_keys=True) + chunk,
+                    id_timestamp(row["Agreement Date"]),
+                ),
+                "metadata": chunk_metadata,
+                "contents": chunk,
+            })
+    return records
+
+def embed_records(vec: VectorStore, record_batches: Iterable[List[Dict]]) -> Iterator[Dict]:
+    """Embed each batch of records with batched, concurrent requests and yield the records."""
+    total = 0
+    for records in record_batches:
+        embeddings = vec.get_embeddings([record["contents"] for record in records])
+        for record, embedding in zip(records, embeddings):
+            record["embedding"] = embedding
+            yield record
+        total += len(records)
+        logging.info(f"Embedded {total} chunk records...")
+
+def ingest(vec: VectorStore, path: str = DATA_PATH, batch_size: int = None) -> int:
+    """
+    Stream the contracts CSV into the vector store.
+
+    Contracts are read and embedded batch_size rows at a time, and the
+    embedded records stream straight into VectorStore.bulk_upsert, so memory
+    stays bounded and committed COPY batches survive a crash.
+
+    Args:
+        vec: The VectorStore to write to.
+        path: Path to the contracts CSV.
+        batch_size: Rows per batch (default: VectorStoreSettings.ingest_batch_size).
+
+    Returns:
+        The number of records upserted.
+    """
+    batch_size = batch_size or vec.vector_settings.ingest_batch_size
+    seen_ids = set()
+
+    def record_batches() -> Iterator[List[Dict]]:
+        for chunk in read_contracts(path, batch_size):
+            # Identical rows get the same content id; embed and upsert them once
+            records = []
+            for record in prepare_records(chunk):
+                record_id = str(record["id"])
+                if record_id not in seen_ids:
+                    seen_ids.add(record_id)
+                    records.append(record)
+            if records:
+                yield records
+
+    stats = vec.bulk_upsert(embed_records(vec, record_batches()))
+    return stats["rows"]
+
+def sync(vec: VectorStore, path: str = DATA_PATH, batch_size: int = None) -> Dict[str, int]:
+    """
+    Incrementally bring the vector store in line with the contracts CSV.
+
+    Ids are derived from contents, so a record whose id is already stored is
+    unchanged and is skipped without calling the embedding API. New or edited
+    contracts get new ids and are embedded and bulk loaded; stored ids that
+    no longer appear in the CSV (removed or superseded contracts) are deleted.
+    An interrupted sync can simply be re-run.
+
+    Args:
+        vec: The VectorStore to write to.
+        path: Path to the contracts CSV.
+        batch_size: Rows per batch (default: VectorStoreSettings.ingest_batch_size).
+
+    Returns:
+        Counts of inserted, unchanged and deleted records.
+    """
+    batch_size = batch_size or vec.vector_settings.ingest_batch_size
+    existing_ids = vec.get_ids()
+    seen_ids = set()
+    stats = {"inserted": 0, "unchanged": 0, "deleted": 0}
+
+    def new_record_batches() -> Iterator[List[Dict]]:
+        for chunk in read_contracts(path, batch_size):
+            new_records = []
+            for record in prepare_records(chunk):
+                record_id = str(record["id"])
+                if record_id in seen_ids:
+                    continue
+                seen_ids.add(record_id)
+                if record_id in existing_ids:
+                    stats["unchanged"] += 1
+                else:
+                    new_records.append(record)
+
+            if new_records:
+                stats["inserted"] += len(new_records)
+                yield new_records
+            logging.info(
+                f"Synced {len(seen_ids)} chunk records ({stats['inserted']} new or changed)..."
+            )
+
+    vec.bulk_upsert(embed_records(vec, new_record_batches()))
+
+    stale_ids = sorted(existing_ids - seen_ids)
+    for i in range(0, len(stale_ids), batch_size):
+        vec.delete(ids=stale_ids[i : i + batch_size])
+    stats["deleted"] = len(stale_ids)
+    return stats
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Load contracts into the vector store.")
+    parser.add_argument("--path", default=DATA_PATH, help="Contracts CSV to ingest")
+    parser.add_argument(
+        "--rebuild",
+        action="store_true",
+        help="Delete everything and re-embed the whole corpus instead of syncing",
+    )
+    args = parser.parse_args()
+
+    # Initialize VectorStore, creating the table or migrating it to the current embedding model
+    vec = create_vector_store()
+    vec.create_tables()
+
+    if args.rebuild:
+        # Delete all existing embeddings
+        vec.delete(delete_all=True)
+        logging.info("Deleted all existing embeddings")
+
+        total = ingest(vec, args.path)
+        logging.info(f"Successfully inserted {total} chunk records")
+    else:
+        stats = sync(vec, args.path)
+        logging.info(
+            f"Sync complete: {stats['inserted']} inserted, "
+            f"{stats['unchanged']} unchanged, {stats['deleted']} deleted"
+        )
+
+    if vec.embedding_cache:
+        logging.info(f"Embedding cache: {vec.embedding_cache.stats()}")
+
+    # A full reload rebuilds the index behind the live one; a sync only creates it if missing
+    if args.rebuild:
+        vec.rebuild_index()
+    else:
+        vec.create_index()
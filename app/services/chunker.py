@@ -0,0 +1,226 @@
+import hashlib
+import re
+from collections import deque
+from typing import Deque, Iterable, Iterator, List, Optional, Tuple
+
+from config.settings import get_settings
+
+# A new unit starts after a blank line, or before a line that opens a heading
+# or a numbered clause: "ARTICLE IV", "Section 2", "12.3", "(b)", "DEFINITIONS".
+_BOUNDARY = re.compile(
+    r"""
+    \n[ \t]*\n\s*                                   # paragraph break
+    | \n(?=[ \t]*(?:
+          (?:ARTICLE|Article|SECTION|Section|SCHEDULE|Schedule|
+             EXHIBIT|Exhibit|ANNEX|Annex|APPENDIX|Appendix)\b
+        | \d{1,3}(?:\.\d{1,3})*[.)]?[ \t]+\S       # 1. / 1.2 / 3.4.1 / 7)
+        | \([a-zA-Z0-9]{1,4}\)[ \t]+\S             # (a) / (iv) / (12)
+        | [A-Z][A-Z0-9 ,&'/-]{3,}[ \t]*\n          # ALL CAPS HEADING
+    ))
+    """,
+    re.VERBOSE,
+)
+_SENTENCE_END = re.compile(r"(?<=[.;:!?])\s+")
+
+
+def estimate_tokens(text: str) -> int:
+    """Rough token count for budgeting (about four UTF-8 bytes per token)."""
+    return (len(text.encode("utf-8")) + 3) // 4
+
+
+def _split_bytes(text: str, max_bytes: int) -> Iterator[Tuple[str, int]]:
+    """Hard-split text into pieces of at most max_bytes without breaking a character."""
+    data = text.encode("utf-8")
+    start = 0
+    while start < len(data):
+        end = min(start + max_bytes, len(data))
+        # Step back over UTF-8 continuation bytes so we cut on a character boundary
+        while end < len(data) and (data[end] & 0xC0) == 0x80:
+            end -= 1
+        yield data[start:end].decode("utf-8"), end - start
+        start = end
+
+
+def _split_structure(text: str) -> Iterator[str]:
+    """Split text at paragraph breaks, headings and numbered clauses."""
+    start = 0
+    for match in _BOUNDARY.finditer(text):
+        if match.end() > start:
+            yield text[start:match.end()]
+            start = match.end()
+    if start < len(text):
+        yield text[start:]
+
+
+def _iter_units(texts: Iterable[str], max_bytes: int) -> Iterator[Tuple[str, int]]:
+    """Yield (unit, byte length) pairs, each unit no larger than max_bytes."""
+    for text in texts:
+        for segment in _split_structure(text):
+            size = len(segment.encode("utf-8"))
+            if size <= max_bytes:
+                yield segment, size
+                continue
+            # An oversized clause falls back to sentences, then to a hard split
+            start = 0
+            sentences = []
+            for match in _SENTENCE_END.finditer(segment):
+                sentences.append(segment[start:match.end()])
+                start = match.end()
+            sentences.append(segment[start:])
+            for sentence in sentences:
+                size = len(sentence.encode("utf-8"))
+                if size <= max_bytes:
+                    yield sentence, size
+                else:
+                    yield from _split_bytes(sentence, max_bytes)
+
+
+def iter_chunks(
+    texts: Iterable[str],
+    max_bytes: Optional[int] = None,
+    overlap_bytes: Optional[int] = None,
+) -> Iterator[str]:
+    """
+    Split a stream of texts (e.g. PDF pages) into clause-aware chunks.
+
+    Text is cut into units at contract structure (paragraphs, headings and
+    numbered clauses), falling back to sentences and finally raw bytes only
+    for units that do not fit. Units are packed greedily into chunks of at
+    most max_bytes UTF-8 bytes, and each new chunk starts with up to
+    overlap_bytes of trailing units from the previous one. Every unit's size
+    is measured once, so the whole split is a single linear pass; chunks are
+    yielded as soon as they are full.
+
+    Args:
+        texts: The texts to split, consumed lazily.
+        max_bytes: Byte budget per chunk (default: ChunkingSettings.max_bytes).
+        overlap_bytes: Bytes of context repeated between consecutive chunks
+            (default: ChunkingSettings.overlap_bytes).
+
+    Yields:
+        Whitespace-stripped, non-empty chunks.
+    """
+    settings = get_settings().chunking
+    max_bytes = max_bytes or settings.max_bytes
+    overlap_bytes = settings.overlap_bytes if overlap_bytes is None else overlap_bytes
+
+    current: Deque[Tuple[str, int]] = deque()
+    size = 0
+    has_new_units = False
+    for unit, unit_bytes in _iter_units(texts, max_bytes):
+        if has_new_units and size + unit_bytes > max_bytes:
+            chunk = "".join(text for text, _ in current).strip()
+            if chunk:
+                yield chunk
+
+            # Keep the trailing units that fit in the overlap budget
+            tail: Deque[Tuple[str, int]] = deque()
+            tail_size = 0
+            for text, text_bytes in reversed(current):
+                if tail_size + text_bytes > overlap_bytes:
+                    break
+                tail.appendleft((text, text_bytes))
+                tail_size += text_bytes
+            current, size, has_new_units = tail, tail_size, False
+
+        # Drop overlap that would leave no room for the next unit
+        while current and size + unit_bytes > max_bytes:
+            size -= current.popleft()[1]
+
+        current.append((unit, unit_bytes))
+        size += unit_bytes
+        has_new_units = True
+
+    if has_new_units:
+        chunk = "".join(text for text, _ in current).strip()
+        if chunk:
+            yield chunk
+
+
+def chunk_text(
+    text: str,
+    max_bytes: Optional[int] = None,
+    overlap_bytes: Optional[int] = None,
+) -> List[str]:
+    """Split a single text into clause-aware chunks (see iter_chunks)."""
+    return list(iter_chunks([text], max_bytes, overlap_bytes))
+
+
+def _anchor_score(unit: str, unit_bytes: int, target_bytes: int) -> float:
+    """
+    A chunk may end after a unit scoring below 1, decided by the unit alone.
+
+    Scores are uniform hashes scaled by target_bytes / unit_bytes, so a unit
+    is an anchor with probability unit_bytes / target_bytes and chunks
+    average about target_bytes. Only the unit's opening (a clause's number
+    and first words) is hashed, so rewording a clause moves its score a
+    little with its size instead of drawing a new one.
+    """
+    digest = hashlib.blake2b(unit.strip()[:64].encode("utf-8"), digest_size=8).digest()
+    return int.from_bytes(digest, "big") / (1 << 64) * target_bytes / max(unit_bytes, 1)
+
+
+def iter_content_defined_chunks(
+    texts: Iterable[str],
+    max_bytes: Optional[int] = None,
+    target_bytes: Optional[int] = None,
+) -> Iterator[str]:
+    """
+    Split a stream of texts into clause-aware chunks cut at content-defined points.
+
+    Uses the same units as iter_chunks, without overlap, but a chunk only
+    ends after a unit whose hash marks it as an anchor, so every cut depends
+    on the text of the unit it follows rather than on where the previous
+    chunk ended. Editing one clause therefore changes the chunk holding it
+    (or splits or merges it with a neighbour) while every other chunk keeps
+    its exact text, which keeps per-chunk caches valid across edits. A run
+    without an anchor that would overflow max_bytes is cut after its
+    best-scoring unit; keep max_bytes several times target_bytes so that
+    stays rare.
+
+    Args:
+        texts: The texts to split, consumed lazily.
+        max_bytes: Byte budget per chunk (default: ChunkingSettings.map_max_bytes).
+        target_bytes: Average chunk size to aim for
+            (default: ChunkingSettings.map_target_bytes).
+
+    Yields:
+        Whitespace-stripped, non-empty chunks.
+    """
+    settings = get_settings().chunking
+    max_bytes = max_bytes or settings.map_max_bytes
+    target_bytes = min(target_bytes or settings.map_target_bytes, max_bytes)
+
+    # (unit, byte length, anchor score) since the last cut
+    current: List[Tuple[str, int, float]] = []
+    size = 0
+    for unit, unit_bytes in _iter_units(texts, max_bytes):
+        while current and size + unit_bytes > max_bytes:
+            best = min(range(len(current)), key=lambda i: current[i][2])
+            chunk = "".join(text for text, _, _ in current[: best + 1]).strip()
+            if chunk:
+                yield chunk
+            current = current[best + 1 :]
+            size = sum(text_bytes for _, text_bytes, _ in current)
+
+        score = _anchor_score(unit, unit_bytes, target_bytes)
+        current.append((unit, unit_bytes, score))
+        size += unit_bytes
+        if score < 1.0:
+            chunk = "".join(text for text, _, _ in current).strip()
+            if chunk:
+                yield chunk
+            current, size = [], 0
+
+    chunk = "".join(text for text, _, _ in current).strip()
+    if chunk:
+        yield chunk
+
+
+def content_defined_chunks(
+    text: str,
+    max_bytes: Optional[int] = None,
+    target_bytes: Optional[int] = None,
+) -> List[str]:
+    """Split a single text into content-defined chunks (see iter_content_defined_chunks)."""
+    return list(iter_content_defined_chunks([text], max_bytes, target_bytes))
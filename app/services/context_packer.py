@@ -0,0 +1,147 @@
+import logging
+import re
+from typing import List, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+from config.settings import get_settings
+from services.chunker import chunk_text, estimate_tokens
+
+_WHITESPACE = re.compile(r"\s+")
+_WORD = re.compile(r"\w+")
+
+
+def _normalize(text: str) -> str:
+    return _WHITESPACE.sub(" ", text).strip().lower()
+
+
+def _shingles(text: str, size: int = 3) -> set:
+    """Word n-grams of the normalized text, for lexical near-duplicate detection."""
+    words = _WORD.findall(text.lower())
+    if len(words) <= size:
+        return {" ".join(words)}
+    return {" ".join(words[i : i + size]) for i in range(len(words) - size + 1)}
+
+
+def _row_tokens(row: pd.Series) -> int:
+    """Approximate tokens a context row adds to the prompt."""
+    return estimate_tokens(str(row["content"])) + estimate_tokens(str(row.get("metadata", "")))
+
+
+def _rank_and_deduplicate(context: pd.DataFrame, duplicate_threshold: float) -> pd.DataFrame:
+    """
+    Order context rows from most to least similar and drop near-duplicates.
+
+    Rows are ranked by ascending distance when a distance column is present.
+    A row is a near-duplicate when its embedding's cosine similarity to an
+    already kept row is at least duplicate_threshold, or, without embeddings
+    (search results skip them by default), when the Jaccard similarity of its
+    word 3-grams to a kept row's is at least duplicate_threshold.
+    """
+    if "distance" in context.columns:
+        context = context.sort_values("distance", kind="stable")
+
+    if "embedding" in context.columns and len(context):
+        matrix = np.vstack(context["embedding"].map(lambda e: np.asarray(e, dtype=np.float32)))
+        norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+        matrix = matrix / np.where(norms == 0, 1, norms)
+        kept: List[int] = []
+        for index in range(len(matrix)):
+            if kept and float(np.max(matrix[kept] @ matrix[index])) >= duplicate_threshold:
+                continue
+            kept.append(index)
+        return context.iloc[kept]
+
+    kept_shingles: List[set] = []
+    kept = []
+    for index, content in enumerate(context["content"].astype(str)):
+        shingles = _shingles(content)
+        if any(
+            len(shingles & other) >= duplicate_threshold * len(shingles | other)
+            for other in kept_shingles
+        ):
+            continue
+        kept_shingles.append(shingles)
+        kept.append(index)
+    return context.iloc[kept]
+
+
+def pack_question(question: str, max_tokens: int) -> str:
+    """
+    Fit the question (the contract text) into max_tokens.
+
+    Text that already fits is returned unchanged. Otherwise repeated chunks
+    (e.g. boilerplate repeated across pages) are dropped and the remaining
+    clause-aware chunks are kept in document order until the budget is spent.
+    """
+    if estimate_tokens(question) <= max_tokens:
+        return question
+    if max_tokens <= 0:
+        return ""
+
+    # Chunks no larger than the budget (about four bytes per token), without overlap
+    max_bytes = min(get_settings().chunking.max_bytes, max_tokens * 4)
+    seen = set()
+    packed = []
+    used = 0
+    for chunk in chunk_text(question, max_bytes=max_bytes, overlap_bytes=0):
+        key = _normalize(chunk)
+        if key in seen:
+            continue
+        seen.add(key)
+        tokens = estimate_tokens(chunk) + 1
+        if used + tokens > max_tokens:
+            break
+        packed.append(chunk)
+        used += tokens
+    return "\n\n".join(packed)
+
+
+def pack_context(
+    question: str,
+    context: pd.DataFrame,
+    max_tokens: Optional[int] = None,
+    question_share: Optional[float] = None,
+    duplicate_threshold: Optional[float] = None,
+) -> Tuple[str, pd.DataFrame]:
+    """
+    Fit the question and the retrieved context into one token budget.
+
+    The question gets up to question_share of the budget; whatever it leaves
+    unused goes to the context. Context rows are ranked by similarity,
+    near-duplicates are removed and rows are added until the budget is spent.
+    Token counts are estimated (see estimate_tokens) and logged.
+
+    Args:
+        question: The user question, here the full contract text.
+        context: Retrieved rows with content and metadata, optionally distance
+            and embedding columns.
+        max_tokens: Budget for question plus context (default: ContextSettings).
+        question_share: Fraction of the budget reserved for the question.
+        duplicate_threshold: Cosine similarity at which context rows count as duplicates.
+
+    Returns:
+        The packed question and the selected context rows, most similar first.
+    """
+    settings = get_settings().context
+    max_tokens = max_tokens or settings.max_tokens
+    question_share = settings.question_share if question_share is None else question_share
+    duplicate_threshold = duplicate_threshold or settings.duplicate_threshold
+
+    packed_question = pack_question(question, int(max_tokens * question_share))
+    question_tokens = estimate_tokens(packed_question)
+
+    ranked = _rank_and_deduplicate(context, duplicate_threshold)
+    row_tokens = ranked.apply(_row_tokens, axis=1) if len(ranked) else pd.Series(dtype=int)
+    # Rows are added in rank order while the running total fits the remaining budget
+    fits = (row_tokens.cumsum() <= max_tokens - question_tokens).to_numpy()
+    packed_context = ranked[fits]
+    context_tokens = int(row_tokens[fits].sum()) if len(ranked) else 0
+
+    logging.info(
+        f"Packed prompt context: question {estimate_tokens(question)} -> {question_tokens} tokens, "
+        f"context {len(context)} -> {len(packed_context)} rows "
+        f"({context_tokens} tokens, {len(context) - len(ranked)} near-duplicates), "
+        f"budget {max_tokens}"
+    )
+    return packed_question, packed_context
@@ -0,0 +1,173 @@
+import re
+from typing import Callable, Iterable, List, Optional, Tuple, Union
+
+import numpy as np
+import pandas as pd
+from fpdf import FPDF
+
+from config.settings import get_settings
+from services.chunker import iter_chunks
+from services.pdf_extractor import iter_pdf_pages
+from services.synthesizer import Synthesizer, SynthesizedResponse
+
+CONTEXT_METADATA_KEYS = ["agreement_date", "effective_date", "expiration_date"]
+REPORT_HEADERS = ["Compliance Report:", "Strengths:", "Areas for Improvement:", "Reasoning:", "Additional Information:"]
+
+
+def read_pdf(file, workers=None):
+    """Extract text from a PDF file path or file-like object"""
+    return "".join(page + "\n" for page in iter_pdf_pages(file, workers=workers))
+
+def read_txt(file):
+    """Read text from a TXT file path or uploaded file"""
+    if hasattr(file, "getvalue"):
+        return file.getvalue().decode("utf-8")
+    with open(file, encoding="utf-8") as f:
+        return f.read()
+
+def read_and_process_pdf(vec, file, workers=None, rate_limiter=None) -> Tuple[List[str], pd.DataFrame]:
+    """Extract a PDF and search its chunks while later pages are still being extracted; returns (pages, results)"""
+    pages = []
+
+    def collect():
+        for page in iter_pdf_pages(file, workers=workers):
+            pages.append(page + "\n")
+            yield pages[-1]
+
+    results = process_large_text(vec, collect(), rate_limiter=rate_limiter)
+    return pages, results
+
+def _iter_text_chunks(text: Union[str, Iterable[str]]):
+    """Chunks of a text or of a stream of page texts (see iter_chunks)"""
+    return iter_chunks([text] if isinstance(text, str) else text)
+
+def process_large_text(vec, text: Union[str, Iterable[str]], limit=3, rate_limiter=None):
+    """
+    Process large text (or a stream of page texts, consumed lazily) in chunks and combine results
+
+    Chunks are embedded and searched in batches of PipelineSettings.retrieve_batch_chunks
+    as soon as each batch is full, so retrieval overlaps PDF extraction. The merged result
+    keeps each record's best distance and the `limit` nearest overall.
+    """
+    batch_size = get_settings().pipeline.retrieve_batch_chunks
+    batches = []
+    batch = []
+    for chunk in _iter_text_chunks(text):
+        batch.append(chunk)
+        if len(batch) == batch_size:
+            batches.append(_search_chunks(vec, batch, limit, rate_limiter))
+            batch = []
+    if batch or not batches:
+        batches.append(_search_chunks(vec, batch, limit, rate_limiter))
+
+    combined_results = (
+        pd.concat(batches, ignore_index=True)
+        .sort_values("distance", kind="stable")
+        .drop_duplicates("id")
+        .head(limit)
+        .reset_index(drop=True)
+    )
+    return add_context_metadata(combined_results)
+
+def _search_chunks(vec, chunks, limit, rate_limiter):
+    """One batched embedding call and one search for a batch of chunks"""
+    if rate_limiter is not None and chunks:
+        rate_limiter.acquire()
+    return vec.search_batch(chunks, limit=limit)
+
+def add_context_metadata(results: pd.DataFrame) -> pd.DataFrame:
+    """Collect the contract dates of each search result into a metadata dict column"""
+    results['metadata'] = results.reindex(columns=CONTEXT_METADATA_KEYS).to_dict('records')
+    return results
+
+def embed_contract(vec, text: Union[str, Iterable[str]]) -> Optional[List[float]]:
+    """Contract-level embedding (mean of its chunk embeddings) for the near-duplicate response cache"""
+    if get_settings().response_cache.similarity_threshold is None:
+        return None
+    # Chunked like process_large_text (pass the pages of a PDF), so these are embedding cache hits
+    embeddings = np.asarray(vec.get_embeddings(list(_iter_text_chunks(text))), dtype=np.float32)
+    if not len(embeddings):
+        return None
+    mean = embeddings.mean(axis=0)
+    return (mean / (np.linalg.norm(mean) or 1.0)).tolist()
+
+def generate_analysis(
+    text: str,
+    results: pd.DataFrame,
+    contract_embedding: Optional[List[float]] = None,
+    on_token: Optional[Callable[[str], None]] = None,
+    on_reset: Optional[Callable[[], None]] = None,
+) -> SynthesizedResponse:
+    """Generate the compliance analysis; LLMFactory paces and retries the request"""
+    return Synthesizer.generate_response(
+        question=text,
+        context=results,
+        contract_embedding=contract_embedding,
+        on_token=on_token,
+        on_reset=on_reset,
+    )
+
+def extract_compliance_score(answer: str) -> Tuple[Optional[int], Optional[str]]:
+    """Pull the numeric compliance score and the verdict out of a report"""
+    cleaned = answer.replace('*', '')
+    score_match = re.search(r"Compliance Score:\s*(\d{1,3})", cleaned)
+    verdict_match = re.search(r"Verdict:\s*([^\n]+)", cleaned)
+    score = int(score_match.group(1)) if score_match else None
+    verdict = verdict_match.group(1).strip() if verdict_match else None
+    return score, verdict
+
+def clean_score_format(text):
+    """Clean up the compliance score format from '71-100: Excellent Compliance' to '71/100'"""
+    if "Compliance Score:" in text:
+        try:
+            # Extract the number from the text
+            score = text.split(':')[1].strip()
+            if '-' in score:
+                score = score.split('-')[0].strip()  # Take the first number before the dash
+            if ':' in score:
+                score = score.split(':')[0].strip()  # Remove any remaining text after colon
+            return f"Compliance Score: {score}/100"
+        except:
+            return text
+    return text
+
+def create_pdf_report(response, filename="report.pdf"):
+    pdf = FPDF()
+    pdf.add_page()
+
+    # Set margins to give more space for content
+    pdf.set_left_margin(15)
+    pdf.set_right_margin(15)
+
+    # Title
+    pdf.set_font("Helvetica", "B", 16)
+    pdf.cell(0, 10, "Contract Analysis Report", ln=True, align='C')
+    pdf.ln(10)
+
+    # Main answer section
+    pdf.set_font("Helvetica", "B", 12)
+    pdf.cell(0, 10, "Analysis Summary:", ln=True)
+    pdf.set_font("Helvetica", "", 11)
+
+    # Split answer into paragraphs and clean markdown
+    paragraphs = response.answer.split('\n')
+    for para in paragraphs:
+        # Clean the paragraph of markdown characters
+        cleaned_para = para.replace('**', '').replace('*', '').strip()
+        if cleaned_para:  # Only process non-empty paragraphs
+            # Clean up compliance score format if present
+            cleaned_para = clean_score_format(cleaned_para)
+
+            # Check if it's a header
+            if any(header in cleaned_para for header in REPORT_HEADERS):
+                pdf.set_font("Helvetica", "B", 12)
+                pdf.ln(5)
+                pdf.cell(0, 10, cleaned_para, ln=True)
+                pdf.set_font("Helvetica", "", 11)
+            else:
+                # Use multi_cell to handle line breaks properly
+                pdf.multi_cell(0, 7, cleaned_para)
+                pdf.ln(3)
+
+    # Save the PDF
+    pdf.output(filename)
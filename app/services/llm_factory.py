@@ -1,35 +1,150 @@
-from typing import Any, Dict, List, Type
+import logging
+import threading
+from typing import Any, Callable, Dict, Iterator, List, Optional, Type
 from pydantic import BaseModel
 import google.generativeai as genai
 import os
 from config.settings import get_settings
+from services.chunker import estimate_tokens
+from services.rate_limiter import AdaptiveRateLimiter, is_rate_limit_error
+
+# Process-wide registry of configured models, shared by every LLMFactory
+_models: Dict[str, genai.GenerativeModel] = {}
+_models_lock = threading.Lock()
+_configured = False
+
+# Shared by every caller so the process as a whole adapts to the Gemini quota
+_rate_limiter: Optional[AdaptiveRateLimiter] = None
+
+
+def get_model(model_name: str) -> genai.GenerativeModel:
+    """Return the shared GenerativeModel for model_name, configuring Gemini once."""
+    global _configured
+    with _models_lock:
+        if not _configured:
+            genai.configure(api_key=os.getenv("GEMINI_API_KEY"))
+            _configured = True
+        if model_name not in _models:
+            _models[model_name] = genai.GenerativeModel(model_name)
+        return _models[model_name]
+
+
+def get_rate_limiter() -> AdaptiveRateLimiter:
+    """Return the process-wide Gemini rate limiter, creating it from settings."""
+    global _rate_limiter
+    with _models_lock:
+        if _rate_limiter is None:
+            settings = get_settings().gemini
+            _rate_limiter = AdaptiveRateLimiter(
+                rate=settings.requests_per_minute / 60.0,
+                capacity=settings.rate_limit_burst,
+                min_rate=settings.min_requests_per_minute / 60.0,
+                base_delay=settings.rate_limit_base_delay,
+                max_delay=settings.rate_limit_max_delay,
+            )
+        return _rate_limiter
+
+
+def set_rate_limiter(rate_limiter: AdaptiveRateLimiter) -> None:
+    """Replace the process-wide rate limiter (e.g. with a per-process share of the quota)."""
+    global _rate_limiter
+    with _models_lock:
+        _rate_limiter = rate_limiter
+
 
 class LLMFactory:
     def __init__(self, provider: str = "gemini"):
         self.provider = provider
         self.settings = get_settings().gemini
-        genai.configure(api_key=os.getenv("GEMINI_API_KEY"))
-        self.model = genai.GenerativeModel('gemini-pro')
+        self.model_name = self.settings.default_model
+        self.model = get_model(self.model_name)
+        self.rate_limiter = get_rate_limiter()
 
     def create_completion(
         self, response_model: Type[BaseModel], messages: List[Dict[str, str]], **kwargs
     ) -> Any:
         # Combine messages into a single prompt
         prompt = self._format_messages(messages)
-        
-        # Generate response using Gemini
-        response = self.model.generate_content(
-            prompt,
-            generation_config=genai.types.GenerationConfig(
-                temperature=kwargs.get("temperature", self.settings.temperature),
-                max_output_tokens=kwargs.get("max_tokens", self.settings.max_tokens),
-            )
+
+        # Generate response using Gemini, paced and retried by the shared rate limiter
+        response = self.rate_limiter.call(
+            lambda: self.model.generate_content(
+                prompt,
+                generation_config=self._generation_config(**kwargs),
+            ),
+            max_retries=self.settings.max_retries,
         )
 
+        self._log_usage(response, prompt)
+
         # Parse the response into the expected format
         result = self._parse_response(response, response_model)
         return result
 
+    def create_completion_stream(
+        self,
+        messages: List[Dict[str, str]],
+        on_restart: Optional[Callable[[], None]] = None,
+        **kwargs,
+    ) -> Iterator[str]:
+        """
+        Yield the response text piece by piece as Gemini generates it.
+
+        Rate-limit errors are retried, also once pieces have been yielded: the
+        response is then generated again from the start, after calling
+        on_restart so the caller can discard the pieces it already has.
+        """
+        prompt = self._format_messages(messages)
+        attempt = 0
+        while True:
+            response = self.rate_limiter.call(
+                lambda: self.model.generate_content(
+                    prompt,
+                    generation_config=self._generation_config(**kwargs),
+                    stream=True,
+                ),
+                max_retries=self.settings.max_retries,
+            )
+            started = False
+            try:
+                for chunk in response:
+                    # Chunks without text parts (e.g. only safety ratings) raise on .text
+                    if chunk.parts:
+                        started = True
+                        yield chunk.text
+            except Exception as e:
+                if not is_rate_limit_error(e):
+                    raise
+                delay = self.rate_limiter.on_rate_limited()
+                if attempt >= self.settings.max_retries:
+                    raise
+                attempt += 1
+                logging.warning(
+                    f"Rate limited mid-stream (attempt {attempt}/{self.settings.max_retries}), "
+                    f"restarting the response after {delay:.2f} seconds"
+                )
+                if started and on_restart:
+                    on_restart()
+                continue
+            break
+        self._log_usage(response, prompt)
+
+    def _log_usage(self, response: Any, prompt: str) -> None:
+        """Log prompt and output token counts, falling back to an estimate."""
+        usage = getattr(response, "usage_metadata", None)
+        prompt_tokens = getattr(usage, "prompt_token_count", None) or estimate_tokens(prompt)
+        output_tokens = getattr(usage, "candidates_token_count", None)
+        logging.info(
+            f"{self.model_name} request: {prompt_tokens} prompt tokens, "
+            f"{output_tokens if output_tokens is not None else 'unknown'} output tokens"
+        )
+
+    def _generation_config(self, **kwargs) -> genai.types.GenerationConfig:
+        return genai.types.GenerationConfig(
+            temperature=kwargs.get("temperature", self.settings.temperature),
+            max_output_tokens=kwargs.get("max_tokens", self.settings.max_tokens),
+        )
+
     def _format_messages(self, messages: List[Dict[str, str]]) -> str:
         """Format chat messages into a single prompt string."""
         formatted_messages = []
@@ -46,8 +161,10 @@ class LLMFactory:
 
     def _parse_response(self, response: Any, response_model: Type[BaseModel]) -> BaseModel:
         """Parse Gemini response into the expected Pydantic model."""
-        response_text = response.text
-        
+        return self.parse_text(response.text, response_model)
+
+    def parse_text(self, response_text: str, response_model: Type[BaseModel]) -> BaseModel:
+        """Build the expected Pydantic model from the response text."""
         # If it's a SynthesizedResponse, create the proper structure
         if response_model.__name__ == 'SynthesizedResponse':
             return response_model(
@@ -55,6 +172,6 @@ class LLMFactory:
                 thought_process=["Analyzed context", "Generated response using Gemini model"],
                 enough_context=True  # You might want to make this more dynamic based on context
             )
-        
+
         # For other response types
         return response_model(**{"content": response_text})
@@ -0,0 +1,182 @@
+import logging
+import queue
+import threading
+from typing import Any, Callable, Iterable, Iterator, List, NamedTuple, Tuple
+
+# Sentinel telling a worker that its input queue is exhausted
+_DONE = object()
+# How often a thread blocked on a queue checks whether the run was stopped
+_POLL_INTERVAL = 0.1
+
+
+class _FeedError(NamedTuple):
+    """The exception raised by the input iterable, passed to the caller's thread."""
+
+    error: BaseException
+
+
+class Stage:
+    """
+    One step of a Pipeline, run by `workers` threads.
+
+    A streaming stage's func is called as func(value, emit); every emit(partial)
+    call is reported to the caller as a "progress" event.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        func: Callable[..., Any],
+        workers: int = 1,
+        streaming: bool = False,
+    ):
+        self.name = name
+        self.func = func
+        self.workers = max(1, workers)
+        self.streaming = streaming
+
+
+class PipelineEvent(NamedTuple):
+    """Progress report for one item.
+
+    status is "started" when a stage picks the item up, "progress" with a
+    partial value from a streaming stage, "completed" with the final value
+    once the last stage finishes, or "failed" with the exception.
+    """
+
+    key: str
+    stage: str
+    status: str
+    value: Any = None
+
+
+class Pipeline:
+    """
+    Run items through a sequence of stages concurrently.
+
+    Each stage has its own worker threads and stages are connected by bounded
+    queues, so a slow stage applies backpressure instead of letting work pile
+    up in memory. Different items can be in different stages at the same time.
+    An exception in a stage fails only that item; an exception from the input
+    iterable stops the run and is raised to the caller. A caller that stops
+    iterating early also stops the workers once their current item is done.
+
+    Stage functions run on worker threads; progress is reported back to the
+    caller's thread as PipelineEvents, so UI updates can stay on that thread.
+    """
+
+    def __init__(self, stages: List[Stage], queue_size: int = 4):
+        if not stages:
+            raise ValueError("A pipeline needs at least one stage")
+        self.stages = stages
+        self.queue_size = queue_size
+
+    def run(self, items: Iterable[Tuple[str, Any]]) -> Iterator[PipelineEvent]:
+        """
+        Process (key, value) items and yield progress events as they happen.
+
+        Args:
+            items: Pairs of a unique key (e.g. a file name) and the input value.
+
+        Yields:
+            PipelineEvents for every item until all items completed or failed.
+
+        Raises:
+            Exception: Whatever the items iterable raised.
+        """
+        queues = [queue.Queue(maxsize=self.queue_size) for _ in self.stages]
+        events: "queue.Queue[Any]" = queue.Queue()
+        remaining_workers = [stage.workers for stage in self.stages]
+        lock = threading.Lock()
+        stopped = threading.Event()
+
+        def put(index: int, item: Any) -> bool:
+            """Put an item on a stage's queue; False if the run stopped first."""
+            while not stopped.is_set():
+                try:
+                    queues[index].put(item, timeout=_POLL_INTERVAL)
+                    return True
+                except queue.Full:
+                    continue
+            return False
+
+        def get(index: int) -> Any:
+            """Take an item from a stage's queue, or _DONE once the run stopped."""
+            while not stopped.is_set():
+                try:
+                    return queues[index].get(timeout=_POLL_INTERVAL)
+                except queue.Empty:
+                    continue
+            return _DONE
+
+        def feed():
+            try:
+                for key, value in items:
+                    if not put(0, (key, value)):
+                        return
+            except BaseException as e:
+                stopped.set()
+                events.put(_FeedError(e))
+                return
+            for _ in range(self.stages[0].workers):
+                put(0, _DONE)
+
+        def work(index: int):
+            stage = self.stages[index]
+            is_last = index == len(self.stages) - 1
+            while True:
+                item = get(index)
+                if item is _DONE:
+                    break
+                key, value = item
+                events.put(PipelineEvent(key, stage.name, "started"))
+                try:
+                    if stage.streaming:
+                        result = stage.func(
+                            value,
+                            lambda partial, key=key: events.put(
+                                PipelineEvent(key, stage.name, "progress", partial)
+                            ),
+                        )
+                    else:
+                        result = stage.func(value)
+                except Exception as e:
+                    logging.error(f"{stage.name} failed for {key}: {e}")
+                    events.put(PipelineEvent(key, stage.name, "failed", e))
+                    continue
+                if is_last:
+                    events.put(PipelineEvent(key, stage.name, "completed", result))
+                elif not put(index + 1, (key, result)):
+                    break
+
+            # The last worker of a stage to finish closes the next stage
+            with lock:
+                remaining_workers[index] -= 1
+                stage_finished = remaining_workers[index] == 0
+            if stage_finished:
+                if is_last:
+                    events.put(_DONE)
+                else:
+                    for _ in range(self.stages[index + 1].workers):
+                        put(index + 1, _DONE)
+
+        threads = [threading.Thread(target=feed, daemon=True)]
+        for index, stage in enumerate(self.stages):
+            threads.extend(
+                threading.Thread(target=work, args=(index,), daemon=True)
+                for _ in range(stage.workers)
+            )
+        for thread in threads:
+            thread.start()
+
+        try:
+            while True:
+                event = events.get()
+                if event is _DONE:
+                    break
+                if isinstance(event, _FeedError):
+                    raise event.error
+                yield event
+        finally:
+            # Release workers blocked on a full queue if the caller stopped early
+            stopped.set()
@@ -0,0 +1,207 @@
+import asyncio
+import logging
+import random
+import threading
+import time
+from typing import Callable, Optional, TypeVar
+
+T = TypeVar("T")
+
+RATE_LIMIT_MARKERS = (
+    "429",
+    "resource exhausted",
+    "resource_exhausted",
+    "quota",
+    "rate limit",
+    "too many requests",
+)
+
+
+def is_rate_limit_error(error: Exception) -> bool:
+    """Return True if the exception looks like a provider 429 / quota error."""
+    if getattr(error, "code", None) == 429:
+        return True
+    message = str(error).lower()
+    return any(marker in message for marker in RATE_LIMIT_MARKERS)
+
+
+def backoff_delay(attempt: int, base_delay: float, max_delay: float) -> float:
+    """Jittered exponential backoff delay for the given (zero-based) attempt."""
+    delay = min(max_delay, base_delay * (2**attempt))
+    return random.uniform(delay / 2, delay)
+
+
+def retry_with_backoff(
+    func: Callable[[], T],
+    max_retries: int = 3,
+    base_delay: float = 1.0,
+    max_delay: float = 60.0,
+) -> T:
+    """
+    Call func, retrying rate-limited failures with jittered exponential backoff.
+
+    Args:
+        func: A zero-argument callable performing the API request.
+        max_retries: How many times to retry after a rate-limit error.
+        base_delay: Delay in seconds before the first retry.
+        max_delay: Upper bound for a single delay in seconds.
+
+    Returns:
+        Whatever func returns.
+
+    Raises:
+        The last exception if it is not a rate-limit error or retries ran out.
+    """
+    attempt = 0
+    while True:
+        try:
+            return func()
+        except Exception as e:
+            if attempt >= max_retries or not is_rate_limit_error(e):
+                raise
+            delay = backoff_delay(attempt, base_delay, max_delay)
+            logging.warning(
+                f"Rate limited (attempt {attempt + 1}/{max_retries}), retrying in {delay:.2f} seconds"
+            )
+            time.sleep(delay)
+            attempt += 1
+
+
+class TokenBucket:
+    """
+    Thread-safe token bucket rate limiter.
+
+    Allows `rate` requests per second on average with bursts of up to
+    `capacity` requests. Callers only sleep when the bucket is empty.
+    """
+
+    def __init__(self, rate: float, capacity: float = 1.0):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self.updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    @classmethod
+    def per_minute(cls, requests_per_minute: float, burst: float = 1.0) -> "TokenBucket":
+        """Create a bucket from a requests-per-minute quota."""
+        return cls(rate=requests_per_minute / 60.0, capacity=burst)
+
+    def _reserve(self, tokens: float) -> float:
+        """Take tokens if available; otherwise return how long to wait first."""
+        with self._lock:
+            now = time.monotonic()
+            self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+            self.updated = now
+            if self.tokens >= tokens:
+                self.tokens -= tokens
+                return 0.0
+            return (tokens - self.tokens) / self.rate
+
+    def acquire(self, tokens: float = 1.0) -> float:
+        """
+        Block until `tokens` are available and take them.
+
+        Returns:
+            The number of seconds spent waiting.
+        """
+        waited = 0.0
+        while True:
+            delay = self._reserve(tokens)
+            if delay <= 0:
+                return waited
+            time.sleep(delay)
+            waited += delay
+
+    async def acquire_async(self, tokens: float = 1.0) -> float:
+        """Like acquire, but waits with asyncio.sleep instead of blocking."""
+        waited = 0.0
+        while True:
+            delay = self._reserve(tokens)
+            if delay <= 0:
+                return waited
+            await asyncio.sleep(delay)
+            waited += delay
+
+
+class AdaptiveRateLimiter(TokenBucket):
+    """
+    Token bucket that adapts its rate to the provider's rate-limit responses.
+
+    The rate starts at the configured quota. Every rate-limit error halves it
+    (down to min_rate) and pauses all callers for a jittered exponential
+    backoff; every success raises it again additively up to the quota. Callers
+    only sleep while the bucket is empty or a backoff is in effect, so one
+    shared instance keeps the quota busy without repeatedly tripping it.
+    """
+
+    def __init__(
+        self,
+        rate: float,
+        capacity: float = 1.0,
+        min_rate: Optional[float] = None,
+        base_delay: float = 1.0,
+        max_delay: float = 60.0,
+    ):
+        super().__init__(rate, capacity)
+        self.max_rate = rate
+        self.min_rate = min_rate if min_rate is not None else rate / 10
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.blocked_until = 0.0
+        self.consecutive_failures = 0
+
+    def _reserve(self, tokens: float) -> float:
+        with self._lock:
+            pause = self.blocked_until - time.monotonic()
+        if pause > 0:
+            return pause
+        return super()._reserve(tokens)
+
+    def on_success(self) -> None:
+        """Recover the rate by 5% of the quota after a successful request."""
+        with self._lock:
+            self.consecutive_failures = 0
+            self.rate = min(self.max_rate, self.rate + self.max_rate / 20)
+
+    def on_rate_limited(self) -> float:
+        """
+        Back off after a rate-limit error.
+
+        Returns:
+            The pause in seconds applied to every caller.
+        """
+        with self._lock:
+            delay = backoff_delay(self.consecutive_failures, self.base_delay, self.max_delay)
+            self.consecutive_failures += 1
+            self.rate = max(self.min_rate, self.rate / 2)
+            self.tokens = 0.0
+            self.blocked_until = max(self.blocked_until, time.monotonic() + delay)
+            return delay
+
+    def call(self, func: Callable[[], T], max_retries: int = 3) -> T:
+        """
+        Call func under the limiter, retrying rate-limit errors.
+
+        Raises:
+            The last exception if it is not a rate-limit error or retries ran out.
+        """
+        attempt = 0
+        while True:
+            self.acquire()
+            try:
+                result = func()
+            except Exception as e:
+                if not is_rate_limit_error(e):
+                    raise
+                delay = self.on_rate_limited()
+                if attempt >= max_retries:
+                    raise
+                attempt += 1
+                logging.warning(
+                    f"Rate limited (attempt {attempt}/{max_retries}), backing off {delay:.2f} seconds "
+                    f"at {self.rate * 60:.1f} requests/minute"
+                )
+                continue
+            self.on_success()
+            return result
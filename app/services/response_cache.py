@@ -0,0 +1,210 @@
+import hashlib
+import logging
+import os
+import sqlite3
+import threading
+import time
+from functools import lru_cache
+from typing import Dict, List, Optional
+
+import numpy as np
+from config.settings import get_settings
+
+
+class ResponseCache:
+    """
+    A persistent cache of LLM responses backed by SQLite.
+
+    Exact lookups use a key derived from the model, the system prompt version,
+    the question and the retrieved context. When a similarity threshold is set,
+    a miss can fall back to the stored response whose contract embedding is
+    closest to the current one (cosine similarity at or above the threshold),
+    so re-uploads of a nearly identical contract reuse the earlier report.
+    Entries expire after ttl_seconds and the least recently used are evicted
+    beyond max_entries.
+    """
+
+    def __init__(
+        self,
+        path: str,
+        max_entries: int = 10_000,
+        ttl_seconds: Optional[float] = None,
+        similarity_threshold: Optional[float] = None,
+    ):
+        self.path = path
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.similarity_threshold = similarity_threshold
+        self.exact_hits = 0
+        self.similar_hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._conn = sqlite3.connect(path, timeout=30, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS responses (
+                key TEXT PRIMARY KEY,
+                namespace TEXT NOT NULL,
+                response TEXT NOT NULL,
+                embedding BLOB,
+                created REAL NOT NULL,
+                last_used REAL NOT NULL
+            )
+            """
+        )
+        self._conn.execute(
+            "CREATE INDEX IF NOT EXISTS responses_last_used_idx ON responses (last_used)"
+        )
+        self._conn.execute(
+            "CREATE INDEX IF NOT EXISTS responses_namespace_idx ON responses (namespace)"
+        )
+        self._conn.commit()
+
+    @staticmethod
+    def make_key(namespace: str, *parts: str) -> str:
+        """Cache key for a namespace (model and prompt version) and its inputs."""
+        digests = [hashlib.sha256(part.encode("utf-8")).hexdigest() for part in parts]
+        return hashlib.sha256(":".join([namespace, *digests]).encode("utf-8")).hexdigest()
+
+    def _min_created(self) -> float:
+        return time.time() - self.ttl_seconds if self.ttl_seconds else 0.0
+
+    def get(
+        self,
+        key: str,
+        namespace: str,
+        embedding: Optional[List[float]] = None,
+    ) -> Optional[str]:
+        """
+        Look up a response by exact key, then by embedding similarity.
+
+        Args:
+            key: The exact cache key from make_key.
+            namespace: Model and prompt version; similar matches stay within it.
+            embedding: Embedding of the contract, used by the near-duplicate tier.
+
+        Returns:
+            The cached response, or None on a miss.
+        """
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT key, response FROM responses WHERE key = ? AND created >= ?",
+                (key, self._min_created()),
+            ).fetchone()
+            if row:
+                self.exact_hits += 1
+            elif embedding is not None and self.similarity_threshold is not None:
+                row = self._find_similar(namespace, embedding)
+                if row:
+                    self.similar_hits += 1
+
+            if not row:
+                self.misses += 1
+                return None
+
+            self._conn.execute(
+                "UPDATE responses SET last_used = ? WHERE key = ?", (time.time(), row[0])
+            )
+            self._conn.commit()
+            return row[1]
+
+    def _find_similar(self, namespace: str, embedding: List[float]):
+        """Return (key, response) of the most similar stored entry above the threshold."""
+        rows = self._conn.execute(
+            "SELECT key, response, embedding FROM responses "
+            "WHERE namespace = ? AND embedding IS NOT NULL AND created >= ?",
+            (namespace, self._min_created()),
+        ).fetchall()
+        if not rows:
+            return None
+
+        matrix = np.frombuffer(b"".join(row[2] for row in rows), dtype=np.float32)
+        matrix = matrix.reshape(len(rows), -1)
+        query = np.asarray(embedding, dtype=np.float32)
+        if matrix.shape[1] != query.shape[0]:
+            return None
+        norms = np.linalg.norm(matrix, axis=1) * np.linalg.norm(query)
+        similarities = matrix @ query / np.where(norms == 0, 1, norms)
+        best = int(np.argmax(similarities))
+        if similarities[best] < self.similarity_threshold:
+            return None
+        logging.info(f"Reusing cached response with similarity {similarities[best]:.4f}")
+        return rows[best][0], rows[best][1]
+
+    def put(
+        self,
+        key: str,
+        namespace: str,
+        response: str,
+        embedding: Optional[List[float]] = None,
+    ) -> None:
+        """Store a response, then drop expired and least recently used entries."""
+        now = time.time()
+        blob = (
+            np.asarray(embedding, dtype=np.float32).tobytes()
+            if embedding is not None
+            else None
+        )
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO responses "
+                "(key, namespace, response, embedding, created, last_used) "
+                "VALUES (?, ?, ?, ?, ?, ?)",
+                (key, namespace, response, blob, now, now),
+            )
+            self._evict()
+            self._conn.commit()
+
+    def _evict(self) -> None:
+        """Delete expired entries and the least recently used beyond max_entries."""
+        if self.ttl_seconds:
+            self._conn.execute(
+                "DELETE FROM responses WHERE created < ?", (self._min_created(),)
+            )
+        (count,) = self._conn.execute("SELECT COUNT(*) FROM responses").fetchone()
+        excess = count - self.max_entries
+        if excess > 0:
+            self._conn.execute(
+                "DELETE FROM responses WHERE key IN "
+                "(SELECT key FROM responses ORDER BY last_used ASC LIMIT ?)",
+                (excess,),
+            )
+            logging.info(f"Evicted {excess} entries from response cache")
+
+    def stats(self) -> Dict[str, float]:
+        """Return hit/miss counters and the current number of entries."""
+        with self._lock:
+            (entries,) = self._conn.execute("SELECT COUNT(*) FROM responses").fetchone()
+            lookups = self.exact_hits + self.similar_hits + self.misses
+            hits = self.exact_hits + self.similar_hits
+            return {
+                "exact_hits": self.exact_hits,
+                "similar_hits": self.similar_hits,
+                "misses": self.misses,
+                "hit_rate": hits / lookups if lookups else 0.0,
+                "entries": entries,
+            }
+
+    def close(self) -> None:
+        """Close the underlying database connection."""
+        with self._lock:
+            self._conn.close()
+
+
+@lru_cache()
+def get_response_cache() -> Optional[ResponseCache]:
+    """Create and return the process-wide ResponseCache, or None if disabled."""
+    settings = get_settings().response_cache
+    if not settings.path:
+        return None
+    return ResponseCache(
+        settings.path,
+        max_entries=settings.max_entries,
+        ttl_seconds=settings.ttl.total_seconds() if settings.ttl else None,
+        similarity_threshold=settings.similarity_threshold,
+    )
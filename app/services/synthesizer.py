@@ -1,7 +1,14 @@
-from typing import List
+import hashlib
+import logging
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, List, Optional
 import pandas as pd
 from pydantic import BaseModel, Field
+from config.settings import get_settings
+from services.chunker import content_defined_chunks, estimate_tokens
+from services.context_packer import pack_context
 from services.llm_factory import LLMFactory
+from services.response_cache import ResponseCache, get_response_cache
 
 
 class SynthesizedResponse(BaseModel):
@@ -14,6 +21,10 @@ class SynthesizedResponse(BaseModel):
     )
 
 
+class ChunkAssessment(BaseModel):
+    content: str = Field(description="Short compliance assessment of one contract chunk")
+
+
 class Synthesizer:
     SYSTEM_PROMPT = """
    # Role and Purpose
@@ -52,16 +63,82 @@ You are an AI assistant designed to evaluate contracts for compliance, risk, and
 - Mention any missing details or additional context required for a complete evaluation, such as clauses that are typically required but missing from the contract, or areas that need clarification.
 
     """
+    MAP_PROMPT = """
+You are reviewing one excerpt of a longer contract for compliance, risk and clarity.
+In at most 120 words, list the obligations, protections and risks in this excerpt,
+any ambiguous or unusual terms, and anything that looks non-compliant. Quote clause
+numbers where present. Do not score the contract and do not comment on parts you
+cannot see.
+    """
+    REDUCE_PROMPT = """
+The contract is too long to review in one pass. The user message holds a short
+assessment of each excerpt, in document order, instead of the full text. Base the
+report on these assessments and the retrieved information, treating clauses that
+no assessment mentions as absent.
+    """
+    # Change whenever a prompt is edited, invalidating cached responses
+    PROMPT_VERSION = hashlib.sha256(SYSTEM_PROMPT.encode("utf-8")).hexdigest()[:12]
+    MAP_PROMPT_VERSION = hashlib.sha256(MAP_PROMPT.encode("utf-8")).hexdigest()[:12]
+    REDUCE_PROMPT_VERSION = hashlib.sha256(
+        (SYSTEM_PROMPT + REDUCE_PROMPT).encode("utf-8")
+    ).hexdigest()[:12]
 
     @staticmethod
-    def generate_response(question: str, context: pd.DataFrame) -> SynthesizedResponse:
-        """Generates a synthesized response based on the question and context."""
+    def generate_response(
+        question: str,
+        context: pd.DataFrame,
+        contract_embedding: Optional[List[float]] = None,
+        on_token: Optional[Callable[[str], None]] = None,
+        on_reset: Optional[Callable[[], None]] = None,
+    ) -> SynthesizedResponse:
+        """
+        Generates a synthesized response based on the question and context.
+
+        Responses are cached by model, prompt version, question and context.
+        If contract_embedding is given and the response cache has a similarity
+        threshold, a near-identical contract analysed before is also reused.
+        If on_token is given, the answer is streamed and on_token is called
+        with each piece of text as it arrives; if a rate-limited stream has to
+        start over, on_reset is called first so the pieces so far can be dropped.
+
+        The question and context are first packed into the ContextSettings
+        token budget (see pack_context). A question too long for its share of
+        the budget is analysed map-reduce style: every chunk is assessed
+        separately (see assess_chunks) and the report is written from those
+        assessments.
+        """
+        settings = get_settings().context
+        model_name = get_settings().gemini.default_model
+        system_prompt = Synthesizer.SYSTEM_PROMPT
+        namespace = f"{model_name}:{Synthesizer.PROMPT_VERSION}"
+        question_budget = int(settings.max_tokens * settings.question_share)
+        if settings.map_reduce and estimate_tokens(question) > question_budget:
+            assessments = Synthesizer.assess_chunks(question)
+            question = "\n\n".join(
+                f"## Excerpt {index + 1}\n{assessment}"
+                for index, assessment in enumerate(assessments)
+            )
+            system_prompt = Synthesizer.SYSTEM_PROMPT + Synthesizer.REDUCE_PROMPT
+            namespace = f"{model_name}:{Synthesizer.REDUCE_PROMPT_VERSION}"
+
+        question, context = pack_context(question, context)
         context_str = Synthesizer.dataframe_to_json(
             context, columns_to_keep=["content", "metadata"]
         )
 
+        cache = get_response_cache()
+        if cache:
+            key = cache.make_key(namespace, question, context_str)
+            cached = cache.get(key, namespace, contract_embedding)
+            if cached is not None:
+                logging.info(f"Response cache hit: {cache.stats()}")
+                response = SynthesizedResponse.model_validate_json(cached)
+                if on_token:
+                    on_token(response.answer)
+                return response
+
         messages = [
-            {"role": "system", "content": Synthesizer.SYSTEM_PROMPT},
+            {"role": "system", "content": system_prompt},
             {"role": "user", "content": f"# User question:\n{question}"},
             {
                 "role": "assistant",
@@ -70,15 +147,74 @@ You are an AI assistant designed to evaluate contracts for compliance, risk, and
         ]
 
         llm = LLMFactory()  # No need to specify provider as it defaults to "gemini"
-        return llm.create_completion(
-            response_model=SynthesizedResponse,
-            messages=messages,
+        if on_token:
+            pieces = []
+
+            def restart():
+                pieces.clear()
+                if on_reset:
+                    on_reset()
+
+            for piece in llm.create_completion_stream(messages=messages, on_restart=restart):
+                pieces.append(piece)
+                on_token(piece)
+            response = llm.parse_text("".join(pieces), SynthesizedResponse)
+        else:
+            response = llm.create_completion(
+                response_model=SynthesizedResponse,
+                messages=messages,
+            )
+
+        if cache:
+            cache.put(key, namespace, response.model_dump_json(), contract_embedding)
+        return response
+
+    @staticmethod
+    def assess_chunks(text: str) -> List[str]:
+        """
+        Map step: assess every clause-aware chunk of text in parallel.
+
+        Chunks are cut at content-defined points (see
+        iter_content_defined_chunks), so editing one clause changes only the
+        chunk holding it, and assessments are cached per chunk, so a re-run
+        only calls the model for chunks whose text changed.
+
+        Returns:
+            One assessment per chunk, in document order.
+        """
+        chunks = content_defined_chunks(text)
+        cache = get_response_cache()
+        namespace = f"{get_settings().gemini.default_model}:map:{Synthesizer.MAP_PROMPT_VERSION}"
+        keys = [ResponseCache.make_key(namespace, chunk) for chunk in chunks]
+        assessments = [cache.get(key, namespace) if cache else None for key in keys]
+        pending = [index for index, assessment in enumerate(assessments) if assessment is None]
+        logging.info(
+            f"Map step: {len(chunks)} chunks, {len(chunks) - len(pending)} cached assessments"
         )
 
+        def assess(chunk: str) -> str:
+            messages = [
+                {"role": "system", "content": Synthesizer.MAP_PROMPT},
+                {"role": "user", "content": f"# Contract excerpt:\n{chunk}"},
+            ]
+            return LLMFactory().create_completion(
+                response_model=ChunkAssessment, messages=messages
+            ).content
+
+        # LLMFactory's shared rate limiter paces these concurrent requests
+        workers = min(get_settings().gemini.max_concurrent_requests, len(pending)) or 1
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            results = executor.map(assess, [chunks[index] for index in pending])
+            for index, assessment in zip(pending, results):
+                assessments[index] = assessment
+                if cache:
+                    cache.put(keys[index], namespace, assessment)
+        return assessments
+
     @staticmethod
     def dataframe_to_json(
         context: pd.DataFrame,
         columns_to_keep: List[str],
     ) -> str:
-        """Convert the context DataFrame to a JSON string."""
-        return context[columns_to_keep].to_json(orient="records", indent=2)
+        """Convert the context DataFrame to a compact JSON string."""
+        return context[columns_to_keep].to_json(orient="records")
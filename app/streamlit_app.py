@@ -1,78 +1,61 @@
 import streamlit as st
-from similarity_search import vec, create_pdf_report, Synthesizer
+from config.settings import get_settings
+from database.vector_store import create_vector_store
+from services.contract_analysis import (
+    create_pdf_report,
+    embed_contract,
+    generate_analysis,
+    process_large_text,
+    read_and_process_pdf,
+    read_txt,
+)
+from services.pipeline import Pipeline, Stage
+from services.rate_limiter import TokenBucket
 import base64
-import PyPDF2
 import io
-import pandas as pd
-import numpy as np
-from fpdf import FPDF
 import zipfile
+from contextlib import contextmanager
 import os
-import time
+import queue
 import shutil
 import tempfile  # Import tempfile for creating temporary directories
 
-def chunk_text(text, chunk_size=8000):
-    """Split text into chunks of specified size"""
-    return [text[i:i + chunk_size] for i in range(0, len(text), chunk_size)]
+settings = get_settings()
+# Paces the retrieval stage's embedding requests; LLMFactory has its own shared
+# adaptive limiter for analysis requests
+rate_limiter = TokenBucket.per_minute(
+    settings.gemini.requests_per_minute, settings.gemini.rate_limit_burst
+)
 
-def read_pdf(file):
-    """Extract text from uploaded PDF file"""
-    pdf_reader = PyPDF2.PdfReader(file)
-    text = ""
-    for page in pdf_reader.pages:
-        text += page.extract_text() + "\n"
-    return text
+@st.cache_resource
+def get_vector_stores():
+    """
+    A fixed pool of VectorStores shared by every run and session.
 
-def read_txt(file):
-    """Read text from uploaded TXT file"""
-    return file.getvalue().decode("utf-8")
+    The timescale client's connection pool is not thread-safe, so a pipeline
+    worker borrows a store for its exclusive use. There is one slot per worker
+    that needs a store; each store is created on its first use and then kept,
+    so its embedder, cache and connections outlive the run.
+    """
+    pipeline_settings = settings.pipeline
+    stores = queue.Queue()
+    for _ in range(pipeline_settings.retrieve_workers + pipeline_settings.synthesize_workers):
+        stores.put(None)
+    return stores
 
-def process_large_text(text):
-    """Process large text in chunks and combine results"""
-    chunks = chunk_text(text)
-    all_results = []
-    
-    # Process each chunk
-    progress_bar = st.progress(0)
-    for i, chunk in enumerate(chunks):
-        # Update progress bar
-        progress = (i + 1) / len(chunks)
-        progress_bar.progress(progress)
-        
-        # Search for each chunk
-        results = vec.search(chunk, limit=3)
-        all_results.append(results)
-    
-    # Combine results
-    combined_results = pd.concat(all_results)
-    
-    # Convert any numpy arrays or lists to strings for deduplication
-    for column in combined_results.columns:
-        if hasattr(combined_results[column], 'dtype'):
-            if 'object' in str(combined_results[column].dtype):
-                combined_results[column] = combined_results[column].apply(
-                    lambda x: str(x) if isinstance(x, (list, np.ndarray)) else x
-                )
-    
-    # Drop duplicates based on content
-    combined_results = combined_results.drop_duplicates(subset=['content'])
-    
-    # Take the first 3 results if more exist
-    if len(combined_results) > 3:
-        combined_results = combined_results.head(3)
-    
-    # Create metadata dictionary
-    combined_results['metadata'] = combined_results.apply(
-        lambda x: {
-            'agreement_date': x['agreement_date'],
-            'effective_date': x['effective_date'],
-            'expiration_date': x['expiration_date']
-        }, 
-        axis=1
-    )
-    
-    return combined_results
+# Looked up on the script thread; the pipeline's worker threads only borrow from it
+vector_stores = get_vector_stores()
+
+@contextmanager
+def borrow_vector_store():
+    """Take a VectorStore from the shared pool for the duration of the block"""
+    vec = vector_stores.get()
+    try:
+        if vec is None:
+            vec = create_vector_store()
+        yield vec
+    finally:
+        vector_stores.put(vec)
 
 def get_pdf_download_link(pdf_path):
     """Generate a download link for the PDF file"""
@@ -82,67 +65,62 @@ def get_pdf_download_link(pdf_path):
         href = f'<a href="data:application/pdf;base64,{b64}" download="contract_analysis_report.pdf">Download PDF Report</a>'
         return href
 
-def clean_score_format(text):
-    """Clean up the compliance score format from '71-100: Excellent Compliance' to '71/100'"""
-    if "Compliance Score:" in text:
-        try:
-            # Extract the number from the text
-            score = text.split(':')[1].strip()
-            if '-' in score:
-                score = score.split('-')[0].strip()  # Take the first number before the dash
-            if ':' in score:
-                score = score.split(':')[0].strip()  # Remove any remaining text after colon
-            return f"Compliance Score: {score}/100"
-        except:
-            return text
-    return text
-
-def create_pdf_report(response, filename="report.pdf"):
-    pdf = FPDF()
-    pdf.add_page()
-    
-    # Set margins to give more space for content
-    pdf.set_left_margin(15)
-    pdf.set_right_margin(15)
-    
-    # Title
-    pdf.set_font("Helvetica", "B", 16)
-    pdf.cell(0, 10, "Contract Analysis Report", ln=True, align='C')
-    pdf.ln(10)
-    
-    # Main answer section
-    pdf.set_font("Helvetica", "B", 12)
-    pdf.cell(0, 10, "Analysis Summary:", ln=True)
-    pdf.set_font("Helvetica", "", 11)
-    
-    # Split answer into paragraphs and clean markdown
-    paragraphs = response.answer.split('\n')
-    for para in paragraphs:
-        # Clean the paragraph of markdown characters
-        cleaned_para = para.replace('**', '').replace('*', '').strip()
-        if cleaned_para:  # Only process non-empty paragraphs
-            # Clean up compliance score format if present
-            cleaned_para = clean_score_format(cleaned_para)
-            
-            # Check if it's a header
-            if any(header in cleaned_para for header in ["Compliance Report:", "Strengths:", "Areas for Improvement:", "Reasoning:", "Additional Information:"]):
-                pdf.set_font("Helvetica", "B", 12)
-                pdf.ln(5)
-                pdf.cell(0, 10, cleaned_para, ln=True)
-                pdf.set_font("Helvetica", "", 11)
-            else:
-                # Use multi_cell to handle line breaks properly
-                pdf.multi_cell(0, 7, cleaned_para)
-                pdf.ln(3)
-    
-    # Save the PDF
-    pdf.output(filename)
-
 def create_zip_file(zip_filename, file_list):
     with zipfile.ZipFile(zip_filename, 'w') as zipf:
         for file in file_list:
             zipf.write(file, arcname=os.path.basename(file))  # Add file to zip
 
+def retrieve_context(job):
+    """Pipeline stage: extract the text and retrieve similar contracts, searching chunks as pages arrive"""
+    uploaded_file = job["file"]
+    with borrow_vector_store() as vec:
+        if uploaded_file.type == "application/pdf":
+            job["pages"], job["results"] = read_and_process_pdf(
+                vec, uploaded_file, rate_limiter=rate_limiter
+            )
+            job["text"] = "".join(job["pages"])
+        else:  # txt file
+            job["text"] = job["pages"] = read_txt(uploaded_file)
+            job["results"] = process_large_text(vec, job["text"], rate_limiter=rate_limiter)
+    return job
+
+def synthesize_analysis(job, emit):
+    """Pipeline stage: generate the analysis, streaming it as it is written"""
+    with borrow_vector_store() as vec:
+        contract_embedding = embed_contract(vec, job["pages"])
+    job["response"] = generate_analysis(
+        job["text"],
+        job["results"],
+        contract_embedding=contract_embedding,
+        on_token=emit,
+        # A retried stream starts over; None tells the preview to clear its draft
+        on_reset=lambda: emit(None),
+    )
+    return job
+
+def render_report(job):
+    """Pipeline stage: create the PDF report"""
+    pdf_filename = f"{job['name']}_analysis_report.pdf"
+    create_pdf_report(job["response"], pdf_filename)
+    return pdf_filename
+
+def build_pipeline():
+    """Connect the analysis stages with bounded queues"""
+    pipeline_settings = settings.pipeline
+    return Pipeline(
+        [
+            Stage("Retrieving context for", retrieve_context, pipeline_settings.retrieve_workers),
+            Stage(
+                "Analyzing",
+                synthesize_analysis,
+                pipeline_settings.synthesize_workers,
+                streaming=True,
+            ),
+            Stage("Rendering report for", render_report, pipeline_settings.render_workers),
+        ],
+        queue_size=pipeline_settings.queue_size,
+    )
+
 def main():
     st.title("Contract Analysis System")
     uploaded_files = st.file_uploader("Upload Contract Documents", type=['pdf', 'txt'], accept_multiple_files=True)
@@ -153,62 +131,42 @@ def main():
             # Add a warning about processing time
             st.warning("Processing multiple files may take some time. Please be patient.")
             
-            # Process files with rate limiting
+            # One status line and a live report preview per file plus an overall progress bar
+            statuses = {}
+            previews = {}
+            drafts = {}
             for uploaded_file in uploaded_files:
-                try:
-                    # Add processing status
-                    status = st.empty()
-                    status.info(f"Processing {uploaded_file.name}...")
-                    
-                    # Extract text based on file type
-                    if uploaded_file.type == "application/pdf":
-                        contract_text = read_pdf(uploaded_file)
-                    else:  # txt file
-                        contract_text = read_txt(uploaded_file)
-                    
-                    # Add delay between API calls to avoid rate limits
-                    time.sleep(2)  # Increased delay to 2 seconds
-                    
-                    # Process the text in chunks
-                    results = process_large_text(contract_text)
-                    
-                    # Add another delay before generating response
-                    time.sleep(2)
-                    
-                    # Generate response with retry mechanism
-                    max_retries = 3
-                    retry_delay = 5  # seconds
-                    
-                    for attempt in range(max_retries):
-                        try:
-                            response = Synthesizer.generate_response(
-                                question=contract_text,
-                                context=results[['content', 'metadata']]
-                            )
-                            break
-                        except Exception as e:
-                            if attempt < max_retries - 1:
-                                st.warning(f"Attempt {attempt + 1} failed, retrying in {retry_delay} seconds...")
-                                time.sleep(retry_delay)
-                                retry_delay *= 2  # Exponential backoff
-                            else:
-                                raise e
-                    
-                    # Create PDF and continue with existing processing
-                    pdf_filename = f"{uploaded_file.name}_analysis_report.pdf"
-                    create_pdf_report(response, pdf_filename)
-                    pdf_filenames.append(pdf_filename)
-                    
-                    # Update status
-                    status.success(f"Successfully processed {uploaded_file.name}")
-                    
-                except Exception as e:
-                    st.error(f"Error processing file '{uploaded_file.name}': {str(e)}")
-                    st.info("Continuing with remaining files...")
+                statuses[uploaded_file.name] = st.empty()
+                statuses[uploaded_file.name].info(f"Waiting to process {uploaded_file.name}...")
+                with st.expander(f"Report preview: {uploaded_file.name}"):
+                    previews[uploaded_file.name] = st.empty()
+            progress_bar = st.progress(0)
+            finished = 0
+            
+            # Files move through extraction, retrieval, analysis and rendering concurrently;
+            # the shared rate limiters pace the API calls instead of fixed delays
+            jobs = ((f.name, {"name": f.name, "file": f}) for f in uploaded_files)
+            for event in build_pipeline().run(jobs):
+                status = statuses[event.key]
+                if event.status == "started":
+                    status.info(f"{event.stage} {event.key}...")
+                    continue
+                if event.status == "progress":
+                    # Render the analysis as it streams in, starting over if the stream restarted
+                    if event.value is None:
+                        drafts[event.key] = ""
+                    else:
+                        drafts[event.key] = drafts.get(event.key, "") + event.value
+                    previews[event.key].markdown(drafts[event.key])
                     continue
                 
-                # Add delay before processing next file
-                time.sleep(3)
+                if event.status == "completed":
+                    pdf_filenames.append(event.value)
+                    status.success(f"Successfully processed {event.key}")
+                else:
+                    status.error(f"Error processing file '{event.key}': {str(event.value)}")
+                finished += 1
+                progress_bar.progress(finished / len(uploaded_files))
 
         # Modified zip download section
         if pdf_filenames: